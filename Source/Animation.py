@@ -0,0 +1,125 @@
+"""
+ " Animation
+ "   Plays the frames of a sprite sheet from game ticks rather than from the number
+ "   of times it has been updated, so the speed of the animation does not depend on
+ "   the frame rate. Animations that do not loop finish on the blank frame past the
+ "   end of the sheet. An animation may be given a sprite whose image follows the
+ "   current frame
+"""
+class Animation(object):
+    """
+     " Constructor
+     "   @param sheet: the sprite sheet to play (see Assets.SpriteSheet)
+     "   @param startTicks: game ticks when the first frame is shown
+     "   @param frameTime: the number of milliseconds each frame is shown for
+     "   @param loop: True to start again after the last frame (default = False)
+     "   @param target: sprite whose image is set to the current frame (default = None)
+     "   @param onComplete: function called with the animation once it has finished (default = None)
+    """
+    def __init__(self, sheet, startTicks, frameTime, loop = False, target = None, onComplete = None):
+        self.sheet = sheet
+        self.startTicks = startTicks
+        self.frameTime = frameTime
+        self.loop = loop
+        self.target = target
+        self.onComplete = onComplete
+        self.frame = None       # The index of the frame currently shown
+        self.update(startTicks)
+
+    """
+     " Get Frame Index
+     "   Gets the index of the frame shown at a time. Past the end of an animation
+     "   that does not loop, this is the frame count
+     "
+     "   @param ticks: the game ticks
+    """
+    def getFrameIndex(self, ticks):
+        index = max(int((ticks - self.startTicks) // self.frameTime), 0)
+        if (self.loop is True):
+            return index % self.sheet.getFrameCount()
+        return min(index, self.sheet.getFrameCount())
+
+    """
+     " Is Finished
+     "   Returns True if an animation that does not loop has shown its last frame
+    """
+    def isFinished(self):
+        return self.loop is False and self.frame >= self.sheet.getFrameCount()
+
+    """
+     " Update
+     "   Moves to the frame shown at a time, updating the image of the target
+     "
+     "   @param ticks: the game ticks
+    """
+    def update(self, ticks):
+        index = self.getFrameIndex(ticks)
+        if (index != self.frame):
+            self.frame = index
+            if (self.target is not None):
+                self.target.image = self.sheet.getFrame(index)
+
+"""
+ " Timeline
+ "   Runs every playing animation in a single pass each frame. Animations are
+ "   removed once they finish, after which their completion callback is called
+"""
+class Timeline(object):
+    """
+     " Constructor
+    """
+    def __init__(self):
+        self.animations = []    # The animations playing
+        self.ticks = 0          # The game ticks of the last update
+
+    """
+     " Play
+     "   Starts an animation at the time of the last update and returns it
+     "
+     "   @param sheet: the sprite sheet to play (see Assets.SpriteSheet)
+     "   @param frameTime: the number of milliseconds each frame is shown for
+     "   @param loop: True to start again after the last frame (default = False)
+     "   @param target: sprite whose image is set to the current frame (default = None)
+     "   @param onComplete: function called with the animation once it has finished (default = None)
+    """
+    def play(self, sheet, frameTime, loop = False, target = None, onComplete = None):
+        animation = Animation(sheet, self.ticks, frameTime, loop, target, onComplete)
+        self.animations.append(animation)
+        return animation
+
+    """
+     " Stop
+     "   Removes an animation without completing it
+     "
+     "   @param animation: the animation to stop
+    """
+    def stop(self, animation):
+        if (animation in self.animations):
+            self.animations.remove(animation)
+
+    """
+     " Clear
+     "   Removes every animation and starts the timeline again from zero
+    """
+    def clear(self):
+        self.animations = []
+        self.ticks = 0
+
+    """
+     " Update
+     "   Moves every animation to the frame shown at a time, completing any that
+     "   have finished
+     "
+     "   @param ticks: the game ticks
+    """
+    def update(self, ticks):
+        self.ticks = ticks
+        finished = []
+        for animation in self.animations:
+            animation.update(ticks)
+            if (animation.isFinished()):
+                finished.append(animation)
+        for animation in finished:
+            self.animations.remove(animation)
+            if (animation.onComplete is not None):
+                animation.onComplete(animation)
@@ -0,0 +1,153 @@
+import os, sys, glob, mmap, struct, argparse
+
+import pygame
+import Generic
+
+"""
+ " Constants
+"""
+# Identifies an asset pack and the layout of its index
+PACK_MAGIC                  =   b"APAK"
+PACK_VERSION                =   1
+
+# Little endian header: magic, version and the number of images in the pack
+PACK_HEADER                 =   struct.Struct("<4sII")
+
+# Little endian index entry for each image: file name, width, height, offset of the
+# pixels from the start of the pack, and the size and modification time of the file
+# the pixels were decoded from
+PACK_NAME_LENGTH            =   64
+PACK_ENTRY                  =   struct.Struct("<%dsIIQQd" % PACK_NAME_LENGTH)
+
+# Pixels are stored pre-decoded as RGBA, each image starting on this boundary
+PACK_FORMAT                 =   "RGBA"
+PACK_ALIGNMENT              =   16
+
+# Python 2 mmaps only expose the old buffer interface
+try:
+    getBuffer = buffer
+except NameError:
+    getBuffer = lambda data, offset, size: memoryview(data)[offset:offset + size]
+
+"""
+ " Asset Pack
+ "   A single file holding every image of the resources directory already decoded,
+ "   so startup is a memory map rather than a zlib decode per file. Images are made
+ "   from the mapped pixels without copying them, so they must be converted or
+ "   copied before they are drawn onto
+"""
+class AssetPack(object):
+    """
+     " Constructor
+     "   Maps the pack into memory and reads its index. Raises IOError if the file
+     "   cannot be read and ValueError if it is not a pack of this version
+     "
+     "   @param path: the path of the pack
+    """
+    def __init__(self, path):
+        with open(path, "rb") as packFile:
+            self.data = mmap.mmap(packFile.fileno(), 0, access = mmap.ACCESS_READ)
+
+        if (len(self.data) < PACK_HEADER.size):
+            raise ValueError("%s is not an asset pack" % path)
+        magic, version, count = PACK_HEADER.unpack_from(self.data, 0)
+        if (magic != PACK_MAGIC or version != PACK_VERSION):
+            raise ValueError("%s is not a version %d asset pack" % (path, PACK_VERSION))
+
+        self.entries = {}
+        for index in range(count):
+            name, width, height, offset, sourceSize, sourceTime = PACK_ENTRY.unpack_from(self.data, PACK_HEADER.size + index * PACK_ENTRY.size)
+            if (offset + width * height * 4 > len(self.data)):
+                raise ValueError("%s is truncated" % path)
+            self.entries[name.rstrip(b"\0").decode("utf-8")] = (width, height, offset, sourceSize, sourceTime)
+
+    """
+     " Get Names
+     "   Gets the file names of every image in the pack
+    """
+    def getNames(self):
+        return sorted(self.entries)
+
+    """
+     " Contains
+     "   Returns True if the pack holds an image that is as new as its source file.
+     "   An image whose source file is missing is always current, so the pack can be
+     "   shipped on its own
+     "
+     "   @param name: the file name of the image (e.g. "tree.png")
+     "   @param sourcePath: the path of the file the image was decoded from
+    """
+    def contains(self, name, sourcePath):
+        entry = self.entries.get(name)
+        if (entry is None):
+            return False
+        try:
+            source = os.stat(sourcePath)
+        except OSError:
+            return True
+        return source.st_size == entry[3] and source.st_mtime == entry[4]
+
+    """
+     " Get Image
+     "   Gets a surface over the pixels of an image in the pack
+     "
+     "   @param name: the file name of the image (e.g. "tree.png")
+    """
+    def getImage(self, name):
+        width, height, offset = self.entries[name][:3]
+        return pygame.image.frombuffer(getBuffer(self.data, offset, width * height * 4), (width, height), PACK_FORMAT)
+
+"""
+ " Build
+ "   Decodes every PNG in a directory and writes the pixels to a pack. The pack is
+ "   written to a temporary file that then replaces the original, so a running game
+ "   never maps a partially written pack. Returns the number of images packed
+ "
+ "   @param directory: the directory holding the images
+ "   @param path: the path of the pack to write
+"""
+def build(directory, path):
+    paths = sorted(glob.glob(os.path.join(directory, "*.png")))
+    offset = PACK_HEADER.size + len(paths) * PACK_ENTRY.size
+    entries = []
+    pixels = []
+    for sourcePath in paths:
+        name = os.path.basename(sourcePath).encode("utf-8")
+        if (len(name) > PACK_NAME_LENGTH):
+            raise ValueError("%s has too long a name to pack" % sourcePath)
+        source = os.stat(sourcePath)
+        image = pygame.image.load(sourcePath)
+        offset += -offset % PACK_ALIGNMENT
+        entries.append(PACK_ENTRY.pack(name, image.get_width(), image.get_height(), offset, source.st_size, source.st_mtime))
+        pixels.append((offset, pygame.image.tostring(image, PACK_FORMAT)))
+        offset += len(pixels[-1][1])
+
+    temporaryPath = path + ".tmp"
+    with open(temporaryPath, "wb") as packFile:
+        packFile.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(entries)))
+        packFile.write(b"".join(entries))
+        for offset, data in pixels:
+            packFile.write(b"\0" * (offset - packFile.tell()))
+            packFile.write(data)
+        packFile.flush()
+        os.fsync(packFile.fileno())
+    Generic.replaceFile(temporaryPath, path)
+    return len(entries)
+
+"""
+ " Main
+ "   Builds the asset pack from the resources directory
+"""
+def main():
+    import Assets
+    parser = argparse.ArgumentParser(description = "Packs the Applarrow images as pre-decoded pixels for a faster startup.")
+    parser.add_argument("--resources", default = Assets.RESOURCE_DIRECTORY, help = "directory holding the images")
+    parser.add_argument("--output", default = Assets.PACK_PATH, help = "path of the pack to write")
+    arguments = parser.parse_args()
+
+    count = build(arguments.resources, arguments.output)
+    print("Packed %d images into %s (%d bytes)" % (count, arguments.output, os.path.getsize(arguments.output)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
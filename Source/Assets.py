@@ -0,0 +1,385 @@
+import pygame, os, glob, threading, multiprocessing
+import Queue
+import AssetPack
+from collections import OrderedDict
+from pygame.locals import *
+
+"""
+ " Constants
+"""
+# Location of the game resources, independent of the working directory
+RESOURCE_DIRECTORY          =   os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "Resources")
+
+# Pre-decoded images built by AssetPack, loose files are decoded where it is missing or stale
+PACK_PATH                   =   os.path.join(RESOURCE_DIRECTORY, "assets.pack")
+
+# Threads decoding images in parallel while the game loads
+try:
+    LOADER_THREADS          =   multiprocessing.cpu_count()
+except NotImplementedError:
+    LOADER_THREADS          =   1
+
+# Rotation cache properties
+ROTATION_STEP               =   1           # Angle quantisation in degrees
+ROTATION_MEMORY_LIMIT       =   32 << 20    # Default maximum number of bytes held by a rotation cache
+
+"""
+ " Asset registry
+ "   Every image in the resources directory is decoded at most once and kept in
+ "   display format for the lifetime of the process
+"""
+images = {}     # Converted image surfaces keyed by resource file name
+masks = {}      # Collision masks keyed by (resource file name, frame index, rotation bucket)
+packs = {}      # Mapped asset pack, None where there is no usable pack, keyed by path
+
+"""
+ " Get Path
+ "   Gets the full path of a file in the resources directory
+ "
+ "   @param name: the file name of the resource (e.g. "tree.png")
+"""
+def getPath(name):
+    return os.path.join(RESOURCE_DIRECTORY, name)
+
+"""
+ " Get Pack
+ "   Gets the asset pack, mapping it the first time it is requested. Returns None
+ "   if there is no pack or it cannot be read
+"""
+def getPack():
+    if (PACK_PATH not in packs):
+        try:
+            packs[PACK_PATH] = AssetPack.AssetPack(PACK_PATH)
+        except (IOError, OSError, ValueError):
+            packs[PACK_PATH] = None
+    return packs[PACK_PATH]
+
+"""
+ " Load
+ "   Gets the decoded surface for an image, from the asset pack where it holds the
+ "   current image and from the loose file otherwise
+ "
+ "   @param name: the file name of the image (e.g. "tree.png")
+"""
+def load(name):
+    pack = getPack()
+    if (pack is not None and pack.contains(name, getPath(name))):
+        return pack.getImage(name)
+    return pygame.image.load(getPath(name))
+
+"""
+ " Is Opaque
+ "   Returns True if every pixel of the surface is fully opaque
+ "
+ "   @param surface: the surface to test
+"""
+def isOpaque(surface):
+    if ((surface.get_flags() & SRCALPHA) == 0):
+        return True
+    width, height = surface.get_size()
+    return pygame.mask.from_surface(surface, 254).count() == (width * height)
+
+"""
+ " Convert
+ "   Converts a decoded surface to the display pixel format. Opaque images lose
+ "   their alpha channel and are RLE accelerated, all other images keep per-pixel
+ "   alpha. Surfaces are returned unchanged if no display mode has been set
+ "
+ "   @param surface: the decoded surface to convert
+"""
+def convert(surface):
+    if (pygame.display.get_surface() is None):
+        return surface
+    if (isOpaque(surface)):
+        surface = surface.convert()
+        surface.set_alpha(None, RLEACCEL)
+        return surface
+    return surface.convert_alpha()
+
+"""
+ " Get Image
+ "   Gets the display format surface for an image in the resources directory. The
+ "   file is only read and decoded the first time it is requested; callers that
+ "   draw onto the surface must take a copy first
+ "
+ "   @param name: the file name of the image (e.g. "tree.png")
+"""
+def getImage(name):
+    image = images.get(name)
+    if (image is None):
+        image = addImage(name, load(name))
+    return image
+
+"""
+ " Add Image
+ "   Converts a decoded surface and keeps it as the image for a file name. Returns
+ "   the converted surface
+ "
+ "   @param name: the file name of the image (e.g. "tree.png")
+ "   @param decoded: the surface decoded from the file or the asset pack
+"""
+def addImage(name, decoded):
+    image = convert(decoded)
+    if (image is decoded and pygame.display.get_surface() is None):
+        # Packed pixels are mapped read only, so they cannot be drawn onto
+        image = decoded.copy()
+    images[name] = image
+    return image
+
+"""
+ " Get Mask
+ "   Gets the collision mask for an image, a frame of a sprite sheet or a rotation
+ "   of an image. Masks are built the first time they are requested
+ "
+ "   @param name: the file name of the image
+ "   @param frame: the sprite sheet frame index, None for the whole image (default = None)
+ "   @param bucket: the rotation bucket, None for an unrotated image (default = None)
+ "   @param surface: the surface the mask is built from if it is not cached (default = the whole image)
+"""
+def getMask(name, frame = None, bucket = None, surface = None):
+    key = (name, frame, bucket)
+    mask = masks.get(key)
+    if (mask is None):
+        if (surface is None):
+            surface = getImage(name)
+        mask = pygame.mask.from_surface(surface)
+        masks[key] = mask
+    return mask
+
+"""
+ " Preload
+ "   Decodes every image in the resources directory and the asset pack so that
+ "   no disk access or decoding happens once the game loop has started. Must be
+ "   called after the display mode has been set for the images to be converted
+ "
+ "   @param progress: called with the number of steps done and the total after each
+ "                    image is converted and once the fonts are found (default = None)
+ "   @param threads: the number of threads decoding images (default = LOADER_THREADS)
+"""
+def preload(progress = None, threads = LOADER_THREADS):
+    names = set(os.path.basename(path) for path in glob.glob(os.path.join(RESOURCE_DIRECTORY, "*.png")))
+    pack = getPack()
+    if (pack is not None):
+        names.update(pack.getNames())
+    names = sorted(name for name in names if name not in images)
+
+    # Decoding releases the GIL, so the images are decoded on a pool of threads. The
+    # system font table, None in the queue, is built alongside them as the first font
+    # lookup is slow
+    pending = Queue.Queue()
+    for name in [None] + names:
+        pending.put(name)
+    decoded = Queue.Queue()
+    for index in range(max(1, min(threads, pending.qsize()))):
+        worker = threading.Thread(target = decode, args = (pending, decoded))
+        worker.daemon = True
+        worker.start()
+
+    # Only the calling thread converts, as that needs the display
+    for count in range(len(names) + 1):
+        name, surface, error = decoded.get()
+        if (error is not None):
+            raise error
+        if (name is not None):
+            addImage(name, surface)
+        if (progress is not None):
+            progress(count + 1, len(names) + 1)
+
+"""
+ " Decode
+ "   Runs on a loader thread, decoding images until none are left. Each decoded
+ "   surface, or the error decoding it, is passed back to the thread converting them
+ "
+ "   @param pending: queue of the file names of the images to decode, None to build
+ "                   the system font table
+ "   @param decoded: queue the (file name, surface, error) of each image is put on
+"""
+def decode(pending, decoded):
+    while (True):
+        try:
+            name = pending.get_nowait()
+        except Queue.Empty:
+            break
+        try:
+            if (name is None):
+                if (pygame.font.get_init()):
+                    pygame.font.get_fonts()
+                decoded.put((None, None, None))
+            else:
+                decoded.put((name, load(name), None))
+        except Exception as error:
+            # Raised again on the converting thread so that loading never hangs
+            decoded.put((name, None, error))
+
+"""
+ " Rotation Cache
+ "   Holds anti-aliased rotations of a single image, keyed on the angle quantised
+ "   to ROTATION_STEP degrees. Each entry stores the rotated surface, its collision
+ "   mask and a rectangle centered on the origin so that a rotation about any
+ "   center point is a table lookup. Entries are either built eagerly with fill()
+ "   or lazily on first use, with the least recently used entries discarded once
+ "   the memory limit is reached
+"""
+class RotationCache(object):
+    """
+     " Constructor
+     "   @param name: the file name of the image to rotate
+     "   @param step: the angle quantisation in degrees (default = ROTATION_STEP)
+     "   @param memoryLimit: the maximum number of surface bytes to keep (default = ROTATION_MEMORY_LIMIT)
+    """
+    def __init__(self, name, step = ROTATION_STEP, memoryLimit = ROTATION_MEMORY_LIMIT):
+        self.name = name
+        self.step = step
+        self.buckets = int(round(360.0 / step))
+        self.memoryLimit = memoryLimit
+        self.memoryUsed = 0
+        self.entries = OrderedDict()
+
+    """
+     " Get Bucket
+     "   Gets the quantised bucket index for an angle
+     "
+     "   @param angle: the angle in degrees
+    """
+    def getBucket(self, angle):
+        return int(round(angle / float(self.step))) % self.buckets
+
+    """
+     " Build
+     "   Renders the entry for a bucket, returning the rotated surface, its mask and
+     "   its rectangle centered on the origin
+     "
+     "   @param bucket: the bucket index to render
+    """
+    def build(self, bucket):
+        rotatedImage = pygame.transform.rotozoom(getImage(self.name), bucket * self.step, 1)
+        rotatedMask = getMask(self.name, None, bucket, rotatedImage)
+        rotatedRect = rotatedImage.get_rect(center = (0, 0))
+        return rotatedImage, rotatedMask, rotatedRect
+
+    """
+     " Get
+     "   Gets the cached entry for an angle, building it if it is not present
+     "
+     "   @param angle: the angle in degrees
+    """
+    def get(self, angle):
+        bucket = self.getBucket(angle)
+        entry = self.entries.pop(bucket, None)
+        if (entry is None):
+            entry = self.build(bucket)
+            self.memoryUsed += entry[0].get_bytesize() * entry[0].get_width() * entry[0].get_height()
+
+            # Discard the least recently used rotations until the new entry fits
+            while (self.memoryUsed > self.memoryLimit and len(self.entries) > 0):
+                oldest = self.entries.pop(next(iter(self.entries)))
+                self.memoryUsed -= oldest[0].get_bytesize() * oldest[0].get_width() * oldest[0].get_height()
+        self.entries[bucket] = entry
+        return entry
+
+    """
+     " Fill
+     "   Eagerly builds every entry between two angles (inclusive)
+     "
+     "   @param minAngle: the lowest angle in degrees
+     "   @param maxAngle: the highest angle in degrees
+    """
+    def fill(self, minAngle, maxAngle):
+        for bucket in range(int(round(minAngle / float(self.step))), int(round(maxAngle / float(self.step))) + 1):
+            self.get(bucket * self.step)
+
+    """
+     " Rotate Center
+     "   Gets the rotated surface, mask and rectangle for the image rotated about the
+     "   center of a rectangle
+     "
+     "   @param rect: the rectangle whose center the image is rotated about
+     "   @param angle: the angle in degrees to rotate the image by
+    """
+    def rotateCenter(self, rect, angle):
+        rotatedImage, rotatedMask, rotatedRect = self.get(angle)
+        return rotatedImage, rotatedMask, rotatedRect.move(rect.center)
+
+"""
+ " Sprite Sheet
+ "   Slices a horizontal strip of equally sized animation frames into subsurfaces
+ "   once, along with a collision mask for each frame. Indices past the last frame
+ "   return a fully transparent frame so finished animations disappear
+"""
+class SpriteSheet(object):
+    """
+     " Constructor
+     "   @param name: the file name of the sprite sheet image
+     "   @param frameWidth: the width in pixels of each frame
+     "   @param frameHeight: the height in pixels of each frame
+    """
+    def __init__(self, name, frameWidth, frameHeight):
+        sheet = getImage(name)
+        self.name = name
+        self.frames = []
+        self.masks = []
+        for x in range(0, sheet.get_width() - frameWidth + 1, frameWidth):
+            frame = sheet.subsurface(pygame.Rect(x, 0, frameWidth, frameHeight))
+            self.frames.append(frame)
+            self.masks.append(getMask(name, len(self.masks), None, frame))
+        self.blank = pygame.Surface((frameWidth, frameHeight), flags = SRCALPHA)
+        self.blankMask = pygame.mask.Mask((frameWidth, frameHeight))
+
+    """
+     " Get Frame Count
+     "   Gets the number of frames on the sheet
+    """
+    def getFrameCount(self):
+        return len(self.frames)
+
+    """
+     " Get Frame
+     "   Gets the surface for a frame
+     "
+     "   @param index: the index of the frame
+    """
+    def getFrame(self, index):
+        if (index < len(self.frames)):
+            return self.frames[index]
+        return self.blank
+
+    """
+     " Get Mask
+     "   Gets the collision mask for a frame
+     "
+     "   @param index: the index of the frame
+    """
+    def getMask(self, index):
+        if (index < len(self.masks)):
+            return self.masks[index]
+        return self.blankMask
+
+    """
+     " Get Rect
+     "   Gets a new rectangle the size of a frame
+     "
+     "   @param location: center coordinates to position the rectangle at (default = None)
+    """
+    def getRect(self, location = None):
+        rect = self.blank.get_rect()
+        if (location is not None):
+            rect.center = location
+        return rect
+
+spriteSheets = {}   # Sprite sheets keyed by resource file name
+
+"""
+ " Get Sprite Sheet
+ "   Gets the sliced sprite sheet for an image, slicing it the first time it is
+ "   requested
+ "
+ "   @param name: the file name of the sprite sheet image
+ "   @param frameWidth: the width in pixels of each frame
+ "   @param frameHeight: the height in pixels of each frame
+"""
+def getSpriteSheet(name, frameWidth, frameHeight):
+    sheet = spriteSheets.get(name)
+    if (sheet is None):
+        sheet = SpriteSheet(name, frameWidth, frameHeight)
+        spriteSheets[name] = sheet
+    return sheet
@@ -0,0 +1,355 @@
+import os, sys, json, math, random, argparse, platform, timeit
+
+# The benchmarks never open a window or play sound
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import Generic, Elements, Assets, Simulation, Renderer, Animation, DirtyRects, Level
+
+"""
+ " Constants
+"""
+# Benchmark properties
+BENCHMARK_SEED              =   1       # Seed of every simulated game
+BENCHMARK_FRAMES            =   150     # Number of frames timed in each scenario
+BENCHMARK_CALLS             =   2000    # Number of calls timed for each function
+BENCHMARK_FRAME_TIME        =   33      # Milliseconds of game time in each frame
+BENCHMARK_PERCENTILES       =   [50, 90, 99]
+BENCHMARK_SWARM             =   300     # Number of butterflies in the swarm benchmarks
+
+# Regression thresholds. A benchmark regresses when its median is slower than the
+# baseline median by more than the tolerance and by more than the noise floor
+REGRESSION_TOLERANCE        =   0.25    # Fraction of the baseline median
+REGRESSION_NOISE_FLOOR      =   5.0     # Microseconds
+
+# Stored baseline the results are compared against
+BASELINE_FILE               =   os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarkBaseline.json")
+
+"""
+ " Percentile
+ "   Gets a percentile of a list of samples using the nearest rank
+ "
+ "   @param samples: the samples, sorted from smallest to largest
+ "   @param percent: the percentile between 0 and 100
+"""
+def percentile(samples, percent):
+    rank = int(math.ceil(percent / 100.0 * len(samples)))
+    return samples[min(max(rank, 1), len(samples)) - 1]
+
+"""
+ " Summarise
+ "   Summarises timings in seconds as microsecond statistics
+ "
+ "   @param timings: the time taken by each sample in seconds
+"""
+def summarise(timings):
+    samples = sorted(timing * 1000000.0 for timing in timings)
+    summary = { "samples": len(samples), "mean": sum(samples) / len(samples), "max": samples[-1] }
+    for percent in BENCHMARK_PERCENTILES:
+        summary["p%d" % percent] = percentile(samples, percent)
+    return summary
+
+"""
+ " Time Calls
+ "   Times a function separately for each call
+ "
+ "   @param function: the function to time, called with the index of each call
+ "   @param calls: the number of calls to time (default = BENCHMARK_CALLS)
+"""
+def timeCalls(function, calls = BENCHMARK_CALLS):
+    timer = timeit.default_timer
+    timings = []
+    for call in range(calls):
+        start = timer()
+        function(call)
+        timings.append(timer() - start)
+    return summarise(timings)
+
+"""
+ " Function benchmarks
+ "   Each benchmark sets up its own fixed state in the level played and returns the
+ "   function to time, which is called with the index of each call
+"""
+def benchmarkBannerUpdate(level):
+    Elements.Banner()
+    def run(call):
+        # Changing the power every call redraws the gauge as it does while charging
+        Elements.Banner.setPower(call % 100)
+        Elements.Banner.update()
+    return run
+
+def benchmarkArrowStateUpdate(level):
+    arrow = Simulation.ArrowState()
+    span = Generic.AIM_ANGLE_MAX - Generic.AIM_ANGLE_MIN
+    return lambda call: arrow.update(math.radians(Generic.AIM_ANGLE_MIN + (call % span)))
+
+def benchmarkArrowStateFly(level):
+    flight = [None, 0]     # The arrow in flight and the call it was fired on
+    def run(call):
+        # Fire a fresh full power arrow once the previous one has landed
+        if (flight[0] is None or flight[0].flying is False):
+            flight[0] = Simulation.ArrowState()
+            flight[0].update(math.radians(30))
+            flight[0].fire(100, 1, 0)
+            flight[1] = call
+        flight[0].fly((call - flight[1] + 1) * BENCHMARK_FRAME_TIME / 1000.0)
+    return run
+
+def benchmarkArrowUpdate(level):
+    arrow = Simulation.ArrowState()
+    arrow.update(math.radians(30))
+    arrow.fire(100, 1, 0)
+    arrow.fly(0.2)
+    arrow.snapshot()
+    arrow.fly(0.25)
+    sprite = Elements.Arrow(arrow)
+    return lambda call: sprite.update((call % 10) / 10.0)
+
+def benchmarkArcherTorsoUpdate(level):
+    torso = Elements.ArcherTorso()
+    span = Generic.AIM_ANGLE_MAX - Generic.AIM_ANGLE_MIN
+    return lambda call: torso.update(math.radians(Generic.AIM_ANGLE_MIN + (call % span)))
+
+def benchmarkButterflySwarmStateUpdate(level):
+    swarm = Simulation.ButterflySwarm(random.Random(BENCHMARK_SEED), level)
+    for index in range(BENCHMARK_SWARM):
+        swarm.add(0)
+    return lambda call: swarm.update(call * BENCHMARK_FRAME_TIME)
+
+def benchmarkButterflySwarmUpdate(level):
+    swarm = Simulation.ButterflySwarm(random.Random(BENCHMARK_SEED), level)
+    for index in range(BENCHMARK_SWARM):
+        swarm.add(0)
+    drawn = Elements.ButterflySwarm(swarm, Animation.Timeline())
+    def run(call):
+        swarm.update(call * BENCHMARK_FRAME_TIME)
+        drawn.update(0.5)
+    return run
+
+def benchmarkAppleStateChange(level):
+    generator = random.Random(BENCHMARK_SEED)
+    apples = [Simulation.AppleState(location, 0, generator) for location in level.apples]
+    return lambda call: apples[call % len(apples)].change(call * BENCHMARK_FRAME_TIME)
+
+def benchmarkGetBezierPoint(level):
+    return lambda call: Generic.getBezierPoint((call % 100) / 100.0, level.paths[call % len(level.paths)])
+
+def benchmarkGetPathPoint(level):
+    return lambda call: level.getPathPoint(call % len(level.paths), (call % 100) / 100.0)
+
+def benchmarkTimelineUpdate(level):
+    # One hitsplat playing for every apple on the tree
+    timeline = Animation.Timeline()
+    sheet = Assets.getSpriteSheet(Generic.APPLE_SPLATS[0], 47, 62)
+    for location in level.apples:
+        timeline.play(sheet, Generic.SPLAT_FRAME_TIME, loop = True, target = pygame.sprite.Sprite())
+    return lambda call: timeline.update(call * BENCHMARK_FRAME_TIME)
+
+def benchmarkSpriteSheetGetFrame(level):
+    sheet = Assets.getSpriteSheet("hitsplatOrange.png", 92, 65)
+    return lambda call: sheet.getFrame(call % (sheet.getFrameCount() + 1))
+
+def benchmarkDirtyRectsOptimise(level):
+    # The banner, every apple, a butterfly, the arrow and the torso, some overlapping
+    screenRect = pygame.Rect(0, 0, Generic.WINDOW_WIDTH, Generic.WINDOW_HEIGHT)
+    rects = [pygame.Rect(11, 10, 160, 20), pygame.Rect(-64, 295, 250, 240), pygame.Rect(300, 200, 77, 40), pygame.Rect(305, 198, 77, 40)]
+    rects += [pygame.Rect(location[0] - 12, location[1] - 12, 24, 24) for location in level.apples]
+    return lambda call: DirtyRects.optimise(rects + [pygame.Rect(call % 800, 150, 40, 30)], screenRect)
+
+FUNCTION_BENCHMARKS         =   [("Banner.update", benchmarkBannerUpdate),
+                                 ("ArrowState.update", benchmarkArrowStateUpdate),
+                                 ("ArrowState.fly", benchmarkArrowStateFly),
+                                 ("Arrow.update", benchmarkArrowUpdate),
+                                 ("ArcherTorso.update", benchmarkArcherTorsoUpdate),
+                                 ("Simulation.ButterflySwarm.update", benchmarkButterflySwarmStateUpdate),
+                                 ("Elements.ButterflySwarm.update", benchmarkButterflySwarmUpdate),
+                                 ("AppleState.change", benchmarkAppleStateChange),
+                                 ("Generic.getBezierPoint", benchmarkGetBezierPoint),
+                                 ("Level.getPathPoint", benchmarkGetPathPoint),
+                                 ("Timeline.update", benchmarkTimelineUpdate),
+                                 ("SpriteSheet.getFrame", benchmarkSpriteSheetGetFrame),
+                                 ("DirtyRects.optimise", benchmarkDirtyRectsOptimise)]
+
+"""
+ " Scenarios
+ "   Each scenario prepares a seeded game and returns the milliseconds of game time
+ "   to advance in each timed frame
+"""
+def scenarioStill(simulation):
+    # Nothing moves, so every frame costs the least a frame can cost
+    return 0
+
+def scenarioFlight(simulation):
+    # Aim high, hold the button until the power gauge is full and let go
+    simulation.step(simulation.stepTime, [(Simulation.INPUT_AIM, [400, 100]), (Simulation.INPUT_PRESS, None)])
+    while (simulation.power < 99.9):
+        simulation.step(1)
+    simulation.step(simulation.stepTime, [(Simulation.INPUT_RELEASE, None)])
+    return BENCHMARK_FRAME_TIME
+
+def scenarioButterflies(simulation):
+    # Every butterfly the difficulty can introduce
+    extra = len([diff for diff in simulation.level.difficulty + simulation.level.timeDifficulty if diff[2] is True])
+    for index in range(extra):
+        simulation.butterflies.add(simulation.ticks)
+    return BENCHMARK_FRAME_TIME
+
+def scenarioSwarm(simulation):
+    # The swarm of a custom high difficulty game
+    for index in range(BENCHMARK_SWARM):
+        simulation.butterflies.add(simulation.ticks)
+    return BENCHMARK_FRAME_TIME
+
+def scenarioHitsplats(simulation):
+    # Every apple hit at the same time
+    for apple in simulation.apples:
+        apple.hit()
+    return BENCHMARK_FRAME_TIME
+
+SCENARIOS                   =   [("still", scenarioStill),
+                                 ("flight", scenarioFlight),
+                                 ("butterflies", scenarioButterflies),
+                                 ("swarm", scenarioSwarm),
+                                 ("hitsplats", scenarioHitsplats)]
+
+"""
+ " Run Scenario
+ "   Plays frames of a seeded game the way the main loop does, timing each phase of
+ "   every frame
+ "
+ "   @param screen: the surface to draw to
+ "   @param scenario: the function preparing the game
+ "   @param level: the level played (see Level.Level)
+ "   @param frames: the number of frames to time (default = BENCHMARK_FRAMES)
+"""
+def runScenario(screen, scenario, level, frames = BENCHMARK_FRAMES):
+    simulation = Simulation.Simulation(BENCHMARK_SEED, level = level)
+    renderer = Renderer.Renderer(screen, simulation)
+    frameTime = scenario(simulation)
+    renderer.sync()
+    renderer.drawBackground()
+    renderer.redraw()
+    pygame.event.clear()
+
+    timer = timeit.default_timer
+    timings = { "events": [], "advance": [], "sync": [], "redraw": [], "frame": [] }
+    for frame in range(frames):
+        frameStart = timer()
+
+        pygame.event.get()
+        advanceStart = timer()
+        alpha = simulation.advance(frameTime)
+        syncStart = timer()
+        renderer.sync(alpha)
+        renderer.moveClouds()
+        redrawStart = timer()
+        renderer.redraw()
+        frameEnd = timer()
+
+        timings["events"].append(advanceStart - frameStart)
+        timings["advance"].append(syncStart - advanceStart)
+        timings["sync"].append(redrawStart - syncStart)
+        timings["redraw"].append(frameEnd - redrawStart)
+        timings["frame"].append(frameEnd - frameStart)
+    return dict((phase, summarise(phaseTimings)) for phase, phaseTimings in timings.items())
+
+"""
+ " Run
+ "   Runs every benchmark, returning the results keyed by benchmark name
+ "
+ "   @param frames: the number of frames to time in each scenario (default = BENCHMARK_FRAMES)
+ "   @param calls: the number of calls to time for each function (default = BENCHMARK_CALLS)
+ "   @param levelName: the name of the level played (default = Level.DEFAULT_LEVEL)
+"""
+def run(frames = BENCHMARK_FRAMES, calls = BENCHMARK_CALLS, levelName = Level.DEFAULT_LEVEL):
+    pygame.init()
+    screen = pygame.display.set_mode((Generic.WINDOW_WIDTH, Generic.WINDOW_HEIGHT))
+    Assets.preload()
+    level = Level.load(levelName)
+
+    results = {}
+    for name, benchmark in FUNCTION_BENCHMARKS:
+        results[name] = timeCalls(benchmark(level), calls)
+    for name, scenario in SCENARIOS:
+        for phase, summary in runScenario(screen, scenario, level, frames).items():
+            results["%s/%s" % (name, phase)] = summary
+    return results
+
+"""
+ " Compare
+ "   Gets every benchmark whose median regressed against the baseline as a list of
+ "   (name, baseline median, median) tuples. Benchmarks missing from either set of
+ "   results are ignored
+ "
+ "   @param results: the results of this run
+ "   @param baseline: the stored baseline results
+ "   @param tolerance: the fraction of the baseline median allowed (default = REGRESSION_TOLERANCE)
+ "   @param noiseFloor: the microseconds of slowdown always allowed (default = REGRESSION_NOISE_FLOOR)
+"""
+def compare(results, baseline, tolerance = REGRESSION_TOLERANCE, noiseFloor = REGRESSION_NOISE_FLOOR):
+    regressions = []
+    for name in sorted(results):
+        if (name in baseline):
+            expected = baseline[name]["p50"]
+            actual = results[name]["p50"]
+            if (actual > expected * (1 + tolerance) and actual - expected > noiseFloor):
+                regressions.append((name, expected, actual))
+    return regressions
+
+"""
+ " Benchmark main entry point
+ "   Prints the results and exits with a non-zero status if any benchmark regressed
+ "   against the baseline, or if there is no baseline to compare against unless the
+ "   comparison was explicitly skipped
+"""
+def main():
+    parser = argparse.ArgumentParser(description = "Times the Applarrow hot paths headless.")
+    parser.add_argument("--output", help = "write the results to this JSON file")
+    parser.add_argument("--baseline", default = BASELINE_FILE, help = "baseline JSON file to compare against")
+    parser.add_argument("--save-baseline", action = "store_true", help = "store the results as the new baseline")
+    parser.add_argument("--no-baseline", action = "store_true", help = "only print the results, without comparing them to a baseline")
+    parser.add_argument("--tolerance", type = float, default = REGRESSION_TOLERANCE, help = "allowed fractional slowdown of the median")
+    parser.add_argument("--frames", type = int, default = BENCHMARK_FRAMES, help = "frames timed in each scenario")
+    parser.add_argument("--calls", type = int, default = BENCHMARK_CALLS, help = "calls timed for each function")
+    parser.add_argument("--level", default = Level.DEFAULT_LEVEL, help = "name of the level played")
+    arguments = parser.parse_args()
+
+    results = run(arguments.frames, arguments.calls, arguments.level)
+    report = { "python": platform.python_version(), "pygame": pygame.version.ver, "level": arguments.level, "results": results }
+
+    # Results, in microseconds
+    print("%-28s %10s %10s %10s %10s" % ("benchmark (us)", "p50", "p90", "p99", "mean"))
+    for name in sorted(results):
+        summary = results[name]
+        print("%-28s %10.1f %10.1f %10.1f %10.1f" % (name, summary["p50"], summary["p90"], summary["p99"], summary["mean"]))
+
+    if (arguments.output is not None):
+        with open(arguments.output, "w") as resultsFile:
+            json.dump(report, resultsFile, indent = 2, sort_keys = True)
+
+    if (arguments.save_baseline is True):
+        with open(arguments.baseline, "w") as baselineFile:
+            json.dump(report, baselineFile, indent = 2, sort_keys = True)
+        print("Baseline saved to %s" % arguments.baseline)
+        return 0
+
+    if (arguments.no_baseline is True):
+        return 0
+
+    if (not os.path.exists(arguments.baseline)):
+        print("No baseline at %s, run with --save-baseline to store one or --no-baseline to skip the comparison" % arguments.baseline)
+        return 2
+
+    with open(arguments.baseline) as baselineFile:
+        baseline = json.load(baselineFile)["results"]
+    regressions = compare(results, baseline, arguments.tolerance)
+    for name, expected, actual in regressions:
+        print("REGRESSION %s: p50 %.1fus -> %.1fus" % (name, expected, actual))
+    if (len(regressions) > 0):
+        return 1
+    print("No regressions against %s" % arguments.baseline)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
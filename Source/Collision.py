@@ -0,0 +1,134 @@
+import pygame, math
+
+"""
+ " Constants
+"""
+# Grid cell size in pixels for static elements
+GRID_CELL_SIZE              =   64
+
+# Maximum distance in pixels between two samples of a swept collision test
+SWEEP_STEP                  =   4
+
+"""
+ " Grid
+ "   Broad-phase index for elements that never move. Each element is stored in
+ "   every cell its rectangle touches so a query only has to look at the cells
+ "   around the area being tested. The cells are worked out when a level is built
+ "   (see Level.build) and the elements are put in them with load()
+"""
+class Grid(object):
+    """
+     " Constructor
+     "   @param cellSize: the width and height of each cell in pixels (default = GRID_CELL_SIZE)
+    """
+    def __init__(self, cellSize = GRID_CELL_SIZE):
+        self.cellSize = cellSize
+        self.cells = {}
+
+    """
+     " Get Cells
+     "   Gets the (column, row) of every cell touched by a rectangle
+     "
+     "   @param rect: the rectangle to find the cells for
+    """
+    def getCells(self, rect):
+        left = rect.left // self.cellSize
+        right = (rect.right - 1) // self.cellSize
+        top = rect.top // self.cellSize
+        bottom = (rect.bottom - 1) // self.cellSize
+        return [(column, row) for column in range(left, right + 1) for row in range(top, bottom + 1)]
+
+    """
+     " Load
+     "   Replaces the contents of the grid with elements whose cells are already
+     "   known
+     "
+     "   @param cellSize: the width and height of each cell in pixels
+     "   @param cells: list of ((column, row), elements) of each occupied cell
+    """
+    def load(self, cellSize, cells):
+        self.cellSize = cellSize
+        self.cells = dict(cells)
+
+    """
+     " Query
+     "   Gets every element in the cells touched by a rectangle, each element
+     "   appearing once
+     "
+     "   @param rect: the area to query
+    """
+    def query(self, rect):
+        found = []
+        for cell in self.getCells(rect):
+            for element in self.cells.get(cell, ()):
+                if (element not in found):
+                    found.append(element)
+        return found
+
+"""
+ " Get Mask
+ "   Gets the collision mask of a sprite, building one from its image if the
+ "   sprite does not have a mask
+ "
+ "   @param sprite: the sprite to get the mask for
+"""
+def getMask(sprite):
+    mask = getattr(sprite, "mask", None)
+    if (mask is None):
+        mask = pygame.mask.from_surface(sprite.image)
+    return mask
+
+"""
+ " Collide
+ "   Pixel-perfect collision test between a mask placed at a rectangle and a
+ "   sprite. Rectangles that do not overlap are rejected before the masks are
+ "   compared
+ "
+ "   @param rect: the rectangle the mask is placed at
+ "   @param mask: the mask to test
+ "   @param sprite: the sprite to test against
+"""
+def collide(rect, mask, sprite):
+    if (not rect.colliderect(sprite.rect)):
+        return False
+    return mask.overlap(getMask(sprite), (sprite.rect.x - rect.x, sprite.rect.y - rect.y)) is not None
+
+"""
+ " Sweep Rect
+ "   Gets the rectangle covering every position of a rectangle as its center moves
+ "   between two points
+ "
+ "   @param rect: the rectangle being moved
+ "   @param start: the center at the start of the movement
+ "   @param end: the center at the end of the movement
+"""
+def sweepRect(rect, start, end):
+    return rect.move(start[0] - rect.centerx, start[1] - rect.centery).union(rect.move(end[0] - rect.centerx, end[1] - rect.centery))
+
+"""
+ " Sweep
+ "   Tests a sprite against candidate sprites at evenly spaced points along the
+ "   segment its center travelled, so that fast moving sprites cannot pass through
+ "   small targets between frames. The sprite's current image and mask are used at
+ "   every point. Candidates that were hit are returned in the order they were met
+ "
+ "   @param sprite: the moving sprite
+ "   @param start: the center of the sprite at the start of the movement
+ "   @param end: the center of the sprite at the end of the movement
+ "   @param candidates: the sprites to test against
+"""
+def sweep(sprite, start, end, candidates):
+    hits = []
+    if (len(candidates) == 0):
+        return hits
+
+    mask = getMask(sprite)
+    rect = sprite.rect.copy()
+    distance = math.hypot(end[0] - start[0], end[1] - start[1])
+    samples = max(1, int(math.ceil(distance / SWEEP_STEP)))
+    for sample in range(1, samples + 1):
+        rect.center = (start[0] + (end[0] - start[0]) * sample / float(samples), start[1] + (end[1] - start[1]) * sample / float(samples))
+        for candidate in candidates:
+            if (candidate not in hits and collide(rect, mask, candidate)):
+                hits.append(candidate)
+    return hits
@@ -0,0 +1,60 @@
+from bisect import bisect_right
+
+"""
+ " Difficulty Engine
+ "   Applies the difficulty adjustments of one game as its score rises and its time
+ "   runs down. Each adjustment sets the wind speed and may add a butterfly, and is
+ "   applied once as its threshold is reached, even if a single hit jumps past it.
+ "   Thresholds are kept sorted so each update is a binary search, and every game
+ "   has its own engine so that games never share state
+"""
+class DifficultyEngine(object):
+    """
+     " Constructor
+     "   @param pointAdjustments: list of (points, wind speed, butterfly added) applied as the score reaches the points
+     "   @param timeAdjustments: list of (seconds, wind speed, butterfly added) applied as the time remaining falls to the seconds
+     "   @param apply: called with the wind speed and whether to add a butterfly for each adjustment
+     "   @param points: the score at the start of the game (default = 0)
+     "   @param timeRemaining: the seconds remaining at the start of the game (default = None, no time adjustments are passed)
+    """
+    def __init__(self, pointAdjustments, timeAdjustments, apply, points = 0, timeRemaining = None):
+        self.pointAdjustments = sorted(pointAdjustments, key = lambda adjustment: adjustment[0])
+        self.pointThresholds = [adjustment[0] for adjustment in self.pointAdjustments]
+
+        # Time runs down, so its thresholds are kept negated to sort them in the order they are reached
+        self.timeAdjustments = sorted(timeAdjustments, key = lambda adjustment: -adjustment[0])
+        self.timeThresholds = [-adjustment[0] for adjustment in self.timeAdjustments]
+
+        self.apply = apply
+        self.points = points                # The highest score reached
+        self.timeRemaining = timeRemaining  # The least time remaining reached
+
+    """
+     " Update Points
+     "   Applies every adjustment whose threshold the score has reached for the
+     "   first time
+     "
+     "   @param points: the current score
+    """
+    def updatePoints(self, points):
+        if (points > self.points):
+            first = bisect_right(self.pointThresholds, self.points)
+            last = bisect_right(self.pointThresholds, points)
+            for threshold, windSpeed, butterfly in self.pointAdjustments[first:last]:
+                self.apply(windSpeed, butterfly)
+            self.points = points
+
+    """
+     " Update Time Remaining
+     "   Applies every adjustment whose threshold the time remaining has fallen to
+     "   for the first time
+     "
+     "   @param timeRemaining: the seconds remaining in the game
+    """
+    def updateTimeRemaining(self, timeRemaining):
+        if (self.timeRemaining is not None and timeRemaining < self.timeRemaining):
+            first = bisect_right(self.timeThresholds, -self.timeRemaining)
+            last = bisect_right(self.timeThresholds, -timeRemaining)
+            for threshold, windSpeed, butterfly in self.timeAdjustments[first:last]:
+                self.apply(windSpeed, butterfly)
+            self.timeRemaining = timeRemaining
@@ -0,0 +1,96 @@
+import pygame
+
+"""
+ " Constants
+"""
+# Strategies used to push a frame to the display
+UPDATE_NONE                 =   "none"      # Nothing changed
+UPDATE_RECTS                =   "rects"     # The rectangles were pushed as they were drawn
+UPDATE_MERGED               =   "merged"    # Some rectangles were merged before they were pushed
+UPDATE_FULL                 =   "full"      # The whole display was flipped
+
+# Cost model, in pixels pushed. Each rectangle costs its area plus a fixed overhead for
+# the call, so two rectangles are merged when the pixels their union adds cost less
+# than the overhead saved
+RECT_OVERHEAD               =   2048
+
+# Fraction of the screen above which the whole display is flipped
+FULL_UPDATE_COVERAGE        =   0.6
+
+"""
+ " Get Cost
+ "   Gets the cost of pushing rectangles to the display, in pixels
+ "
+ "   @param rects: the rectangles
+"""
+def getCost(rects):
+    return sum(rect.width * rect.height for rect in rects) + len(rects) * RECT_OVERHEAD
+
+"""
+ " Merge
+ "   Merges rectangles into their union wherever that is cheaper than pushing them
+ "   separately, which always includes rectangles that overlap by more than the
+ "   area their union adds. Returns the merged rectangles
+ "
+ "   @param rects: the rectangles to merge
+"""
+def merge(rects):
+    merged = []
+    for rect in sorted(rects, key = lambda rect: -rect.width * rect.height):
+        # A merged rectangle may now merge with one it was checked against, so keep
+        # going until nothing changes
+        current = rect
+        changed = True
+        while (changed is True):
+            changed = False
+            for index, other in enumerate(merged):
+                union = current.union(other)
+                if (union.width * union.height - current.width * current.height - other.width * other.height <= RECT_OVERHEAD):
+                    current = union
+                    del merged[index]
+                    changed = True
+                    break
+        merged.append(current)
+    return merged
+
+"""
+ " Optimise
+ "   Chooses how to push the drawn rectangles to the display. Returns the strategy
+ "   and the rectangles to push, which is the whole screen for UPDATE_FULL
+ "
+ "   @param rects: the rectangles drawn to the screen
+ "   @param screenRect: the rectangle of the whole screen
+"""
+def optimise(rects, screenRect):
+    clipped = [rect.clip(screenRect) for rect in rects]
+    clipped = [rect for rect in clipped if rect.width > 0 and rect.height > 0]
+    if (len(clipped) == 0):
+        return UPDATE_NONE, []
+
+    merged = merge(clipped)
+    screenArea = screenRect.width * screenRect.height
+    if (sum(rect.width * rect.height for rect in merged) >= FULL_UPDATE_COVERAGE * screenArea or getCost(merged) >= screenArea + RECT_OVERHEAD):
+        return UPDATE_FULL, [pygame.Rect(screenRect)]
+    if (len(merged) < len(clipped)):
+        return UPDATE_MERGED, merged
+    return UPDATE_RECTS, merged
+
+"""
+ " Present
+ "   Pushes the drawn rectangles to the display using the cheapest strategy and
+ "   returns the strategy and the rectangles pushed
+ "
+ "   @param rects: the rectangles drawn to the screen
+ "   @param screenRect: the rectangle of the whole screen
+ "   @param full: True to flip the whole display whatever was drawn (default = False)
+"""
+def present(rects, screenRect, full = False):
+    if (full is True):
+        strategy, rects = UPDATE_FULL, [pygame.Rect(screenRect)]
+    else:
+        strategy, rects = optimise(rects, screenRect)
+    if (strategy == UPDATE_FULL):
+        pygame.display.flip()
+    elif (strategy != UPDATE_NONE):
+        pygame.display.update(rects)
+    return strategy, rects
@@ -1,9 +1,7 @@
-import pygame, sys, math, datetime
-import ConfigParser
-import Generic
+import pygame, sys, math, datetime, numpy
+import Generic, Assets, Profiler, DirtyRects
 from Generic import *
 from pygame.sprite import *
-from random import randint
 
 """
  " Banner
@@ -17,10 +15,13 @@ class Banner(Sprite):
     rect = None                 # Banner rectangle
     power = None                # The current power percentage
     timeRemaining = 0           # The time remaining in seconds
-    startTimeRem = 0            # The number of seconds remaining at the start of the game
     points = None               # The number of points obtained
     windSpeed = None            # The wind speed in knots
     bannerFont = None           # Generic font for all banner text
+    textCache = {}              # Rendered text surfaces keyed by (field, value)
+    drawnValues = {}            # The value each field was last drawn with, keyed by field
+    drawnRects = {}             # The banner area each field was last drawn to, keyed by field
+    powerArea = None            # The banner area occupied by a full power gauge
 
     """
      " Constructor
@@ -31,13 +32,16 @@ class Banner(Sprite):
     """
     def __init__(self, power = 0, timeRemaining = 120, points = 0, windSpeed = 1):
         Sprite.__init__(self)
-        Banner.image = pygame.image.load("..\\Resources\\banner.png")
+        Banner.image = Assets.getImage("banner.png").copy()
         Banner.rect = Banner.image.get_rect()
         Banner.bannerFont = pygame.font.SysFont("Segoe UI Semibold", 20)
+        Banner.textCache = {}
+        Banner.drawnValues = {}
+        Banner.drawnRects = {}
+        Banner.powerArea = pygame.Rect(11, 10, 160, 20)
         Banner.power = power
         Banner.points = points
         Banner.timeRemaining = timeRemaining
-        Banner.startTimeRem = timeRemaining
         Banner.windSpeed = windSpeed
         
     """
@@ -55,66 +59,29 @@ class Banner(Sprite):
     def getPower(): return Banner.power
 
     """
-     " Adjust Points
-     "   This method increases or decreases the total number of points obtained
-     "   Upon a point change, the difficulty is re-evaluated
-     "
-     "   @param points: the number of points to increase (+ve) or decrease (-ve)
-    """
-    @staticmethod
-    def adjustPoints(points):
-        if (points < 0):
-            if (Banner.points < math.fabs(points)):
-                Banner.points = 0
-            else:
-                Banner.points += points
-        else:
-            Banner.points += points
-
-        # Re-evaluate the difficulty
-        Banner.adjustDifficulty(Banner.getPoints(), Banner.getTimeRemaining())
-    
-    """
-     " Reset Points
-     "   This method resets the number of points to zero
+     " Set Points
+     "   Sets the number of points shown
     """
     @staticmethod
-    def resetPoints(): Banner.points = 0
+    def setPoints(points): Banner.points = points
 
     """
      " Get Points
-     "   Gets the number of points currently scored by the user
+     "   Gets the number of points currently shown
     """
     @staticmethod
     def getPoints(): return Banner.points
 
     """
-     " Adjust Time Remaining
-     "   This method increases or decreases the total time remaining in the game
-     "
-     "   @param time: the number of second to increment (+ve) or decremenet (-ve)
-    """
-    @staticmethod
-    def adjustTimeRemaining(time):
-        if (time < 0):
-            if (Banner.timeRemaining < math.fabs(time)):
-                Banner.timeRemaining = 0
-            else:
-                Banner.timeRemaining += time
-        else:
-            Banner.timeRemaining += time
-    
-    """
-     " Reset Time Remaining
-     "   This method resets the time remaining to the number of seconds originally
-     "   passed to the constructor
+     " Set Time Remaining
+     "   Sets the number of seconds remaining shown
     """
     @staticmethod
-    def resetTimeRemaining(): Banner.timeRemaining = Banner.startTimeRem
+    def setTimeRemaining(timeRemaining): Banner.timeRemaining = timeRemaining
 
     """
      " Get Time Remaining
-     "   Gets the number of seconds remaining in the game
+     "   Gets the number of seconds remaining shown
     """
     @staticmethod
     def getTimeRemaining(): return Banner.timeRemaining
@@ -135,62 +102,101 @@ class Banner(Sprite):
     def getWindSpeed(): return Banner.windSpeed
 
     """
-     " Update
-     "   Updates the entire banner surface to reflect any changes in power, score,
-     "   time or wind speed
+     " Restore
+     "   Restores an area of the banner surface to the original banner image. The
+     "   area is cleared first so the original pixels, including their transparency,
+     "   are copied rather than blended
+     "
+     "   @param area: the area of the banner to restore
     """
     @staticmethod
-    def update():
-        # Reset the background image to preserve transparency
-        Banner.image = pygame.image.load("..\\Resources\\banner.png")
+    def restore(area):
+        Banner.image.fill((0, 0, 0, 0), area)
+        Banner.image.blit(Assets.getImage("banner.png"), area, area, pygame.BLEND_RGBA_MAX)
 
-        # Colour the time remaining according to limits
-        timeColour = (84, 223, 0)
-        if (Banner.timeRemaining <= 10):
-            timeColour = (222, 0, 4)
-        elif (Banner.timeRemaining <= 20):
-            timeColour = (255, 142, 0)
+    """
+     " Render Text
+     "   Gets the rendered surface for the text of a banner field, rendering it only
+     "   the first time the field shows that value
+     "
+     "   @param field: the name of the banner field
+     "   @param value: the value shown by the field
+    """
+    @staticmethod
+    def renderText(field, value):
+        text = Banner.textCache.get((field, value))
+        if (text is None):
+            if (field == "score"):
+                text = Banner.bannerFont.render("Score: " + str(value), True, (39, 39, 39))
+            elif (field == "time"):
+                # Colour the time remaining according to limits
+                timeColour = (84, 223, 0)
+                if (value <= 10):
+                    timeColour = (222, 0, 4)
+                elif (value <= 20):
+                    timeColour = (255, 142, 0)
+
+                # Calculate the minutes and seconds remaining in play
+                minsRemaining, secsRemaining = divmod(value, 60)
+                text = Banner.bannerFont.render("%02d:%02d" % (minsRemaining, secsRemaining), True, timeColour)
+            else:
+                text = Banner.bannerFont.render("Wind speed: " + str(value) + "kts", True, (39, 39, 39))
+            Banner.textCache[(field, value)] = text
+        return text
 
-        # Calculate the minutes and seconds remaining in play
-        minsRemaining, secsRemaining = divmod(Banner.timeRemaining, 60)
+    """
+     " Draw Field
+     "   Redraws a banner field if its value has changed since it was last drawn,
+     "   returning the area of the banner that changed or None
+     "
+     "   @param field: the name of the banner field
+     "   @param value: the value to show
+     "   @param position: the top-left position of the field text
+    """
+    @staticmethod
+    def drawField(field, value, position):
+        if (field in Banner.drawnValues and Banner.drawnValues[field] == value):
+            return None
 
-        # Power indicator rectangle creation
-        if (Banner.power != 0):
-            powerRect = pygame.Rect(11, 10, math.ceil(math.fabs(Banner.power) * 1.6), 20);
-            pygame.draw.rect(Banner.image, (math.fabs(math.floor((Banner.power) * 2.5)), 200, 70), powerRect, 0)
-
-        # Construct game status text
-        score = Banner.bannerFont.render("Score: " + str(Banner.points), True, (39, 39, 39))
-        time = Banner.bannerFont.render("%02d:%02d" % (minsRemaining, secsRemaining), True, timeColour)
-        windSpeed = Banner.bannerFont.render("Wind speed: " + str(Banner.windSpeed) + "kts", True, (39, 39, 39))
-        
-        # Draw updated text to the banner image
-        Banner.image.blit(score, (182, 5))
-        Banner.image.blit(time, (425, 5))
-        Banner.image.blit(windSpeed, (720, 5))
+        # Replace the previous text with the new text
+        text = Banner.renderText(field, value)
+        textRect = text.get_rect(topleft = position)
+        area = textRect.union(Banner.drawnRects.get(field, textRect))
+        Banner.restore(area)
+        Banner.image.blit(text, textRect)
 
-        # Check if the game has ended
-        if (Banner.getTimeRemaining() <= 0):
-            pygame.event.post(pygame.event.Event(Generic.EVENT_GAME_OVER))
+        # Record what is now shown
+        Banner.drawnValues[field] = value
+        Banner.drawnRects[field] = textRect
+        return area
 
     """
-     " Adjust Difficulty
-     "   Evaluates the current game state and adjusts the difficulty accordingly by
-     "   introducing wind changes and more butterflies
-     "
-     "   @param points: the number of points currently obtained
-     "   @param timeRemaining: the number of seconds remaining in the game
+     " Update
+     "   Updates the parts of the banner surface affected by changes in power, score,
+     "   time or wind speed since the last update. The areas of the screen that
+     "   changed are returned
     """
     @staticmethod
-    def adjustDifficulty(points, timeRemaining):
-        if ((points % 100 is 0) or (points % 100 is 1)):
-            for index, diff in enumerate(Generic.DIFFICULTY):
-                Generic.DIFFICULTY[index] = (diff[0], diff[1], diff[2], False)
-        else:
-            for index, diff in enumerate(Generic.DIFFICULTY):
-                if ((diff[3] is False) and (diff[0] is points)):
-                    Generic.DIFFICULTY[index] = (diff[0], diff[1], diff[2], True)
-                    pygame.event.post(pygame.event.Event(Generic.EVENT_DIFFICULTY_ADJUSTMENT, { 'windSpeedAdjustment': diff[1], 'addButterfly': diff[2] }))
+    def update():
+        changedAreas = []
+
+        # Power indicator rectangle creation
+        if ("power" not in Banner.drawnValues or Banner.drawnValues["power"] != Banner.power):
+            Banner.restore(Banner.powerArea)
+            if (Banner.power != 0):
+                powerRect = pygame.Rect(11, 10, math.ceil(math.fabs(Banner.power) * 1.6), 20);
+                pygame.draw.rect(Banner.image, (math.fabs(math.floor((Banner.power) * 2.5)), 200, 70), powerRect, 0)
+            Banner.drawnValues["power"] = Banner.power
+            changedAreas.append(Banner.powerArea)
+
+        # Draw updated text to the banner image
+        for field, value, position in (("score", Banner.points, (182, 5)), ("time", Banner.timeRemaining, (425, 5)), ("wind", Banner.windSpeed, (720, 5))):
+            area = Banner.drawField(field, value, position)
+            if (area is not None):
+                changedAreas.append(area)
+
+        # Report the changed areas in screen coordinates
+        return [area.move(Banner.rect.topleft) for area in changedAreas]
 
 
 """
@@ -207,7 +213,7 @@ class Grass(Sprite):
     def __init__(self):
         Sprite.__init__(self)
         if (Grass.image is None):
-            Grass.image = pygame.image.load("..\\Resources\\grass.png")
+            Grass.image = Assets.getImage("grass.png")
         Grass.rect = [0, 415]
 
 
@@ -222,7 +228,7 @@ class Ground(Sprite):
     def __init__(self):
         Sprite.__init__(self)
         if (Ground.image is None):
-            Ground.image = pygame.image.load("..\\Resources\\ground.png")
+            Ground.image = Assets.getImage("ground.png")
         Ground.rect = [0, 487]
 
 """
@@ -236,7 +242,7 @@ class Tree(Sprite):
     def __init__(self):
         Sprite.__init__(self)
         if (Tree.image is None):
-            Tree.image = pygame.image.load("..\\Resources\\tree.png")
+            Tree.image = Assets.getImage("tree.png")
         Tree.rect = [572, 78]
 
 
@@ -251,7 +257,7 @@ class ArcherLegs(Sprite):
     def __init__(self):
         Sprite.__init__(self)
         if (ArcherLegs.image is None):
-            ArcherLegs.image = pygame.image.load("..\\Resources\\archerLegs.png")
+            ArcherLegs.image = Assets.getImage("archerLegs.png")
         ArcherLegs.rect = [40, 410]
 
 """
@@ -259,394 +265,284 @@ class ArcherLegs(Sprite):
  "   Object defining the upper rotatable section of the archer
 """
 class ArcherTorso(Sprite):
-    image = None    # Archer torso image
-    rect = None     # Archer torso rectangle
+    image = None        # Archer torso image
+    rect = None         # Archer torso rectangle
+    mask = None         # Archer torso mask at the current angle
+    rotations = None    # Rotations of the torso image covering the aiming range
 
     def __init__(self):
         Sprite.__init__(self)
         if (ArcherTorso.image is None):
-            ArcherTorso.image = pygame.image.load("..\\Resources\\archerTorso.png")
+            ArcherTorso.image = Assets.getImage("archerTorso.png")
+        if (ArcherTorso.rotations is None):
+            ArcherTorso.rotations = Assets.RotationCache("archerTorso.png")
+            ArcherTorso.rotations.fill(Generic.AIM_ANGLE_MIN, Generic.AIM_ANGLE_MAX)
         ArcherTorso.rect = ArcherTorso.image.get_rect()
         ArcherTorso.rect.x = -2
         ArcherTorso.rect.y = 305
 
     """
      " Update
-     "   Updates the angle of the archer torso. The image is reloaded to avoid
-     "   bluring
+     "   Updates the angle of the archer torso. Rotations are taken from the cache,
+     "   which always rotates the original image to avoid bluring
      "
      "   @param angle: the angle in radians to rotate the archer torso by
     """
     def update(self, angle):
-        self.image = pygame.image.load("..\\Resources\\archerTorso.png")
-        self.image, self.rect = rotateCenter(self.image, self.rect, math.degrees(angle))
+        self.image, self.mask, self.rect = ArcherTorso.rotations.rotateCenter(self.rect, math.degrees(angle))
 
 """
  " Arrow Sprite
- "   Sprite defining functionality for an arrow and the flight of an arrow. Air
- "   resistance is not taken into account.
+ "   Sprite drawing an arrow of the simulation at its current position and angle
 """
 class Arrow(Sprite):
+    rotations = None            # Rotations of the arrow image shared by every arrow sprite
     image = None                # Arrow image
     rect = None                 # Arrow rectangle
-    fired = False               # True if the arrow has been fired
-    flying = False              # True if the arrow is in a flying state
-    initialVelocity = 0         # The velocity that the arrow was fired at (in meters per second)
-    initialPosition = [0, 0]    # The initial position of the arrow
-    previousCenter = [0, 0]     # The previous center location of the arrow
+    mask = None                 # Arrow mask at the current angle
+    state = None                # The simulated arrow (see Simulation.ArrowState)
 
     """
      " Constructor
+     "   @param state: the simulated arrow to draw
     """
-    def __init__(self):
+    def __init__(self, state):
         Sprite.__init__(self)
-        if (Arrow.image is None):
-            Arrow.image = pygame.image.load("..\\Resources\\arrow.png")
-        self.rect = self.image.get_rect()
-        self.update(0)
+        if (Arrow.rotations is None):
+            Arrow.rotations = Assets.RotationCache("arrow.png")
+            Arrow.rotations.fill(Generic.AIM_ANGLE_MIN, Generic.AIM_ANGLE_MAX)
+        self.state = state
+        self.update()
 
     """
      " Update
-     "   Updates the arrow position and angle based on the previous location
-     "   of the arrow
-     "   
-     "   @param angle: the angle of the arrow in radians
-    """
-    def update(self, angle):
-        # Reload the image to prevent bluring
-        self.image = pygame.image.load("..\\Resources\\arrow.png")
-
-        # Static rotation
-        if (self.flying == False):
-            self.rect = self.image.get_rect()
-            self.rect.center = [-4, 364]
-            self.rect.x, self.rect.y = rotatePoint(self.rect, [24, 410], angle)
-
-        # Rotate the arrow about the center
-        self.image, self.rect = rotateCenter(self.image, self.rect, math.degrees(angle))
-        self.previousCenter = self.rect.center
-
-    """
-     " Fire
-     "   Fires the arrow, saving the initial velocity and initial position for
-     "   further calculations
-     "
-     "   @param power: the percentage of power when the mouse was released
-     "   @param windSpeed: the current wind speed
-    """
-    def fire(self, power, windSpeed):
-        self.fired = True
-        self.flying = True
-        self.initialVelocity = calculateVelocity(power, windSpeed)
-        self.initialPosition = self.rect.center
-        
-    """
-     " Fly
-     "   Moves and rotates the arrow along the parabolic path calculated with
-     "   standard equations of motion, excluding any effects of air resistance
+     "   Updates the arrow image and position to match the simulated arrow. The
+     "   image is the rotation of the same bucket as the simulated mask, so it has
+     "   the size of the simulated rectangle
      "
-     "   @param time: seconds since the arrow was fired
-     "   @param initialAngle: initial angle that the arrow was fired at
-     "   @param angle: the angle at the current time
+     "   @param alpha: the fraction of a simulation step to draw ahead of the previous step (default = 1)
     """
-    def fly(self, time, initialAngle):
-        if (time != 0):
-            # Calculation of arrow position
-            x = self.initialVelocity * time * math.cos(initialAngle)
-            y = self.initialVelocity * time * math.sin(initialAngle) - ((Generic.ACCELERATION_DUE_TO_GRAVITY * math.pow(time, 2)) / 2)
-
-            # Apply the changes
-            self.rect.centerx = (x * Generic.PIXELS_PER_METER) + self.initialPosition[0]
-            self.rect.centery = self.initialPosition[1] - (y * Generic.PIXELS_PER_METER)
-
-            # Rotate the arrow
-            angle = -(math.atan2(self.previousCenter[1] - self.rect.centery, self.previousCenter[0] - self.rect.centerx)) + math.pi
-            self.update(angle)
-
-            # Checks the bounds of the arrow
-            if (self.rect.bottom >= Generic.WINDOW_HEIGHT - 16) or (self.rect.left > Generic.WINDOW_WIDTH) or (self.rect.right < 0):
-                self.flying = False
+    def update(self, alpha = 1):
+        self.image = Arrow.rotations.get(math.degrees(self.state.angle))[0]
+        self.mask = self.state.mask
+        self.rect = self.state.getRenderRect(alpha)
 
 
 """
- " Cloud Sprite
- "   Generic sprite for several types of clouds
+ " Cloud Strip
+ "   Every cloud drawn once into a single strip that wraps around as it scrolls.
+ "   The position is kept to a fraction of a pixel so slow winds still move the
+ "   clouds at the right speed, and the strip is drawn at the nearest whole pixel
 """
-class Cloud(Sprite):
-    image = None    # Cloud image
-    rect = None     # Cloud rectangle
-
+class CloudStrip(object):
     """
      " Constructor
-     "   @param image: the location of the cloud image to load
-     "   @param location: the top-left location of the cloud
+     "   @param clouds: list of (file name of the cloud image resource, top-left location)
     """
-    def __init__(self, image, location):
-        Sprite.__init__(self)
-        self.image = pygame.image.load(image)
-        self.rect = self.image.get_rect()
-        self.rect.topleft = location
+    def __init__(self, clouds):
+        images = [(Assets.getImage(name), location) for name, location in clouds]
+        left = min(location[0] for image, location in images)
+        right = max(location[0] + image.get_width() for image, location in images)
+        bottom = min(max(location[1] + image.get_height() for image, location in images), Generic.WINDOW_HEIGHT)
+
+        # The strip repeats every period, which is never less than the width of the window
+        self.period = max(right - left, Generic.WINDOW_WIDTH)
+        self.image = pygame.Surface((self.period, bottom), pygame.SRCALPHA).convert_alpha()
+        self.image.fill((0, 0, 0, 0))
+        for image, location in images:
+            self.image.blit(image, (location[0] - left, location[1]))
+        self.rect = pygame.Rect(0, 0, Generic.WINDOW_WIDTH, bottom)    # The part of the screen covered by clouds
+        self.offset = float(left)                                       # The screen x coordinate of the start of the strip
 
     """
-     " Update
-     "   Updates the position of the cloud, wrapping round if the rectangle
-     "   travels off the renderable area
+     " Get Position
+     "   Gets the whole pixel the strip is drawn from
+    """
+    def getPosition(self):
+        return int(math.floor(self.offset))
+
+    """
+     " Move
+     "   Scrolls the strip, wrapping round after each period
      "
-     "   @param cloudSpeed: the speed of the clouds
+     "   @param distance: the number of pixels to move right, which may be a fraction
     """
-    def update(self, cloudSpeed):
-        self.rect.x += cloudSpeed
-        if (self.rect.left > Generic.WINDOW_WIDTH):
-            self.rect.right = 0
-        elif (self.rect.right < 0):
-            self.rect.left = Generic.WINDOW_WIDTH
+    def move(self, distance):
+        self.offset = (self.offset + distance) % self.period
+
+    """
+     " Draw
+     "   Draws the strip over a part of the screen covered by clouds
+     "
+     "   @param surface: the surface to draw onto
+     "   @param rect: the part of the surface to draw, inside the cloud rectangle
+    """
+    def draw(self, surface, rect):
+        position = self.getPosition()
+        x = rect.left
+        while (x < rect.right):
+            sourceX = (x - position) % self.period
+            width = min(rect.right - x, self.period - sourceX)
+            surface.blit(self.image, (x, rect.top), (sourceX, rect.top - self.rect.top, width, rect.height))
+            x += width
 
 """
  " Apple Sprite
- "   Generic sprite to randomise apple colour and handle the collision of arrow
- "   and apple by showing a hitsplat
+ "   Sprite drawing an apple of the simulation, showing a hitsplat in place of the
+ "   apple when it is hit
 """
 class Apple(Sprite):
     image = None        # Apple image
     rect = None         # Apple rectangle
-    mask = None         # Generic apple mask for pixel-perfect collisions
-    appleHit = False    # True if the apple has been hit
-    appleType = 0       # The apple type (see Generic.APPLE_*)
-    splat = None        # The apple splat graphic
-    splatXPos = 0       # The current X-position in the hitsplat sheet
-    pointsPerApple = 0  # The number of points awarded per apple hit (type dependant)
-    timePerApple = 0    # The number of seconds awarded per apple hit (type dependant)
-    appleInitTicks = 0  # The number of game ticks when the apple was last changed
-    appleTimeout = 0    # The number of milliseconds the apple lives for before changing type
+    state = None        # The simulated apple (see Simulation.AppleState)
+    timeline = None     # The timeline playing the hitsplat (see Animation.Timeline)
+    generation = 0      # The generation of the simulated apple currently shown
+    splatting = False   # True once the hitsplat has started
+    splat = None        # The apple hitsplat sprite sheet
+    animation = None    # The hitsplat animation while it is playing
 
     """
      " Constructor
-     "   @param location: the center location of the apple
-     "   @param time: number of game ticks when the apple was initialised
+     "   @param state: the simulated apple to draw
+     "   @param timeline: the timeline to play the hitsplat on
     """
-    def __init__(self, location, time):
+    def __init__(self, state, timeline):
         Sprite.__init__(self)
-        self.load(location, time)
-        if (Apple.mask is None):
-            Apple.mask = pygame.mask.from_surface(self.image)
+        self.state = state
+        self.timeline = timeline
+        self.load()
 
     """
      " Load
-     "   Loads the core settings for an individual apple. Type and timeout
-     "   are randomised and all other resources are loaded according to this
-     "   random selection
-     "
-     "   @param location: the center location of the apple
-     "   @param time: number of game ticks when the apple was initialised
-    """
-    def load(self, location, time):
-        # Randomise the apple type and timeout
-        self.appleType = randint(Generic.APPLE_GOOD, Generic.APPLE_SPECIAL)
-        self.appleTimeout = randint((((-self.appleType + 2) * 3000) + 1000), 20000)
-
-        # Record the initial settings
-        self.appleInitTicks = time
-        self.appleHit = False
-        self.splatXPos = 0
-
-        # Load the appropriate apple and hitplat resources
-        if (self.appleType == Generic.APPLE_BAD):
-            self.image = pygame.image.load("..\\Resources\\appleBad.png")
-            self.splat = pygame.image.load("..\\Resources\\hitsplatBrown.png")
-            self.pointsPerApple = Generic.POINTS_PER_BAD_APPLE
-            self.timePerApple = Generic.TIME_PER_BAD_APPLE
-        elif (self.appleType == Generic.APPLE_SPECIAL):
-            self.image = pygame.image.load("..\\Resources\\appleSpecial.png")
-            self.splat = pygame.image.load("..\\Resources\\hitsplatBlue.png")
-            self.pointsPerApple = Generic.POINTS_PER_SPECIAL_APPLE
-            self.timePerApple = Generic.TIME_PER_SPECIAL_APPLE
-        else:
-            self.image = pygame.image.load("..\\Resources\\appleGood.png")
-            self.splat = pygame.image.load("..\\Resources\\hitsplatRed.png")
-            self.pointsPerApple = Generic.POINTS_PER_GOOD_APPLE
-            self.timePerApple = Generic.TIME_PER_GOOD_APPLE
-
-        # Store and update the location of the apple
-        self.rect = self.image.get_rect()
-        self.rect.center = location
+     "   Loads the apple and hitsplat resources for the type of the simulated apple,
+     "   stopping any hitsplat of the previous apple
+    """
+    def load(self):
+        if (self.animation is not None):
+            self.timeline.stop(self.animation)
+            self.animation = None
+        self.generation = self.state.generation
+        self.splatting = False
+        self.splat = Assets.getSpriteSheet(Generic.APPLE_SPLATS[self.state.appleType], 47, 62)
+        self.image = Assets.getImage(Generic.APPLE_IMAGES[self.state.appleType])
+        self.rect = self.state.rect.copy()
 
     """
-     " Hit
-     "   Triggers a hitsplat to show in place of the apple, giving feedback to the user
-     "   regarding the success of their shot
+     " Sync
+     "   Follows changes to the simulated apple, reloading it when it changed type
+     "   and starting the hitsplat when it was hit
     """
-    def hit(self):
-        if (self.appleHit is False):
-            # Update the sprite surface
-            self.rect, self.image = Generic.getImagePart(self.rect, self.image, self.splat, 62, 47, self.splatXPos, self.rect.center)
-            
-            # Add 500ms to the timeout to avoid double-hitting
-            self.appleTimeout += 500
-
-            # Trigger an event to update the hitsplat in further loops
-            pygame.event.post(pygame.event.Event(Generic.EVENT_APPLE_HIT, { 'apple': self }))
-
-            # Update the score
-            Banner.adjustPoints(self.pointsPerApple)
-            Banner.adjustTimeRemaining(self.timePerApple)
-            self.appleHit = True
+    def sync(self):
+        if (self.generation != self.state.generation):
+            self.load()
+        if (self.state.appleHit is True and self.splatting is False):
+            self.hit()
 
     """
-     " Update
-     "   Updates the hitsplat. It is assumed that this method will be called only when
-     "   the apple has been hit, this condition is not checked
+     " Hit
+     "   Plays a hitsplat in place of the apple, giving feedback to the user regarding
+     "   the success of their shot. The apple is left blank once the hitsplat ends
     """
-    def update(self):
-        # Move to the next sprite on the sheet
-        self.splatXPos += 47
-
-        # Update the sprite surface
-        self.rect, self.image = Generic.getImagePart(self.rect, self.image, self.splat, 62, 47, self.splatXPos, self.rect.center)
-
-        # Only request further updates while there are sprites to draw
-        if (self.splatXPos < 752):
-            pygame.event.post(pygame.event.Event(Generic.EVENT_APPLE_HIT, { 'apple': self }))
+    def hit(self):
+        self.splatting = True
+        self.rect = self.splat.getRect(self.rect.center)
+        self.animation = self.timeline.play(self.splat, Generic.SPLAT_FRAME_TIME, target = self, onComplete = self.splatComplete)
 
     """
-     " Change
-     "   Reloads the apple provided the current apple has timed out
+     " Splat Complete
+     "   Called by the timeline once the hitsplat has finished
+     "
+     "   @param animation: the finished animation
     """
-    def change(self, thisFrameTicks):
-        if (thisFrameTicks > (self.appleInitTicks + self.appleTimeout)):
-            self.load(self.rect.center, thisFrameTicks)
+    def splatComplete(self, animation):
+        self.animation = None
 
 """
- " Butterfly Sprite
- "   Animated sprite flips between three images drawn on butterfly*.png graphics. A
- "   generic hitplat is shown when the butterfly is hit.
+ " Butterfly Swarm
+ "   Draws every butterfly of a simulated swarm (see Simulation.ButterflySwarm) in
+ "   one batch of blits rather than as a sprite each. Butterflies hit by an arrow are
+ "   replaced by a hitsplat sprite, which the renderer adds to its layered group
 """
-class Butterfly(Sprite):
-    image = None			# Current butterfly image
-    rect = None				# Butterfly rectangle
-    mask = None				# Mask of the largest butterfly sprite
-    butterflyHit = False	# True if the butterfly has been hit
-    butterflyHitTicks = 0   # Number of game ticks when the butterfly was hit
-    butterflyType = 0		# The butterfly type (see Generic)
-    butterfly = None		# Butterfly sprite sheet
-    butterflyXPos = 0		# Current X position on the butterfly sprite sheet
-    splat = None			# The butterfly splat sprite sheet
-    splatXPos = 0			# Current X position on the splat sprite sheet
-    pointsPerButterfly = 0	# Points awarded for hitting a butterfly
-    timePerButterfly = 0	# Time awarded for hitting a butterfly
-    initialTicks = 0		# Number of game ticks when the sprite was initialised
-    butterflyTimeout = 0    # Number of game ticks after the initial path to
-    butterflyFlightTime = 0 # Number of game ticks the butterfly will be flying for
-    butterflyPath = 0       # Butterfly path ID (see Generic.BUTTERFLY_PATH)
-
+class ButterflySwarm(object):
     """
      " Constructor
-     "   @param time: number of ticks when the butterfly is initialised
+     "   @param swarm: the simulated swarm to draw
+     "   @param timeline: the timeline to play the hitsplats on
     """
-    def __init__(self, time):
-        Sprite.__init__(self)   # Initialise the sprite
-        self.load(time)         # Load a butterfly onto the surface
+    def __init__(self, swarm, timeline):
+        self.swarm = swarm
+        self.timeline = timeline
+        self.frames = [[Assets.getSpriteSheet(name, swarm.width, swarm.height).getFrame(index) for index in range(swarm.frameCount)] for name in Generic.BUTTERFLY_IMAGES]
+        self.splat = Assets.getSpriteSheet("hitsplatOrange.png", 92, 65)
+        self.generations = numpy.zeros(0, dtype = int)  # The generation of each butterfly when it was last updated
+        self.splatted = numpy.zeros(0, dtype = bool)    # True once the hitsplat of each butterfly has started
+        self.blits = []                                 # The (image, position) of every butterfly drawn
+        self.rects = []                                 # The rectangle of every butterfly drawn
 
-        # Mask the default butterfly position
-        if (Butterfly.mask is None):
-            Butterfly.mask = pygame.mask.from_surface(self.image)
-        
     """
-     " Load
-     "   Clears the changable variables and randomises the butterfly type and colour to
-     "   create the appearance of a new butterfly instance.
+     " Update
+     "   Moves the drawn butterflies to match the simulated swarm and starts the
+     "   hitsplats of butterflies hit by an arrow, returning the new hitsplat sprites
      "
-     "   @param time: number of ticks when the butterfly is initialised
-    """
-    def load(self, time):
-        # General instance varaible initialisation
-        self.butterflyHitTicks = 0
-        self.butterflyXPos = 0
-        self.splatXPos = 0
-        self.butterflyType = randint(Generic.BUTTERFLY_ORANGE, Generic.BUTTERFLY_YELLOW)
-        self.butterflyTimeout = randint(((-self.butterflyType + 2) * 6000) + 1000, 15000)
-        self.butterflyPath = randint(0, len(Generic.BUTTERFLY_PATH) - 1)
-        self.butterflyFlightTime = randint((len(Generic.BUTTERFLY_PATH[self.butterflyPath]) * 1000) - 1000, (len(Generic.BUTTERFLY_PATH[self.butterflyPath]) * 1000) + 3000)
-        self.splat = pygame.image.load("..\\Resources\\hitsplatOrange.png")
-        self.initialTicks = time
-        self.butterflyHit = False
-        self.splatXPos = 0
-        self.pointsPerButterfly = Generic.POINTS_PER_BUTTERFLY
-        self.timePerButterfly = Generic.TIME_PER_BUTTERFLY
-
-        # Load the appropriate butterfly resources
-        if (self.butterflyType == Generic.BUTTERFLY_ORANGE):
-            self.butterfly = pygame.image.load("..\\Resources\\butterflyOrange.png")
-        elif (self.butterflyType == Generic.BUTTERFLY_PINK):
-            self.butterfly = pygame.image.load("..\\Resources\\butterflyPink.png")
-        else:
-            self.butterfly = pygame.image.load("..\\Resources\\butterflyYellow.png")
-        
-        # Update the sprite surface
-        self.rect, self.image = Generic.getImagePart(self.rect, self.image, self.butterfly, 26, 35, self.butterflyXPos)
-        
-    """
-     " Hit
-     "   Triggers the hitsplat for the butterfly and adjusts the points and time accordingly
-     "   An event is posted to the main loop so the hitsplat can be drawn again in further loops
+     "   @param alpha: the fraction of a simulation step to draw ahead of the previous step (default = 1)
+    """
+    def update(self, alpha = 1):
+        swarm = self.swarm
+        if (len(self.generations) < len(swarm)):
+            self.generations = numpy.append(self.generations, numpy.zeros(len(swarm) - len(self.generations), dtype = int))
+            self.splatted = numpy.append(self.splatted, numpy.zeros(len(swarm) - len(self.splatted), dtype = bool))
+
+        # A butterfly loaded again may be hit again
+        self.splatted[self.generations != swarm.generations] = False
+        self.generations[:] = swarm.generations
+        shot = numpy.flatnonzero(swarm.shot & ~self.splatted)
+        self.splatted[shot] = True
+        splats = [ButterflySplat(self.splat, (swarm.x[index], swarm.y[index]), self.timeline) for index in shot]
+
+        visible = numpy.flatnonzero(~swarm.gone)
+        lefts, tops = swarm.getRenderPositions(alpha)
+        lefts, tops = lefts[visible].tolist(), tops[visible].tolist()
+        self.blits = [(self.frames[butterflyType][frame], (left, top)) for butterflyType, frame, left, top in zip(swarm.types[visible].tolist(), swarm.frames[visible].tolist(), lefts, tops)]
+        self.rects = [pygame.Rect(left, top, swarm.width, swarm.height) for left, top in zip(lefts, tops)]
+        return splats
+
+    """
+     " Draw
+     "   Draws every butterfly
+     "
+     "   @param surface: the surface to draw onto
     """
-    def hit(self, thisFrameTicks):
-        if (self.butterflyHit is False):
-            # Record the hit
-            self.butterflyHit = True
-            self.butterflyHitTicks = thisFrameTicks
+    def draw(self, surface):
+        surface.blits(self.blits, False)
 
-            # Update the sprite surface
-            self.rect, self.image = Generic.getImagePart(self.rect, self.image, self.splat, 65, 92, self.splatXPos, self.rect.center)
-        
-            # Post an event to update the hitsplat in the next loop
-            pygame.event.post(pygame.event.Event(Generic.EVENT_BUTTERFLY_HIT, { 'butterfly': self }))
-
-            # Update the score
-            Banner.adjustPoints(self.pointsPerButterfly)
-            Banner.adjustTimeRemaining(self.timePerButterfly)
+"""
+ " Butterfly Splat
+ "   This sprite plays the hitsplat of a butterfly hit by an arrow, removing itself
+ "   once the hitsplat ends
+"""
+class ButterflySplat(Sprite):
+    image = None        # Current hitsplat frame
+    rect = None         # Hitsplat rectangle
 
     """
-     " Update
-     "   Updates the butterfly image and location based on a random selection from preset Bezier
-     "   curves defined in Generic.BUTTERFLY_PATH.
-     "
-     "   @param thisFrameTicks: the ticks when the function was called
+     " Constructor
+     "   @param sheet: the hitsplat sprite sheet
+     "   @param center: the center of the butterfly when it was hit
+     "   @param timeline: the timeline to play the hitsplat on
     """
-    def update(self, thisFrameTicks):
-        if (self.butterflyHit is False):
-            # Loop back to the start of the image if we reached the end
-            if (self.butterflyXPos == 70):
-                self.butterflyXPos = 0
-        
-            # Update the sprite surface
-            self.rect, self.image = Generic.getImagePart(self.rect, self.image, self.butterfly, 26, 35, self.butterflyXPos)
-            self.butterflyXPos += 35
+    def __init__(self, sheet, center, timeline):
+        Sprite.__init__(self)
+        self.rect = sheet.getRect(center)
+        timeline.play(sheet, Generic.SPLAT_FRAME_TIME, target = self, onComplete = self.splatComplete)
 
-            # Move the butterfly until the timeout has been reached
-            if ((thisFrameTicks - self.initialTicks) < self.butterflyFlightTime):
-                self.rect.center = getBezierPoint((thisFrameTicks - self.initialTicks) / (self.butterflyFlightTime * 1.0), Generic.BUTTERFLY_PATH[self.butterflyPath])
-            else:
-                self.butterflyHit = True
-                self.butterflyHitTicks = thisFrameTicks
-                self.rect.center = [-50, -50]
-        elif (thisFrameTicks - self.butterflyHitTicks > self.butterflyTimeout):
-            self.load(thisFrameTicks)
-        
     """
-     " Update Splat
-     "   Updates the splat graphic at a fixed location, the point where the butterfly was hit.
-     "   A new event is posted to keep the splat updating while there are more images to show.
+     " Splat Complete
+     "   Called by the timeline once the hitsplat has finished
+     "
+     "   @param animation: the finished animation
     """
-    def updateSplat(self):
-        # Update the sprite surface
-        self.rect, self.image = Generic.getImagePart(self.rect, self.image, self.splat, 65, 92, self.splatXPos, self.rect.center)
-
-        # Move along to the next image
-        self.splatXPos += 92
-
-        # Post an event to update the hitsplat in the next loop
-        if (self.splatXPos <= 1472):
-            pygame.event.post(pygame.event.Event(Generic.EVENT_BUTTERFLY_HIT, { 'butterfly': self }))
+    def splatComplete(self, animation):
+        self.kill()
 
 """
  " Pause Overlay
@@ -660,7 +556,7 @@ class Pause(Sprite):
     def __init__(self):
         Sprite.__init__(self)
         if (Pause.image is None):
-            Pause.image = pygame.image.load("..\\Resources\\pause.png")
+            Pause.image = Assets.getImage("pause.png")
         Pause.rect = Pause.image.get_rect()
 
 """
@@ -675,9 +571,65 @@ class Help(Sprite):
     def __init__(self):
         Sprite.__init__(self)
         if (Help.image is None):
-            Help.image = pygame.image.load("..\\Resources\\help.png")
+            Help.image = Assets.getImage("help.png")
         Help.rect = Help.image.get_rect()
 
+"""
+ " Profiler Overlay
+ "   This sprite shows the rolling median and 99th percentile time of each phase of
+ "   a frame, along with the dirty rectangles pushed to the display. The text is
+ "   only rendered again every Profiler.PROFILER_OVERLAY_REFRESH frames
+"""
+class ProfilerOverlay(Sprite):
+    image = None            # Profiler overlay image
+    rect = None             # Profiler overlay rectangle
+    profiler = None         # The profiler being shown (see Profiler.Profiler)
+    font = None             # The overlay font
+    renderedFrame = None    # The profiler frame count when the text was last rendered
+
+    """
+     " Constructor
+     "   @param profiler: the profiler to show
+    """
+    def __init__(self, profiler):
+        Sprite.__init__(self)
+        self.profiler = profiler
+        self.font = pygame.font.SysFont("Consolas", 12)
+        self.image = pygame.Surface((Profiler.PROFILER_OVERLAY_WIDTH, (len(Profiler.PROFILER_PHASES) + 6) * self.font.get_linesize() + 10), pygame.SRCALPHA)
+        self.rect = self.image.get_rect(topright = (Generic.WINDOW_WIDTH - 10, 45))
+        self.update()
+
+    """
+     " Update
+     "   Renders the latest timings once enough frames have passed since they were
+     "   last rendered
+    """
+    def update(self):
+        if (self.renderedFrame is not None and self.profiler.frameCount - self.renderedFrame < Profiler.PROFILER_OVERLAY_REFRESH):
+            return
+        self.renderedFrame = self.profiler.frameCount
+
+        # Build the table of timings, in milliseconds
+        median = self.profiler.getPercentiles(50)
+        worst = self.profiler.getPercentiles(99)
+        rows = [("phase (ms)", "p50", "p99")]
+        for name in ["total"] + Profiler.PROFILER_PHASES:
+            rows.append((name, "%.2f" % median.get(name, 0), "%.2f" % worst.get(name, 0)))
+        rows.append(("dirty rects", "%d" % median.get("rects", 0), "%d" % worst.get("rects", 0)))
+        rows.append(("dirty area (kpx)", "%d" % (median.get("area", 0) // 1000), "%d" % (worst.get("area", 0) // 1000)))
+        rows.append(("over %.0fms" % Profiler.FRAME_BUDGET, "%d" % self.profiler.getOverBudget(), "/ %d" % len(self.profiler.getFrames())))
+        strategies = self.profiler.getStrategyCounts()
+        rows.append(("merged / full", "%d" % strategies.get(DirtyRects.UPDATE_MERGED, 0), "%d" % strategies.get(DirtyRects.UPDATE_FULL, 0)))
+
+        # Draw the table on a translucent background, right aligning the numbers
+        self.image.fill((0, 0, 0, 170))
+        for index, row in enumerate(rows):
+            y = 5 + index * self.font.get_linesize()
+            self.image.blit(self.font.render(row[0], True, (255, 255, 255)), (5, y))
+            for column, right in [(1, self.rect.width - 65), (2, self.rect.width - 5)]:
+                text = self.font.render(row[column], True, (255, 255, 255))
+                self.image.blit(text, text.get_rect(topright = (right, y)))
+
 """
  " Restart Overlay
  "   This sprite implements the restart overlay graphic. The user's score and current
@@ -693,24 +645,20 @@ class Restart(Sprite):
 
     """
      " Constructor
+     "   @param points: the points scored in the game that ended
+     "   @param highscore: the highscore, including the game that ended
     """
-    def __init__(self):
+    def __init__(self, points, highscore):
         Sprite.__init__(self)
-        self.image = pygame.image.load("..\\Resources\\restart.png")
+        self.image = Assets.getImage("restart.png").copy()
 
         # Initialise the fonts
         self.scoreFont = pygame.font.SysFont("Segoe UI Semibold", 140)
         self.highscoreFont = pygame.font.SysFont("Segoe UI Semibold", 14)
         self.rect = self.image.get_rect()
 
-        # Get the highscore
-        highscore = Restart.getHighscore()
-        if (Banner.getPoints() > highscore):
-            highscore = Banner.getPoints()
-            Restart.updateHighscore(highscore)
-
         # Construct text
-        score = self.scoreFont.render(str(Banner.points), True, (255, 255, 255))
+        score = self.scoreFont.render(str(points), True, (255, 255, 255))
         highscore = self.highscoreFont.render("Highscore: " + str(highscore), True, (255, 255, 255))
         
         # Position the text in the center of the window
@@ -720,26 +668,3 @@ class Restart(Sprite):
         # Draw updated text to the surface
         self.image.blit(score, scoreRect)
         self.image.blit(highscore, highscoreRect)
-
-    """
-     " Get Highscore
-     "   Gets the current highscore stored in settings.ini
-    """
-    @staticmethod
-    def getHighscore():
-        config = ConfigParser.RawConfigParser()
-        config.read('settings.ini')
-        return config.getint('SCORE', 'highscore')
-
-    """
-     " Update Highscore
-     "   Updates the current highscore stored in settings.ini
-     "   @param highscore: the new highscore to write
-    """
-    @staticmethod
-    def updateHighscore(highscore):
-        config = ConfigParser.RawConfigParser()
-        config.add_section('SCORE')
-        config.set('SCORE', 'highscore', str(highscore))
-        with open('settings.ini', 'wb') as configfile:
-            config.write(configfile)
@@ -1,4 +1,4 @@
-import pygame, math
+import os, math
 
 """
  " Constants
@@ -7,6 +7,7 @@ import pygame, math
 WINDOW_WIDTH                =   900
 WINDOW_HEIGHT               =   500
 FRAMERATE                   =   30
+PHYSICS_RATE                =   125     # Fixed simulation steps per second
 
 # Gameplay properties
 POINTS_PER_GOOD_APPLE       =   1
@@ -18,6 +19,10 @@ TIME_PER_SPECIAL_APPLE      =   5
 POINTS_PER_BUTTERFLY        =   0
 TIME_PER_BUTTERFLY          =   -20
 
+# Aiming limits in degrees
+AIM_ANGLE_MIN               =   -42
+AIM_ANGLE_MAX               =   49
+
 # Power gauge speed modifier
 POWER_MODIFIER              =   6
 
@@ -26,16 +31,19 @@ APPLE_GOOD                  =   0
 APPLE_BAD                   =   1
 APPLE_SPECIAL               =   2
 
+# Milliseconds each frame of the animations is shown for
+BUTTERFLY_FRAME_TIME        =   33
+SPLAT_FRAME_TIME            =   33
+
 # Butterfly types
 BUTTERFLY_ORANGE            =   0
 BUTTERFLY_PINK              =   1
 BUTTERFLY_YELLOW            =   2
 
-# User events
-EVENT_APPLE_HIT             =   pygame.USEREVENT + 1
-EVENT_BUTTERFLY_HIT         =   pygame.USEREVENT + 2
-EVENT_GAME_OVER             =   pygame.USEREVENT + 3
-EVENT_DIFFICULTY_ADJUSTMENT =   pygame.USEREVENT + 4
+# Images for each apple and butterfly type
+APPLE_IMAGES                =   ["appleGood.png", "appleBad.png", "appleSpecial.png"]
+APPLE_SPLATS                =   ["hitsplatRed.png", "hitsplatBrown.png", "hitsplatBlue.png"]
+BUTTERFLY_IMAGES            =   ["butterflyOrange.png", "butterflyPink.png", "butterflyYellow.png"]
 
 # Physical constants
 ACCELERATION_DUE_TO_GRAVITY =   9.81
@@ -48,6 +56,9 @@ BUTTERFLY_PATH              =   [[[-10, 200], [100, 400], [300, 10], [500, 700],
                                  [[950, -10], [700, 550], [400, 20], [200, 550], [-10, -10]],
                                  [[500, -20], [30, 700], [600, 40], [950, -20]]]
 
+# Number of samples taken along each butterfly path
+BEZIER_SAMPLES              =   1024
+
 # Apple locations
 APPLE_LOCATIONS             =   [[663, 115], [736, 102], [711, 141], [777, 143], [672, 170],
                                  [750, 176], [621, 205], [801, 196], [738, 221], [673, 247],
@@ -55,26 +66,19 @@ APPLE_LOCATIONS             =   [[663, 115], [736, 102], [711, 141], [777, 143],
                                  [666, 311], [846, 309]]
 
 # Clouds
-CLOUDS                      =   [("..\\Resources\\cloud02.png", [-700, -220]), ("..\\Resources\\cloud01.png", [-300, -205]),
-                                 ("..\\Resources\\cloud01.png", [50, -210]), ("..\\Resources\\cloud02.png", [500, -200])]
+CLOUDS                      =   [("cloud02.png", [-700, -220]), ("cloud01.png", [-300, -205]),
+                                 ("cloud01.png", [50, -210]), ("cloud02.png", [500, -200])]
 
-# Game difficulty adjustments
-DIFFICULTY                  =   [(10, 2, False, False), (15, 3, True, False), (30, 1, False, False), (50, -1, True, False),
-                                 (70, -2, False, False), (90, -3, True, False), (100, 1, False, False), (120, 2, True, False),
-                                 (135, -1, False, False), (150, 2, False, False), (170, -1, True, False), (180, -3, True, False)]
+# Game difficulty adjustments, (points, wind speed, butterfly added) applied as the score
+# reaches the points and (seconds, wind speed, butterfly added) applied as the time
+# remaining falls to the seconds
+DIFFICULTY                  =   [(10, 2, False), (15, 3, True), (30, 1, False), (50, -1, True),
+                                 (70, -2, False), (90, -3, True), (100, 1, False), (120, 2, True),
+                                 (135, -1, False), (150, 2, False), (170, -1, True), (180, -3, True)]
+TIME_DIFFICULTY             =   []
 
-"""
- " Rotate Center
- "   Rotates a surface around it's center point, with anti-aliasing
- "
- "   @param image: the surface to rotate
- "   @param rect: the rectangle associated with the surface
- "   @param angle: the angle in degrees to rotate the image by
-"""
-def rotateCenter(image, rect, angle):
-    rotatedImage = pygame.transform.rotozoom(image, angle, 1)
-    rotatedRect = rotatedImage.get_rect(center = rect.center)
-    return rotatedImage, rotatedRect
+# Cached binomial coefficients keyed by (n, i)
+BINOMIAL_COEFFICIENTS       =   {}
 
 """
  " Rotate Point
@@ -103,6 +107,21 @@ def rotatePoint(rect, point, angle):
 def calculateVelocity(power, cloudSpeed):
     return (math.sqrt(power) * 1.2 + (cloudSpeed * KNOTS_TO_METERS_PER_SECOND))
 
+"""
+ " Binomial
+ "   Gets the binomial coefficient n choose i. Coefficients are cached as they are
+ "   only ever needed for the small number of control points in a path
+ "
+ "   @param n: total number of points
+ "   @param i: ith point
+"""
+def binomial(n, i):
+    coefficient = BINOMIAL_COEFFICIENTS.get((n, i))
+    if (coefficient is None):
+        coefficient = math.factorial(n) // (math.factorial(i) * math.factorial(n - i))
+        BINOMIAL_COEFFICIENTS[(n, i)] = coefficient
+    return coefficient
+
 """
  " Bernstein
  "   @param i: ith point
@@ -110,7 +129,7 @@ def calculateVelocity(power, cloudSpeed):
  "   @param t: time value between 0 and 1
 """
 def bernstein(i, n, t):
-    return math.factorial(n) / (math.factorial(i) * math.factorial(n - i)) * math.pow(t, i) * math.pow(1 - t, n - i)
+    return binomial(n, i) * math.pow(t, i) * math.pow(1 - t, n - i)
 
 """
  " Get Bezier Point
@@ -123,26 +142,54 @@ def getBezierPoint(t, points):
     result = [0, 0]
     numElements = len(points) - 1
     for i in range(numElements + 1):
-        result[0] += points[i][0] * bernstein(i, numElements, t)
-        result[1] += points[i][1] * bernstein(i, numElements, t)
+        weight = bernstein(i, numElements, t)
+        result[0] += points[i][0] * weight
+        result[1] += points[i][1] * weight
     return result
 
 """
- " Get Image Part
- "   Gets a certain part of an image, returning a surface and its rectangle
+ " Build Path Table
+ "   Samples a bezier curve at BEZIER_SAMPLES even intervals of t, returning a list
+ "   of x coordinates and a list of y coordinates
  "
- "   @param rect: rectangle describing the surface
- "   @param surface: surface to draw the image part on
- "   @param image: the surface containing the full image
- "   @param height: height in pixels to extract from the image
- "   @param width: width in pixels to extract from the image
- "   @param position: the top left coordinate to start extracting from
- "   @param location: center coordinates to re-position the surface at (default = None)
-"""
-def getImagePart(rect, surface, image, height, width, position, location = None):
-    rect = pygame.Rect(position, 0, width, height)
-    surface = pygame.Surface(rect.size, flags = pygame.SRCALPHA)
-    surface.blit(image, (0, 0), rect)
-    if (location is not None):
-        rect.center = location
-    return rect, surface
+ "   @param points: list of points to calculate the curve path
+"""
+def buildPathTable(points):
+    xs = []
+    ys = []
+    for sample in range(BEZIER_SAMPLES + 1):
+        point = getBezierPoint(sample / float(BEZIER_SAMPLES), points)
+        xs.append(point[0])
+        ys.append(point[1])
+    return xs, ys
+
+"""
+ " Get Table Point
+ "   Gets a point on a sampled curve by interpolating between its samples
+ "
+ "   @param table: the (xs, ys) samples of the curve (see buildPathTable)
+ "   @param t: time value between 0 and 1
+"""
+def getTablePoint(table, t):
+    xs, ys = table
+    samples = len(xs) - 1
+    position = min(max(t, 0.0), 1.0) * samples
+    index = min(int(position), samples - 1)
+    fraction = position - index
+    return [xs[index] + (xs[index + 1] - xs[index]) * fraction, ys[index] + (ys[index + 1] - ys[index]) * fraction]
+
+"""
+ " Replace File
+ "   Moves a file over another in a single step so that a reader never sees a
+ "   partially written file
+ "
+ "   @param source: the path of the new file
+ "   @param destination: the path of the file to replace
+"""
+def replaceFile(source, destination):
+    try:
+        os.rename(source, destination)
+    except OSError:
+        # Windows will not rename over an existing file
+        os.remove(destination)
+        os.rename(source, destination)
@@ -0,0 +1,289 @@
+import os, sys, glob, json, struct, argparse
+import pygame
+import Generic, Shapes, Collision
+
+"""
+ " Constants
+"""
+# Level descriptions (*.json) and the packs compiled from them (*.level), independent
+# of the working directory
+LEVEL_DIRECTORY             =   os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "Levels")
+DEFAULT_LEVEL               =   "orchard"
+
+# Identifies a level pack and the layout of its sections
+LEVEL_MAGIC                 =   b"ALVL"
+LEVEL_VERSION               =   3
+
+# Little endian header: magic, version, the size and modification time of the
+# description the level was compiled from, grid cell size, then the number of apples,
+# butterfly paths, clouds, point and time difficulty adjustments and occupied grid cells
+LEVEL_HEADER                =   struct.Struct("<4sIQdIIIIIII")
+
+# Little endian records following the header, one section after another
+APPLE_RECORD                =   struct.Struct("<ii")        # Apple center
+PATH_RECORD                 =   struct.Struct("<II")        # Control points and samples, followed by the points and then the sampled xs and ys
+POINT_RECORD                =   struct.Struct("<ii")        # Path control point
+CLOUD_RECORD                =   struct.Struct("<32sii")     # Cloud image file name and top-left location
+DIFFICULTY_RECORD           =   struct.Struct("<ii?")       # Points or seconds reached, wind speed and whether a butterfly is added
+CELL_RECORD                 =   struct.Struct("<iiI")       # Grid column, row and number of apples, followed by their indices
+
+"""
+ " Level
+ "   The layout of a round: where the apples grow, the paths the butterflies fly,
+ "   the clouds and the difficulty adjustments. Levels carry everything derived
+ "   from that layout that the game needs, the sampled butterfly paths and the
+ "   grid cells each apple is indexed in, so starting a round computes nothing
+"""
+class Level(object):
+    """
+     " Constructor
+     "   @param apples: the (x, y) center of each apple
+     "   @param paths: the control points of each butterfly path
+     "   @param pathTables: the sampled (xs, ys) of each butterfly path (see Generic.buildPathTable)
+     "   @param clouds: list of (file name of the cloud image resource, top-left location)
+     "   @param difficulty: list of (points, wind speed, butterfly added) adjustments (see Difficulty.DifficultyEngine)
+     "   @param timeDifficulty: list of (seconds remaining, wind speed, butterfly added) adjustments
+     "   @param appleCells: list of ((column, row), apple indices) of each occupied grid cell
+     "   @param cellSize: the size in pixels of the grid cells
+     "   @param source: the (size, modification time) of the description the level was
+     "                  compiled from (default = None, the level has no description file)
+    """
+    def __init__(self, apples, paths, pathTables, clouds, difficulty, timeDifficulty, appleCells, cellSize, source = None):
+        self.apples = apples
+        self.paths = paths
+        self.pathTables = pathTables
+        self.clouds = clouds
+        self.difficulty = difficulty
+        self.timeDifficulty = timeDifficulty
+        self.appleCells = appleCells
+        self.cellSize = cellSize
+        self.source = source
+
+    """
+     " Get Path Point
+     "   Gets a point on one of the butterfly paths by interpolating between its
+     "   samples
+     "
+     "   @param path: the index of the butterfly path
+     "   @param t: time value between 0 and 1
+    """
+    def getPathPoint(self, path, t):
+        return Generic.getTablePoint(self.pathTables[path], t)
+
+    """
+     " Is Current
+     "   Returns True if the level was compiled from the current version of its
+     "   description. A level whose description is missing is always current, so
+     "   packs can be shipped on their own
+     "
+     "   @param descriptionPath: the path of the description of the level
+    """
+    def isCurrent(self, descriptionPath):
+        try:
+            description = os.stat(descriptionPath)
+        except OSError:
+            return True
+        return self.source == (description.st_size, description.st_mtime)
+
+    """
+     " Index Apples
+     "   Fills a grid with the apples of a round
+     "
+     "   @param grid: the grid to fill (see Collision.Grid)
+     "   @param apples: the apple of each location in the level
+    """
+    def indexApples(self, grid, apples):
+        grid.load(self.cellSize, [(cell, [apples[index] for index in indices]) for cell, indices in self.appleCells])
+
+"""
+ " Describe
+ "   Gets the description of the level built into the game, in the form read by
+ "   build()
+"""
+def describe():
+    return {"apples": Generic.APPLE_LOCATIONS,
+            "butterflyPaths": Generic.BUTTERFLY_PATH,
+            "clouds": Generic.CLOUDS,
+            "difficulty": Generic.DIFFICULTY,
+            "timeDifficulty": Generic.TIME_DIFFICULTY}
+
+"""
+ " Build
+ "   Builds a level from its description, sampling the butterfly paths and finding
+ "   the grid cells of every apple
+ "
+ "   @param description: dictionary of the apple locations, butterfly path control
+ "                       points, clouds, (points, wind speed, butterfly added)
+ "                       difficulty adjustments and optionally (seconds, wind speed,
+ "                       butterfly added) time difficulty adjustments (see describe())
+ "   @param cellSize: the size in pixels of the grid cells (default = Collision.GRID_CELL_SIZE)
+"""
+def build(description, cellSize = Collision.GRID_CELL_SIZE):
+    apples = [tuple(location) for location in description["apples"]]
+    paths = [[tuple(point) for point in points] for points in description["butterflyPaths"]]
+    clouds = [(name, tuple(location)) for name, location in description["clouds"]]
+    difficulty = [(points, wind, bool(butterfly)) for points, wind, butterfly in description["difficulty"]]
+    timeDifficulty = [(seconds, wind, bool(butterfly)) for seconds, wind, butterfly in description.get("timeDifficulty", [])]
+
+    # Apples are indexed by the largest of their images, so the cells hold whichever
+    # type grows there
+    appleRect = pygame.Rect(0, 0, 0, 0)
+    for name in Generic.APPLE_IMAGES:
+        appleRect.union_ip(Shapes.getShape(name).getRect())
+    grid = Collision.Grid(cellSize)
+    cells = {}
+    for index, location in enumerate(apples):
+        for cell in grid.getCells(appleRect.move(location)):
+            cells.setdefault(cell, []).append(index)
+
+    return Level(apples, paths, [Generic.buildPathTable(points) for points in paths], clouds, difficulty, timeDifficulty, sorted(cells.items()), cellSize)
+
+"""
+ " Build File
+ "   Builds a level from a description file, recording the size and modification
+ "   time of the file so a pack of the level can be checked against it
+ "
+ "   @param descriptionPath: the path of the description
+"""
+def buildFile(descriptionPath):
+    description = os.stat(descriptionPath)
+    with open(descriptionPath) as descriptionFile:
+        level = build(json.load(descriptionFile))
+    level.source = (description.st_size, description.st_mtime)
+    return level
+
+"""
+ " Pack
+ "   Gets the binary pack of a level
+ "
+ "   @param level: the level to pack
+"""
+def pack(level):
+    sourceSize, sourceTime = level.source if level.source is not None else (0, 0)
+    data = [LEVEL_HEADER.pack(LEVEL_MAGIC, LEVEL_VERSION, sourceSize, sourceTime, level.cellSize, len(level.apples), len(level.paths), len(level.clouds), len(level.difficulty), len(level.timeDifficulty), len(level.appleCells))]
+    data += [APPLE_RECORD.pack(*location) for location in level.apples]
+    for points, (xs, ys) in zip(level.paths, level.pathTables):
+        data.append(PATH_RECORD.pack(len(points), len(xs)))
+        data += [POINT_RECORD.pack(*point) for point in points]
+        data.append(struct.pack("<%dd" % (len(xs) * 2), *(list(xs) + list(ys))))
+    data += [CLOUD_RECORD.pack(name.encode("utf-8"), location[0], location[1]) for name, location in level.clouds]
+    data += [DIFFICULTY_RECORD.pack(*diff) for diff in level.difficulty + level.timeDifficulty]
+    for cell, indices in level.appleCells:
+        data.append(CELL_RECORD.pack(cell[0], cell[1], len(indices)))
+        data.append(struct.pack("<%dI" % len(indices), *indices))
+    return b"".join(data)
+
+"""
+ " Unpack
+ "   Reads a level from its binary pack. Raises ValueError if the data is not a
+ "   level pack of this version
+ "
+ "   @param data: the binary pack of the level
+"""
+def unpack(data):
+    try:
+        magic, version, sourceSize, sourceTime, cellSize, appleCount, pathCount, cloudCount, difficultyCount, timeDifficultyCount, cellCount = LEVEL_HEADER.unpack_from(data, 0)
+    except struct.error:
+        raise ValueError("not a level pack")
+    if (magic != LEVEL_MAGIC or version != LEVEL_VERSION):
+        raise ValueError("not a version %d level pack" % LEVEL_VERSION)
+
+    try:
+        offset = LEVEL_HEADER.size
+        apples = [APPLE_RECORD.unpack_from(data, offset + index * APPLE_RECORD.size) for index in range(appleCount)]
+        offset += appleCount * APPLE_RECORD.size
+
+        paths = []
+        pathTables = []
+        for path in range(pathCount):
+            pointCount, sampleCount = PATH_RECORD.unpack_from(data, offset)
+            offset += PATH_RECORD.size
+            paths.append([POINT_RECORD.unpack_from(data, offset + index * POINT_RECORD.size) for index in range(pointCount)])
+            offset += pointCount * POINT_RECORD.size
+            samples = struct.unpack_from("<%dd" % (sampleCount * 2), data, offset)
+            pathTables.append((samples[:sampleCount], samples[sampleCount:]))
+            offset += sampleCount * 16
+
+        clouds = []
+        for index in range(cloudCount):
+            name, x, y = CLOUD_RECORD.unpack_from(data, offset)
+            clouds.append((name.rstrip(b"\0").decode("utf-8"), (x, y)))
+            offset += CLOUD_RECORD.size
+
+        difficulty = [DIFFICULTY_RECORD.unpack_from(data, offset + index * DIFFICULTY_RECORD.size) for index in range(difficultyCount + timeDifficultyCount)]
+        timeDifficulty = difficulty[difficultyCount:]
+        difficulty = difficulty[:difficultyCount]
+        offset += (difficultyCount + timeDifficultyCount) * DIFFICULTY_RECORD.size
+
+        appleCells = []
+        for index in range(cellCount):
+            column, row, count = CELL_RECORD.unpack_from(data, offset)
+            offset += CELL_RECORD.size
+            appleCells.append(((column, row), list(struct.unpack_from("<%dI" % count, data, offset))))
+            offset += count * 4
+    except struct.error:
+        raise ValueError("level pack is truncated")
+
+    return Level(apples, paths, pathTables, clouds, difficulty, timeDifficulty, appleCells, cellSize, (sourceSize, sourceTime))
+
+levels = {}     # Loaded levels keyed by name
+
+"""
+ " Load
+ "   Gets a level by name, reading its pack the first time it is requested. Where
+ "   there is no usable pack, or the description has changed since the pack was
+ "   compiled, the level is compiled from its description, and the built-in level
+ "   from describe() if it has neither
+ "
+ "   @param name: the name of the level (default = DEFAULT_LEVEL)
+"""
+def load(name = DEFAULT_LEVEL):
+    level = levels.get(name)
+    if (level is None):
+        descriptionPath = os.path.join(LEVEL_DIRECTORY, name + ".json")
+        try:
+            with open(os.path.join(LEVEL_DIRECTORY, name + ".level"), "rb") as levelFile:
+                level = unpack(levelFile.read())
+            if (not level.isCurrent(descriptionPath)):
+                level = None
+        except (IOError, OSError, ValueError):
+            pass
+        if (level is None):
+            if (name == DEFAULT_LEVEL and not os.path.exists(descriptionPath)):
+                level = build(describe())
+            else:
+                level = buildFile(descriptionPath)
+        levels[name] = level
+    return level
+
+"""
+ " Main
+ "   Compiles level descriptions into level packs
+"""
+def main():
+    parser = argparse.ArgumentParser(description = "Compiles Applarrow level descriptions into level packs.")
+    parser.add_argument("descriptions", nargs = "*", help = "level descriptions to compile (default = every description in %s)" % LEVEL_DIRECTORY)
+    parser.add_argument("--describe", metavar = "PATH", help = "write the description of the built-in level to a file instead")
+    arguments = parser.parse_args()
+
+    if (arguments.describe is not None):
+        # One apple, path, cloud or adjustment per line
+        description = describe()
+        sections = []
+        for key in sorted(description):
+            items = ",".join("\n    " + json.dumps(item) for item in description[key])
+            sections.append('  "%s": [%s]' % (key, items + "\n  " if items else ""))
+        with open(arguments.describe, "w") as descriptionFile:
+            descriptionFile.write("{\n" + ",\n".join(sections) + "\n}\n")
+        return 0
+
+    for descriptionPath in (arguments.descriptions or sorted(glob.glob(os.path.join(LEVEL_DIRECTORY, "*.json")))):
+        data = pack(buildFile(descriptionPath))
+        packPath = os.path.splitext(descriptionPath)[0] + ".level"
+        with open(packPath, "wb") as packFile:
+            packFile.write(data)
+        print("Compiled %s into %s (%d bytes)" % (descriptionPath, packPath, len(data)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
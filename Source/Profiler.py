@@ -0,0 +1,149 @@
+import timeit, math, csv
+import Generic, DirtyRects
+
+"""
+ " Constants
+"""
+# Phases of a frame in the order they happen. Simulation phases run once for every
+# fixed step in the frame and their times are added together
+PROFILER_PHASES             =   ["tick", "events", "input", "arrow", "apple collisions", "butterfly collisions",
+                                 "apples", "butterflies", "animations", "sync", "clouds", "clear", "banner", "draw", "display"]
+
+# Number of frames kept in the ring buffer
+PROFILER_FRAMES             =   300
+
+# Milliseconds available to each frame at the target framerate
+FRAME_BUDGET                =   1000.0 / Generic.FRAMERATE
+
+# Profiler overlay properties
+PROFILER_OVERLAY_WIDTH      =   220     # Width of the overlay in pixels
+PROFILER_OVERLAY_REFRESH    =   15      # Number of frames between each render of the overlay text
+
+"""
+ " Profiler
+ "   Times each phase of every frame into a fixed size ring buffer. Each recorded
+ "   frame holds the milliseconds spent in every phase along with the number and
+ "   total area of the dirty rectangles pushed to the display and the strategy
+ "   used to push them. Time is attributed to a phase by calling mark() when the
+ "   phase ends
+"""
+class Profiler(object):
+    """
+     " Constructor
+     "   @param capacity: the number of frames kept (default = PROFILER_FRAMES)
+    """
+    def __init__(self, capacity = PROFILER_FRAMES):
+        self.timer = timeit.default_timer
+        self.capacity = capacity
+        self.phaseIndex = dict((phase, index) for index, phase in enumerate(PROFILER_PHASES))
+        self.frames = [None] * capacity     # Ring buffer of [frame number, total, phase times..., rect count, rect area, strategy]
+        self.frameCount = 0                 # The number of frames recorded since the profiler was created
+        self.current = None                 # The frame being recorded
+        self.lastMark = self.timer()
+
+    """
+     " Frame
+     "   Ends the frame being recorded, storing it in the ring buffer, and starts
+     "   recording the next frame
+    """
+    def frame(self):
+        now = self.timer()
+        if (self.current is not None):
+            self.current[1] = sum(self.current[2:2 + len(PROFILER_PHASES)])
+            self.frames[self.frameCount % self.capacity] = self.current
+            self.frameCount += 1
+        self.current = [self.frameCount, 0] + [0.0] * len(PROFILER_PHASES) + [0, 0, DirtyRects.UPDATE_NONE]
+        self.lastMark = now
+
+    """
+     " Mark
+     "   Adds the time since the last mark to a phase of the current frame
+     "
+     "   @param phase: the phase that has just ended (see PROFILER_PHASES)
+    """
+    def mark(self, phase):
+        now = self.timer()
+        if (self.current is not None):
+            self.current[2 + self.phaseIndex[phase]] += (now - self.lastMark) * 1000.0
+        self.lastMark = now
+
+    """
+     " Count Rects
+     "   Adds the dirty rectangles pushed to the display to the current frame
+     "
+     "   @param rects: the rectangles pushed to the display
+     "   @param strategy: the strategy used to push them (see DirtyRects) (default = None)
+    """
+    def countRects(self, rects, strategy = None):
+        if (self.current is not None):
+            self.current[-3] += len(rects)
+            self.current[-2] += sum(rect.width * rect.height for rect in rects)
+            if (strategy is not None):
+                self.current[-1] = strategy
+
+    """
+     " Get Frames
+     "   Gets the recorded frames in the ring buffer from oldest to newest
+    """
+    def getFrames(self):
+        if (self.frameCount < self.capacity):
+            return self.frames[:self.frameCount]
+        start = self.frameCount % self.capacity
+        return self.frames[start:] + self.frames[:start]
+
+    """
+     " Get Last Frame
+     "   Gets the most recently recorded frame, None if no frame has been recorded
+    """
+    def getLastFrame(self):
+        if (self.frameCount == 0):
+            return None
+        return self.frames[(self.frameCount - 1) % self.capacity]
+
+    """
+     " Get Percentiles
+     "   Gets a percentile of every column over the frames in the ring buffer as a
+     "   dictionary keyed by phase, "total", "rects" and "area"
+     "
+     "   @param percent: the percentile between 0 and 100
+    """
+    def getPercentiles(self, percent):
+        frames = self.getFrames()
+        if (len(frames) == 0):
+            return {}
+        rank = min(max(int(math.ceil(percent / 100.0 * len(frames))), 1), len(frames)) - 1
+        names = ["total"] + PROFILER_PHASES + ["rects", "area"]
+        return dict((name, sorted(frame[1 + column] for frame in frames)[rank]) for column, name in enumerate(names))
+
+    """
+     " Get Over Budget
+     "   Gets the number of frames in the ring buffer that took longer than the frame
+     "   budget
+    """
+    def getOverBudget(self):
+        return len([frame for frame in self.getFrames() if frame[1] > FRAME_BUDGET])
+
+    """
+     " Get Strategy Counts
+     "   Gets the number of frames in the ring buffer that used each strategy to push
+     "   to the display, as a dictionary keyed by strategy
+    """
+    def getStrategyCounts(self):
+        counts = {}
+        for frame in self.getFrames():
+            counts[frame[-1]] = counts.get(frame[-1], 0) + 1
+        return counts
+
+    """
+     " Export
+     "   Writes the frames in the ring buffer to a CSV file, one row per frame with
+     "   times in milliseconds
+     "
+     "   @param path: the path of the file to write
+    """
+    def export(self, path):
+        with open(path, "w") as csvFile:
+            writer = csv.writer(csvFile, lineterminator = "\n")
+            writer.writerow(["frame", "total"] + PROFILER_PHASES + ["rects", "area", "strategy"])
+            for frame in self.getFrames():
+                writer.writerow([frame[0], "%.3f" % frame[1]] + ["%.3f" % time for time in frame[2:-3]] + frame[-3:])
@@ -0,0 +1,488 @@
+import pygame
+import Elements, Assets, Animation, DirtyRects
+
+"""
+ " Element layers
+ "   These layers define the draw order for all game elements, with the
+ "   lowest layer having the smallest number. The banner and overlays are on
+ "   TOP_LAYER and above, and are drawn over the static elements of those layers
+"""
+ARCHER_LAYER                =   0
+TREE_LAYER                  =   1
+APPLE_LAYER                 =   2
+ARROW_LAYER                 =   3
+BUTTERFLY_LAYER             =   4
+CLOUD_LAYER                 =   5   # Drawn by the cloud strip rather than sprites
+TOP_LAYER                   =   6
+PAUSE_LAYER                 =   7
+HELP_LAYER                  =   8
+RESTART_LAYER               =   9
+PROFILER_LAYER              =   10
+
+# Pixels per second the clouds move for each knot of wind
+CLOUD_SPEED                 =   30
+
+# Number of spent arrows kept as sprites where they cannot be drawn into the background
+# plate, the oldest being removed first
+SPENT_ARROW_LIMIT           =   8
+
+# Loading screen progress bar, drawn without images or fonts as neither has loaded yet
+LOADING_BAR_SIZE            =   (300, 6)
+LOADING_BACKGROUND          =   (169, 234, 254)
+LOADING_COLOUR              =   (255, 255, 255)
+
+"""
+ " Draw Loading
+ "   Draws the loading screen with a progress bar and updates the display where it
+ "   changed. The first step clears the whole screen. Events are pumped so that the
+ "   window stays responsive while the game loads
+ "
+ "   @param screen: the main surface
+ "   @param done: the number of loading steps done
+ "   @param total: the total number of loading steps
+"""
+def drawLoading(screen, done, total):
+    bar = pygame.Rect((0, 0), LOADING_BAR_SIZE)
+    bar.center = screen.get_rect().center
+    outline = bar.inflate(4, 4)
+    if (done == 0):
+        screen.fill(LOADING_BACKGROUND)
+        pygame.draw.rect(screen, LOADING_COLOUR, outline, 1)
+        pygame.display.update()
+    else:
+        screen.fill(LOADING_COLOUR, pygame.Rect(bar.left, bar.top, bar.width * min(done, total) // total, bar.height))
+        pygame.display.update(outline)
+    pygame.event.pump()
+
+"""
+ " Subtract Rect
+ "   Gets the parts of a rectangle outside of another as a list of rectangles that
+ "   do not overlap
+ "
+ "   @param rect: the rectangle to subtract from
+ "   @param other: the rectangle to subtract
+"""
+def subtractRect(rect, other):
+    if (not rect.colliderect(other)):
+        return [rect]
+    parts = []
+    if (rect.top < other.top):
+        parts.append(pygame.Rect(rect.left, rect.top, rect.width, other.top - rect.top))
+    if (other.bottom < rect.bottom):
+        parts.append(pygame.Rect(rect.left, other.bottom, rect.width, rect.bottom - other.bottom))
+    top = max(rect.top, other.top)
+    bottom = min(rect.bottom, other.bottom)
+    if (rect.left < other.left):
+        parts.append(pygame.Rect(rect.left, top, other.left - rect.left, bottom - top))
+    if (other.right < rect.right):
+        parts.append(pygame.Rect(other.right, top, rect.right - other.right, bottom - top))
+    return parts
+
+"""
+ " Split Rects
+ "   Gets the parts of a list of rectangles inside an area as rectangles that do not
+ "   overlap, so that drawing over every part draws over each pixel once
+ "
+ "   @param rects: the rectangles to split
+ "   @param bounds: the area the parts must be inside
+"""
+def splitRects(rects, bounds):
+    parts = []
+    for rect in rects:
+        pieces = [rect.clip(bounds)]
+        for other in parts:
+            pieces = [piece for remaining in pieces for piece in subtractRect(remaining, other)]
+        parts += [piece for piece in pieces if piece.width > 0 and piece.height > 0]
+    return parts
+
+"""
+ " Compositor
+ "   Flattens elements that never change into two cached plates in layer order.
+ "   Static elements on layers below the split layer are drawn into the lower plate,
+ "   which the screen is cleared from. The rest are drawn into the upper plate, which
+ "   only covers the parts of the screen that were cleared and redrawn. The plates
+ "   are rebuilt when the set of static elements changes
+"""
+class Compositor(object):
+    """
+     " Constructor
+     "   @param background: the image at the bottom of the lower plate
+     "   @param splitLayer: the lowest layer drawn into the upper plate
+    """
+    def __init__(self, background, splitLayer):
+        self.background = background
+        self.splitLayer = splitLayer
+        self.elements = []      # The static (layer, sprite) pairs in the order they were added
+        self.baked = []         # The (image, rect) pairs drawn into the lower plate over the static elements
+        self.lower = None       # The plate beneath every sprite
+        self.upper = None       # The plate over the sprites below the split layer
+        self.upperRect = None   # The area of the upper plate holding static elements
+        self.stale = True       # True if the plates need to be rebuilt
+
+    """
+     " Add
+     "   Adds a static element, rebuilding the plates on the next build
+     "
+     "   @param element: the sprite to add, which must never change
+     "   @param layer: the layer of the sprite
+    """
+    def add(self, element, layer):
+        self.elements.append((layer, element))
+        self.stale = True
+
+    """
+     " Remove
+     "   Removes a static element, rebuilding the plates on the next build
+     "
+     "   @param element: the sprite to remove
+    """
+    def remove(self, element):
+        self.elements = [(layer, sprite) for layer, sprite in self.elements if sprite is not element]
+        self.stale = True
+
+    """
+     " Bake
+     "   Draws an image into the lower plate over the static elements, keeping it
+     "   when the plates are rebuilt
+     "
+     "   @param image: the image to draw
+     "   @param rect: the location to draw the image at
+    """
+    def bake(self, image, rect):
+        self.baked.append((image, rect))
+        if (self.stale is False):
+            self.lower.blit(image, rect)
+
+    """
+     " Clear Baked
+     "   Removes every image drawn into the lower plate by bake()
+    """
+    def clearBaked(self):
+        self.baked = []
+        self.stale = True
+
+    """
+     " Build
+     "   Rebuilds the plates if they are out of date. Returns True if they were
+     "   rebuilt, after which the whole screen must be drawn again
+    """
+    def build(self):
+        if (self.stale is False):
+            return False
+
+        # Run length encoding is turned off as it is slow to draw onto and blends differently
+        self.lower = self.background.copy()
+        self.lower.set_alpha(None)
+        self.upper = pygame.Surface(self.background.get_size(), pygame.SRCALPHA).convert_alpha()
+        self.upper.fill((0, 0, 0, 0))
+        self.upperRect = pygame.Rect(0, 0, 0, 0)
+        for layer, element in sorted(self.elements, key = lambda pair: pair[0]):
+            if (layer < self.splitLayer):
+                self.lower.blit(element.image, element.rect)
+            else:
+                rect = self.upper.blit(element.image, element.rect)
+                self.upperRect = rect if self.upperRect.width == 0 else self.upperRect.union(rect)
+        for image, rect in self.baked:
+            self.lower.blit(image, rect)
+        self.stale = False
+        return True
+
+    """
+     " Restore
+     "   Draws the lower plate over part of a surface
+     "
+     "   @param surface: the surface to draw onto
+     "   @param rect: the part of the surface to restore
+    """
+    def restore(self, surface, rect):
+        surface.blit(self.lower, rect, rect)
+
+    """
+     " Cover
+     "   Draws the upper plate over the parts of a surface that were restored and
+     "   redrawn. Each pixel is covered once, as covering a part twice would blend
+     "   the translucent edges of the upper plate twice
+     "
+     "   @param surface: the surface to draw onto
+     "   @param rects: the parts of the surface that were restored and redrawn
+    """
+    def cover(self, surface, rects):
+        for part in splitRects(rects, self.upperRect):
+            surface.blit(self.upper, part, part)
+
+"""
+ " Renderer
+ "   Draws a simulated game. The renderer owns the layered groups of sprites and
+ "   keeps the sprites in line with the simulation, redrawing only the parts of
+ "   the screen that changed.
+ "
+ "   Elements that never change are not sprites but are drawn into the plates of a
+ "   compositor. Each arrow that has finished its flight is drawn into the lower
+ "   plate and removed from the layered group, so the number of sprites drawn each
+ "   frame stays the same however many arrows are fired.
+ "
+ "   The clouds are a single strip drawn over the sprites beneath them. The whole
+ "   strip is only drawn when it has scrolled by a pixel or when there are so many
+ "   sprites beneath it that drawing it over each one would cost more, otherwise it
+ "   is drawn over the sprites that changed.
+ "
+ "   The butterflies are not sprites either but are drawn in a single batch over
+ "   the sprites, with a sprite only for the hitsplat of each butterfly hit
+"""
+class Renderer(object):
+    """
+     " Constructor
+     "   @param screen: the main surface to draw to
+     "   @param simulation: the simulated game to draw (see Simulation.Simulation)
+    """
+    def __init__(self, screen, simulation):
+        self.screen = screen
+        self.simulation = simulation
+        self.compositor = Compositor(Assets.getImage("sky.png"), TOP_LAYER)
+        self.plateRects = []            # Parts of the plates to draw again on the next redraw
+        self.drawnRects = []            # Parts of the screen sprites were drawn to on the last redraw
+        self.fullUpdate = False         # True if the whole display is updated on the next redraw
+        self.elements = pygame.sprite.LayeredUpdates()  # Sprites beneath the upper plate
+        self.overlays = pygame.sprite.LayeredUpdates()  # Sprites over the upper plate
+        self.timeline = Animation.Timeline()
+        self.clouds = Elements.CloudStrip(simulation.level.clouds)
+        self.swarm = None               # The butterflies, drawn in one batch (see Elements.ButterflySwarm)
+        self.cloudPosition = None       # The position the cloud strip was last drawn at
+        self.cloudTicks = 0             # Game ticks the clouds were last moved at
+        self.profiler = None            # Profiler timing each phase of a frame (see Profiler.Profiler)
+
+        # Static elements
+        self.compositor.add(Elements.ArcherLegs(), ARCHER_LAYER)
+        self.compositor.add(Elements.Tree(), TREE_LAYER)
+        self.compositor.add(Elements.Grass(), TOP_LAYER)
+        self.compositor.add(Elements.Ground(), TOP_LAYER)
+
+        # Layered element initialisation
+        self.banner = Elements.Banner()
+        self.overlays.add(self.banner, layer = TOP_LAYER)
+        self.archerTorso = Elements.ArcherTorso()
+        self.elements.add(self.archerTorso, layer = ARCHER_LAYER)
+        self.load()
+
+    """
+     " Get Sprites
+     "   Gets the sprites on a layer
+     "
+     "   @param layer: the layer of the sprites
+    """
+    def getSprites(self, layer):
+        if (layer < TOP_LAYER):
+            return self.elements.get_sprites_from_layer(layer)
+        return self.overlays.get_sprites_from_layer(layer)
+
+    """
+     " Get Arrow
+     "   Returns the arrow at the specified index. -1 Returns the most recent arrow
+     "
+     "   @param index: the index of the arrow to get (default = -1)
+    """
+    def getArrow(self, index = -1):
+        return self.elements.get_sprites_from_layer(ARROW_LAYER)[index]
+
+    """
+     " Mark
+     "   Marks the end of a phase of the frame when the game is being profiled
+     "
+     "   @param phase: the phase that has just ended (see Profiler.PROFILER_PHASES)
+    """
+    def mark(self, phase):
+        if (self.profiler is not None):
+            self.profiler.mark(phase)
+
+    """
+     " Load
+     "   Creates the sprites for every changable element of the simulation,
+     "   removing any previous sprites, and clears the spent arrows from the plate
+    """
+    def load(self):
+        self.timeline.clear()
+        self.compositor.clearBaked()
+        self.plateRects = []
+        self.cloudTicks = self.simulation.ticks
+
+        # Apples
+        self.elements.remove_sprites_of_layer(APPLE_LAYER)
+        for apple in self.simulation.apples:
+            self.elements.add(Elements.Apple(apple, self.timeline), layer = APPLE_LAYER)
+
+        # Arrows
+        self.elements.remove_sprites_of_layer(ARROW_LAYER)
+        self.elements.add(Elements.Arrow(self.simulation.arrow), layer = ARROW_LAYER)
+        self.archerTorso.update(self.simulation.arrowAngle)
+
+        # Butterflies and their hitsplats
+        self.elements.remove_sprites_of_layer(BUTTERFLY_LAYER)
+        self.swarm = Elements.ButterflySwarm(self.simulation.butterflies, self.timeline)
+
+    """
+     " Sync
+     "   Brings the sprites in line with the simulation, adding sprites for any
+     "   arrows and butterflies the simulation created since the last call. Moving
+     "   elements are drawn part way between the last two simulation steps
+     "
+     "   @param alpha: the fraction of a simulation step left over after the last step (default = 1)
+    """
+    def sync(self, alpha = 1):
+        # Sprite sheet animations, all moved on in a single pass
+        self.timeline.update(self.simulation.ticks)
+        self.mark("animations")
+
+        # Arrows, loading a new sprite once the simulation loads a new arrow
+        if (self.getArrow().state is not self.simulation.arrow):
+            self.getArrow().update()
+            self.retireArrow(self.getArrow())
+            self.elements.add(Elements.Arrow(self.simulation.arrow), layer = ARROW_LAYER)
+        self.getArrow().update(alpha)
+        self.archerTorso.update(self.simulation.arrowAngle)
+
+        # Apples
+        for apple in self.elements.get_sprites_from_layer(APPLE_LAYER):
+            apple.sync()
+
+        # Butterflies, adding a sprite for the hitsplat of each one hit
+        for splat in self.swarm.update(alpha):
+            self.elements.add(splat, layer = BUTTERFLY_LAYER)
+        self.mark("sync")
+
+    """
+     " Retire Arrow
+     "   Draws an arrow that has finished its flight into the plate and removes its
+     "   sprite. An arrow resting on a changing element beneath it cannot be drawn
+     "   into the plate, so it is kept as a sprite up to SPENT_ARROW_LIMIT
+     "
+     "   @param arrow: the sprite of the spent arrow
+    """
+    def retireArrow(self, arrow):
+        if (not arrow.rect.colliderect(self.screen.get_rect())):
+            # Left the side of the window
+            self.elements.remove(arrow)
+            return
+
+        beneath = self.elements.get_sprites_from_layer(ARCHER_LAYER) + self.elements.get_sprites_from_layer(APPLE_LAYER)
+        if (arrow.rect.collidelist([sprite.rect for sprite in beneath]) == -1):
+            self.compositor.bake(arrow.image, arrow.rect)
+            self.plateRects.append(arrow.rect)
+            self.elements.remove(arrow)
+        else:
+            spentArrows = self.elements.get_sprites_from_layer(ARROW_LAYER)
+            if (len(spentArrows) > SPENT_ARROW_LIMIT):
+                self.elements.remove(spentArrows[0])
+
+    """
+     " Move Clouds
+     "   Moves the clouds with the current wind speed for the game time since they
+     "   were last moved
+    """
+    def moveClouds(self):
+        elapsed = self.simulation.ticks - self.cloudTicks
+        self.cloudTicks = self.simulation.ticks
+        self.clouds.move(self.simulation.windSpeed * CLOUD_SPEED * elapsed / 1000.0)
+        self.mark("clouds")
+
+    """
+     " Show Overlay
+     "   Adds an overlay sprite on its own layer and redraws the screen
+     "
+     "   @param overlay: the overlay sprite
+     "   @param layer: the layer of the overlay
+    """
+    def showOverlay(self, overlay, layer):
+        self.overlays.add(overlay, layer = layer)
+        self.redraw()
+
+    """
+     " Hide Overlay
+     "   Removes the overlay on a layer. The screen is redrawn on the next redraw
+     "
+     "   @param layer: the layer of the overlay
+    """
+    def hideOverlay(self, layer):
+        self.overlays.remove_sprites_of_layer(layer)
+
+    """
+     " Draw Background
+     "   Draws the plates over the whole screen and updates the entire display
+    """
+    def drawBackground(self):
+        self.compositor.build()
+        self.compositor.restore(self.screen, self.screen.get_rect())
+        self.compositor.cover(self.screen, [self.screen.get_rect()])
+        pygame.display.update()
+        self.plateRects = []
+        self.fullUpdate = False
+
+    """
+     " Redraw
+     "   Redraws only parts of the main surface that have changed since the last
+     "   time this function was called
+    """
+    def redraw(self):
+        # Clear the screen where sprites were drawn on the last redraw and where the
+        # plates or clouds have changed. Beneath the upper plate and the clouds, where
+        # sprites are about to be drawn is cleared too so that it is only covered once.
+        # Rebuilt plates are drawn over the whole screen
+        screenRect = self.screen.get_rect()
+        if (self.compositor.build() is True):
+            self.plateRects = [screenRect]
+            self.fullUpdate = True
+        spriteRects = [sprite.rect.clip(screenRect) for sprite in self.elements] + [rect.clip(screenRect) for rect in self.swarm.rects] + [sprite.rect.clip(screenRect) for sprite in self.overlays if sprite is not self.banner]
+        drawn = set(tuple(rect) for rect in self.drawnRects)
+        movedRects = [rect for rect in spriteRects if tuple(rect) not in drawn]
+
+        # The whole band beneath the clouds is redrawn once they have scrolled by a
+        # pixel, or when there are so many sprites beneath them that drawing the strip
+        # over each one would cost more
+        beneath = [rect.clip(self.clouds.rect) for rect in self.drawnRects + movedRects if rect.colliderect(self.clouds.rect)]
+        if (self.clouds.getPosition() != self.cloudPosition or DirtyRects.getCost(beneath) >= self.clouds.rect.width * self.clouds.rect.height):
+            self.plateRects.append(self.clouds.rect)
+            self.cloudPosition = self.clouds.getPosition()
+        coveredAreas = [self.compositor.upperRect, self.clouds.rect]
+        clearedRectangles = self.plateRects + self.drawnRects + [rect.clip(area) for rect in movedRects for area in coveredAreas if rect.colliderect(area)]
+        for rect in clearedRectangles:
+            self.compositor.restore(self.screen, rect)
+        self.mark("clear")
+
+        # Update the banner. Being translucent it is only drawn where what is beneath
+        # it was cleared or where it changed, so the changed parts are cleared too
+        Elements.Banner.setPower(self.simulation.power)
+        Elements.Banner.setPoints(self.simulation.points)
+        Elements.Banner.setTimeRemaining(self.simulation.timeRemaining)
+        Elements.Banner.setWindSpeed(self.simulation.windSpeed)
+        bannerRectangles = Elements.Banner.update()
+        for rect in bannerRectangles:
+            self.compositor.restore(self.screen, rect)
+        clearedRectangles += bannerRectangles
+        for overlay in self.overlays.get_sprites_from_layer(PROFILER_LAYER):
+            overlay.update()
+        self.mark("banner")
+
+        # Redraw the cleared rectangles, covering the sprites beneath the clouds and the
+        # upper plate, then the cleared parts of the banner beneath the other overlays
+        self.elements.draw(self.screen)
+        self.swarm.draw(self.screen)
+        for part in splitRects(clearedRectangles, self.clouds.rect):
+            self.clouds.draw(self.screen, part)
+        self.compositor.cover(self.screen, clearedRectangles)
+        for part in splitRects(clearedRectangles, self.banner.rect):
+            self.screen.blit(self.banner.image, part, part.move(-self.banner.rect.x, -self.banner.rect.y))
+        for overlay in self.overlays.sprites():
+            if (overlay is not self.banner):
+                self.screen.blit(overlay.image, overlay.rect)
+        updatedRectangles = self.plateRects + [rect for rect in self.drawnRects + movedRects
+                                               if not any(plate.contains(rect) for plate in self.plateRects)] + bannerRectangles
+        self.drawnRects = spriteRects
+        self.plateRects = []
+        self.mark("draw")
+
+        # Push the changes with whichever of the rectangles, merged rectangles or a
+        # full flip is cheapest
+        strategy, pushedRectangles = DirtyRects.present(updatedRectangles, screenRect, self.fullUpdate)
+        self.fullUpdate = False
+        self.mark("display")
+        if (self.profiler is not None):
+            self.profiler.countRects(pushedRectangles, strategy)
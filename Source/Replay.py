@@ -0,0 +1,318 @@
+import os, sys, struct, argparse, timeit
+
+import pygame
+import Generic, Assets, Simulation, Renderer, Level
+
+"""
+ " Constants
+"""
+# Identifies a replay and the layout of its header
+REPLAY_MAGIC                =   b"ARPL"
+REPLAY_VERSION              =   1
+
+# Little endian header: magic, version, signed seed of the game, seconds each game
+# lasts, fixed steps per second and the name of the level played
+REPLAY_NAME_LENGTH          =   32
+REPLAY_HEADER               =   struct.Struct("<4sIqII%ds" % REPLAY_NAME_LENGTH)
+REPLAY_SEED_BITS            =   64
+
+# The header is followed by records, each a varint holding a value shifted above the
+# kind of the record. Input records come before the frame they were received in
+RECORD_BITS                 =   3
+RECORD_FRAME                =   0   # End of a frame, the value is the change in elapsed milliseconds from the previous frame
+RECORD_AIM                  =   1   # The cursor moved, the value is the change in x, followed by a varint of the change in y
+RECORD_PRESS                =   2   # The mouse button was pressed
+RECORD_RELEASE              =   3   # The mouse button was released
+RECORD_RESET                =   4   # The game was restarted
+
+# Bytes of records kept in memory before they are written to the file
+REPLAY_BUFFER_SIZE          =   4096
+
+"""
+ " Zigzag
+ "   Maps a signed integer to an unsigned one so that small changes either way
+ "   encode to few bytes (0, -1, 1, -2, 2 become 0, 1, 2, 3, 4)
+ "
+ "   @param value: the signed integer
+"""
+def zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+"""
+ " Unzigzag
+ "   Reverses zigzag()
+ "
+ "   @param value: the unsigned integer
+"""
+def unzigzag(value):
+    return value >> 1 if value & 1 == 0 else -(value >> 1) - 1
+
+"""
+ " Write Varint
+ "   Appends an unsigned integer seven bits per byte, lowest first, with the top
+ "   bit of each byte set while more bytes follow
+ "
+ "   @param data: the bytearray to append to
+ "   @param value: the unsigned integer
+"""
+def writeVarint(data, value):
+    while (value >= 0x80):
+        data.append((value & 0x7f) | 0x80)
+        value >>= 7
+    data.append(value)
+
+"""
+ " Read Varint
+ "   Reads an unsigned integer written by writeVarint(). Returns the integer and the
+ "   index of the byte after it, and raises ValueError if the data ends first
+ "
+ "   @param data: the bytearray to read from
+ "   @param index: the index of the first byte of the integer
+"""
+def readVarint(data, index):
+    value = 0
+    shift = 0
+    while (True):
+        if (index >= len(data)):
+            raise ValueError("replay is truncated")
+        byte = data[index]
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        index += 1
+        if (byte < 0x80):
+            return value, index
+
+"""
+ " Recorder
+ "   Writes the seed and every input of a game to a replay as it is played. Each
+ "   frame records how much longer it took than the previous one and each cursor
+ "   movement how far the cursor moved, so a steady frame without input takes a
+ "   single byte. Records are buffered and written in whole records, so a game that
+ "   crashes leaves a replay of everything up to the last write
+"""
+class Recorder(object):
+    """
+     " Constructor
+     "   @param path: the path of the replay to write
+     "   @param seed: seed of the random number generator of the game
+     "   @param level: the name of the level played
+     "   @param timeRemaining: the number of seconds each game lasts (default = 120)
+     "   @param physicsRate: the number of fixed steps per second (default = Generic.PHYSICS_RATE)
+    """
+    def __init__(self, path, seed, level, timeRemaining = 120, physicsRate = Generic.PHYSICS_RATE):
+        name = level.encode("utf-8")
+        if (len(name) > REPLAY_NAME_LENGTH):
+            raise ValueError("%s is too long a level name to record" % level)
+        if (not -(1 << (REPLAY_SEED_BITS - 1)) <= seed < (1 << (REPLAY_SEED_BITS - 1))):
+            raise ValueError("%d is too large a seed to record" % seed)
+        self.replayFile = open(path, "wb")
+        self.replayFile.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, seed, timeRemaining, physicsRate, name))
+        self.data = bytearray()
+        self.elapsed = 0            # Elapsed milliseconds of the previous frame
+        self.cursor = (0, 0)        # Cursor position of the previous cursor movement
+
+    """
+     " Frame
+     "   Records the input of a frame and the time that was simulated
+     "
+     "   @param elapsed: the whole number of milliseconds passed to Simulation.advance
+     "   @param inputs: list of (INPUT_*, position) tuples passed to Simulation.advance
+    """
+    def frame(self, elapsed, inputs):
+        for inputType, position in inputs:
+            if (inputType == Simulation.INPUT_AIM):
+                writeVarint(self.data, zigzag(position[0] - self.cursor[0]) << RECORD_BITS | RECORD_AIM)
+                writeVarint(self.data, zigzag(position[1] - self.cursor[1]))
+                self.cursor = position
+            elif (inputType == Simulation.INPUT_PRESS):
+                self.data.append(RECORD_PRESS)
+            elif (inputType == Simulation.INPUT_RELEASE):
+                self.data.append(RECORD_RELEASE)
+        writeVarint(self.data, zigzag(elapsed - self.elapsed) << RECORD_BITS | RECORD_FRAME)
+        self.elapsed = elapsed
+        if (len(self.data) >= REPLAY_BUFFER_SIZE):
+            self.flush()
+
+    """
+     " Reset
+     "   Records the game being restarted
+    """
+    def reset(self):
+        self.data.append(RECORD_RESET)
+        self.flush()
+
+    """
+     " Flush
+     "   Writes the buffered records to the file
+    """
+    def flush(self):
+        self.replayFile.write(self.data)
+        self.replayFile.flush()
+        self.data = bytearray()
+
+    """
+     " Close
+     "   Writes the buffered records and closes the file
+    """
+    def close(self):
+        self.flush()
+        self.replayFile.close()
+
+"""
+ " Replay
+ "   A recorded game decoded into the frames to feed back to the simulation
+"""
+class Replay(object):
+    """
+     " Constructor
+     "   @param seed: seed of the random number generator of the game
+     "   @param level: the name of the level played
+     "   @param timeRemaining: the number of seconds each game lasts
+     "   @param physicsRate: the number of fixed steps per second
+     "   @param frames: list of (elapsed milliseconds, inputs) of each frame, with None
+     "                  where the game was restarted
+    """
+    def __init__(self, seed, level, timeRemaining, physicsRate, frames):
+        self.seed = seed
+        self.level = level
+        self.timeRemaining = timeRemaining
+        self.physicsRate = physicsRate
+        self.frames = frames
+
+    """
+     " Get Duration
+     "   Gets the milliseconds of game time in the replay
+    """
+    def getDuration(self):
+        return sum(frame[0] for frame in self.frames if frame is not None)
+
+"""
+ " Decode
+ "   Reads a replay from the data written by a Recorder. Raises ValueError if the
+ "   data is not a replay of this version
+ "
+ "   @param data: the contents of the replay file
+"""
+def decode(data):
+    try:
+        magic, version, seed, timeRemaining, physicsRate, name = REPLAY_HEADER.unpack_from(data, 0)
+    except struct.error:
+        raise ValueError("not a replay")
+    if (magic != REPLAY_MAGIC or version != REPLAY_VERSION):
+        raise ValueError("not a version %d replay" % REPLAY_VERSION)
+
+    frames = []
+    inputs = []
+    elapsed = 0
+    cursor = (0, 0)
+    records = bytearray(data)
+    count = len(records)
+    index = REPLAY_HEADER.size
+    while (index < count):
+        record, index = readVarint(records, index)
+        kind = record & ((1 << RECORD_BITS) - 1)
+        if (kind == RECORD_FRAME):
+            elapsed += unzigzag(record >> RECORD_BITS)
+            frames.append((elapsed, inputs))
+            inputs = []
+        elif (kind == RECORD_AIM):
+            y, index = readVarint(records, index)
+            cursor = (cursor[0] + unzigzag(record >> RECORD_BITS), cursor[1] + unzigzag(y))
+            inputs.append((Simulation.INPUT_AIM, cursor))
+        elif (kind == RECORD_PRESS):
+            inputs.append((Simulation.INPUT_PRESS, None))
+        elif (kind == RECORD_RELEASE):
+            inputs.append((Simulation.INPUT_RELEASE, None))
+        elif (kind == RECORD_RESET):
+            frames.append(None)
+        else:
+            raise ValueError("replay has an unknown record %d" % kind)
+
+    return Replay(seed, name.rstrip(b"\0").decode("utf-8"), timeRemaining, physicsRate, frames)
+
+"""
+ " Load
+ "   Reads a replay file
+ "
+ "   @param path: the path of the replay
+"""
+def load(path):
+    with open(path, "rb") as replayFile:
+        return decode(replayFile.read())
+
+"""
+ " Play
+ "   Feeds a replay back to a new game on a virtual clock that only moves by the
+ "   recorded frame times, so the game plays out exactly as it was recorded however
+ "   fast it is run. Without rendering nothing is drawn or waited for and the game
+ "   runs as fast as the simulation allows. Returns the (points, ticks, apple hits,
+ "   butterfly hits) of each game played
+ "
+ "   @param replay: the replay to play (see Replay)
+ "   @param render: True to draw the game in a window (default = False)
+ "   @param realTime: True to wait for each frame to be due on the wall clock (default = False)
+"""
+def play(replay, render = False, realTime = False):
+    simulation = Simulation.Simulation(replay.seed, replay.timeRemaining, replay.physicsRate, Level.load(replay.level))
+    renderer = None
+    if (render is True):
+        pygame.init()
+        pygame.display.set_caption("Applarrow replay")
+        screen = pygame.display.set_mode((Generic.WINDOW_WIDTH, Generic.WINDOW_HEIGHT), pygame.DOUBLEBUF)
+        Assets.preload()
+        renderer = Renderer.Renderer(screen, simulation)
+        renderer.drawBackground()
+
+    results = []
+    clock = 0                   # Virtual milliseconds played
+    startTime = timeit.default_timer()
+    for frame in replay.frames:
+        if (frame is None):
+            results.append((simulation.points, simulation.ticks, list(simulation.appleHits), simulation.butterflyHits))
+            simulation.reset()
+            if (renderer is not None):
+                renderer.load()
+            continue
+
+        elapsed, inputs = frame
+        alpha = simulation.advance(elapsed, inputs)
+        clock += elapsed
+        if (renderer is not None):
+            if (any(event.type == pygame.QUIT for event in pygame.event.get())):
+                break
+            renderer.sync(alpha)
+            renderer.moveClouds()
+            renderer.redraw()
+        if (realTime is True):
+            delay = clock / 1000.0 - (timeit.default_timer() - startTime)
+            if (delay > 0):
+                pygame.time.wait(int(delay * 1000))
+
+    results.append((simulation.points, simulation.ticks, list(simulation.appleHits), simulation.butterflyHits))
+    return results
+
+"""
+ " Main
+ "   Plays replay files, headless and as fast as possible unless asked otherwise
+"""
+def main():
+    parser = argparse.ArgumentParser(description = "Plays back Applarrow replays recorded with Applarrow.py --record.")
+    parser.add_argument("replays", nargs = "+", help = "replay files to play")
+    parser.add_argument("--render", action = "store_true", help = "draw the game in a window")
+    parser.add_argument("--real-time", action = "store_true", help = "play at the recorded speed rather than as fast as possible")
+    arguments = parser.parse_args()
+
+    if (arguments.render is False):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    for path in arguments.replays:
+        replay = load(path)
+        startTime = timeit.default_timer()
+        results = play(replay, arguments.render, arguments.real_time)
+        elapsed = timeit.default_timer() - startTime
+        print("%s: seed %d, level %s, %.1fs of game time played in %.3fs" % (path, replay.seed, replay.level, replay.getDuration() / 1000.0, elapsed))
+        for game, (points, ticks, appleHits, butterflyHits) in enumerate(results):
+            print("  game %d: %d points in %.1fs, apples hit %s, butterflies hit %d" % (game + 1, points, ticks / 1000.0, appleHits, butterflyHits))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
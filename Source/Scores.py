@@ -0,0 +1,148 @@
+import os, struct, time, heapq, threading
+import ConfigParser, Queue
+from collections import namedtuple
+import Generic
+
+"""
+ " Constants
+"""
+# Files the scores are kept in, relative to the working directory
+SETTINGS_FILE               =   "settings.ini"
+HISTORY_FILE                =   "history.dat"
+
+# Fixed size little endian history record: finish time, score, duration in milliseconds,
+# good, bad and special apple hits, butterfly hits
+HISTORY_RECORD              =   struct.Struct("<IIIHHHH")
+
+"""
+ " Game Record
+ "   A finished game in the history
+"""
+GameRecord = namedtuple("GameRecord", ["finished", "score", "duration", "goodHits", "badHits", "specialHits", "butterflyHits"])
+
+"""
+ " Score Store
+ "   Keeps the highscore and the history of finished games. Both files are read
+ "   once when the store is created and held in memory. Changes are written by a
+ "   background thread, the settings through a temporary file that replaces the
+ "   original and the history by appending a fixed size record, so recording a
+ "   game never waits on the disk
+"""
+class ScoreStore(object):
+    """
+     " Constructor
+     "   @param settingsPath: the path of the settings file (default = SETTINGS_FILE)
+     "   @param historyPath: the path of the history file (default = HISTORY_FILE)
+    """
+    def __init__(self, settingsPath = SETTINGS_FILE, historyPath = HISTORY_FILE):
+        self.settingsPath = settingsPath
+        self.historyPath = historyPath
+
+        # Settings, a missing file or section counts as a highscore of 0
+        self.config = ConfigParser.RawConfigParser()
+        self.config.read(settingsPath)
+        if (not self.config.has_section("SCORE")):
+            self.config.add_section("SCORE")
+        try:
+            self.highscore = self.config.getint("SCORE", "highscore")
+        except (ConfigParser.Error, ValueError):
+            self.highscore = 0
+
+        # History, ignoring a record cut short by a crash while it was written
+        self.history = []
+        if (os.path.exists(historyPath)):
+            with open(historyPath, "rb") as historyFile:
+                data = historyFile.read()
+            length = len(data) - (len(data) % HISTORY_RECORD.size)
+            for offset in range(0, length, HISTORY_RECORD.size):
+                self.history.append(GameRecord(*HISTORY_RECORD.unpack_from(data, offset)))
+            if (length != len(data)):
+                with open(historyPath, "r+b") as historyFile:
+                    historyFile.truncate(length)
+
+        # Background writer
+        self.writes = Queue.Queue()
+        self.writer = threading.Thread(target = self.write)
+        self.writer.daemon = True
+        self.writer.start()
+
+    """
+     " Get Highscore
+     "   Gets the highest score of any game
+    """
+    def getHighscore(self):
+        return self.highscore
+
+    """
+     " Get Top Scores
+     "   Gets the best finished games, highest score first
+     "
+     "   @param count: the number of games to get
+    """
+    def getTopScores(self, count):
+        return heapq.nlargest(count, self.history, key = lambda record: record.score)
+
+    """
+     " Record Game
+     "   Adds a finished game to the history, updating the highscore if it was
+     "   beaten. The files are written in the background
+     "
+     "   @param score: the number of points scored
+     "   @param duration: the length of the game in milliseconds
+     "   @param appleHits: the number of hits on each apple type, indexed by type
+     "   @param butterflyHits: the number of butterflies hit
+    """
+    def recordGame(self, score, duration, appleHits, butterflyHits):
+        record = GameRecord(int(time.time()), score, int(duration), appleHits[0], appleHits[1], appleHits[2], butterflyHits)
+        self.history.append(record)
+        self.writes.put((self.appendHistory, record))
+        if (score > self.highscore):
+            self.highscore = score
+            self.writes.put((self.saveHighscore, score))
+
+    """
+     " Flush
+     "   Waits until every change has been written
+    """
+    def flush(self):
+        self.writes.join()
+
+    """
+     " Write
+     "   Runs on the background thread, writing each change in the order it was made
+    """
+    def write(self):
+        while (True):
+            function, value = self.writes.get()
+            try:
+                function(value)
+            except (IOError, OSError):
+                # A failed write loses that change only, the game keeps running
+                pass
+            finally:
+                self.writes.task_done()
+
+    """
+     " Save Highscore
+     "   Writes the highscore to a temporary file that then replaces the settings
+     "
+     "   @param highscore: the highscore to save
+    """
+    def saveHighscore(self, highscore):
+        self.config.set("SCORE", "highscore", str(highscore))
+        temporaryPath = self.settingsPath + ".tmp"
+        with open(temporaryPath, "wb") as configFile:
+            self.config.write(configFile)
+            configFile.flush()
+            os.fsync(configFile.fileno())
+        Generic.replaceFile(temporaryPath, self.settingsPath)
+
+    """
+     " Append History
+     "   Appends a record to the end of the history file
+     "
+     "   @param record: the game record to append
+    """
+    def appendHistory(self, record):
+        with open(self.historyPath, "ab") as historyFile:
+            historyFile.write(HISTORY_RECORD.pack(*record))
@@ -0,0 +1,123 @@
+import pygame
+import Assets
+
+"""
+ " Shape registry
+ "   Collision masks and sizes of images, built once from the decoded image and
+ "   kept without any surfaces so the simulation can run headless. The renderer
+ "   draws from its own surfaces in Assets, built from the same image and rotation
+ "   step so that what is drawn always matches what collides
+"""
+shapes = {}     # Shapes keyed by (resource file name, frame width, frame height), or (resource file name, None, None) for a whole image
+rotations = {}  # Rotated shapes keyed by (resource file name, rotation step)
+
+"""
+ " Shape
+ "   The collision mask of an image and the size it is drawn at
+"""
+class Shape(object):
+    """
+     " Constructor
+     "   @param mask: the collision mask of the image
+    """
+    def __init__(self, mask):
+        self.mask = mask
+        self.width, self.height = mask.get_size()
+
+    """
+     " Get Rect
+     "   Gets the rectangle covered by the shape
+     "
+     "   @param center: the center of the rectangle (default = the origin)
+    """
+    def getRect(self, center = (0, 0)):
+        rect = pygame.Rect(0, 0, self.width, self.height)
+        rect.center = center
+        return rect
+
+"""
+ " Get Shape
+ "   Gets the shape of a whole image
+ "
+ "   @param name: the file name of the image (e.g. "apple-red.png")
+"""
+def getShape(name):
+    key = (name, None, None)
+    shape = shapes.get(key)
+    if (shape is None):
+        shape = Shape(pygame.mask.from_surface(Assets.load(name)))
+        shapes[key] = shape
+    return shape
+
+"""
+ " Get Frame Shapes
+ "   Gets the shape of each frame of a horizontal strip of equally sized frames,
+ "   sliced the same way as Assets.SpriteSheet
+ "
+ "   @param name: the file name of the sprite sheet image
+ "   @param frameWidth: the width in pixels of each frame
+ "   @param frameHeight: the height in pixels of each frame
+"""
+def getFrameShapes(name, frameWidth, frameHeight):
+    key = (name, frameWidth, frameHeight)
+    frames = shapes.get(key)
+    if (frames is None):
+        sheet = Assets.load(name)
+        frames = [Shape(pygame.mask.from_surface(sheet.subsurface(pygame.Rect(x, 0, frameWidth, frameHeight)))) for x in range(0, sheet.get_width() - frameWidth + 1, frameWidth)]
+        shapes[key] = frames
+    return frames
+
+"""
+ " Rotated Shape
+ "   The shape of an image at every rotation, quantised the same way as
+ "   Assets.RotationCache. Every rotation is built up front, which is cheap as only
+ "   the masks are kept
+"""
+class RotatedShape(object):
+    """
+     " Constructor
+     "   @param name: the file name of the image to rotate
+     "   @param step: the angle quantisation in degrees (default = Assets.ROTATION_STEP)
+    """
+    def __init__(self, name, step = Assets.ROTATION_STEP):
+        image = Assets.load(name)
+        self.step = step
+        self.buckets = int(round(360.0 / step))
+        self.width, self.height = image.get_size()
+        self.shapes = [Shape(pygame.mask.from_surface(pygame.transform.rotozoom(image, bucket * step, 1))) for bucket in range(self.buckets)]
+
+    """
+     " Get
+     "   Gets the shape of the image rotated by an angle
+     "
+     "   @param angle: the angle in degrees
+    """
+    def get(self, angle):
+        return self.shapes[int(round(angle / float(self.step))) % self.buckets]
+
+    """
+     " Rotate Center
+     "   Gets the mask and rectangle of the image rotated about the center of a
+     "   rectangle
+     "
+     "   @param rect: the rectangle whose center the image is rotated about
+     "   @param angle: the angle in degrees to rotate the image by
+    """
+    def rotateCenter(self, rect, angle):
+        shape = self.get(angle)
+        return shape.mask, shape.getRect(rect.center)
+
+"""
+ " Get Rotated Shape
+ "   Gets the rotated shape of an image, building it the first time it is requested
+ "
+ "   @param name: the file name of the image to rotate
+ "   @param step: the angle quantisation in degrees (default = Assets.ROTATION_STEP)
+"""
+def getRotatedShape(name, step = Assets.ROTATION_STEP):
+    key = (name, step)
+    rotation = rotations.get(key)
+    if (rotation is None):
+        rotation = RotatedShape(name, step)
+        rotations[key] = rotation
+    return rotation
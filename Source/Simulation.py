@@ -0,0 +1,764 @@
+import pygame, math, random, numpy
+from collections import namedtuple
+import Generic, Shapes, Collision, Level, Difficulty
+from Generic import *
+
+"""
+ " Constants
+"""
+# Input types accepted by Simulation.step
+INPUT_AIM                   =   0   # The cursor moved, the position is given
+INPUT_PRESS                 =   1   # The mouse button was pressed
+INPUT_RELEASE               =   2   # The mouse button was released
+
+# Center of the arrow when it is loaded and the point it is rotated about
+ARROW_REST_CENTER           =   [-4, 364]
+ARROW_PIVOT                 =   [24, 410]
+
+# Point the archer aims from
+AIM_ORIGIN                  =   [50, 366]
+
+# Swarms smaller than this are updated one butterfly at a time, as the fixed cost of
+# each array operation outweighs looping over a few butterflies
+SWARM_VECTOR_SIZE           =   32
+
+"""
+ " Interpolate
+ "   Gets the point a fraction of the way between two points. If there is no
+ "   start point the end point is returned unchanged
+ "
+ "   @param start: the start point, or None
+ "   @param end: the end point
+ "   @param alpha: the fraction of the way from start to end, between 0 and 1
+"""
+def interpolate(start, end, alpha):
+    if (start is None):
+        return end
+    return (start[0] + (end[0] - start[0]) * alpha, start[1] + (end[1] - start[1]) * alpha)
+
+"""
+ " Get Butterfly Flight
+ "   Gets the wing frame of a butterfly and how far along its path it is, as the
+ "   index of the path sample it has passed and the fraction of the way to the next
+ "   sample. Works on a single butterfly or on arrays of butterflies, given the
+ "   minimum and truncation functions to use, so the swarm is stepped with the same
+ "   arithmetic however many butterflies it holds
+ "
+ "   @param elapsed: milliseconds since the butterfly was loaded
+ "   @param flightTime: milliseconds taken to fly the path
+ "   @param samples: the number of path samples after the first
+ "   @param frameCount: the number of wing frames
+ "   @param minimum: gets the smaller of two values (min or numpy.minimum)
+ "   @param truncate: truncates a value to an integer (int or an array cast)
+"""
+def getButterflyFlight(elapsed, flightTime, samples, frameCount, minimum, truncate):
+    frame = truncate(elapsed // BUTTERFLY_FRAME_TIME) % frameCount
+    position = minimum(elapsed / flightTime, 1.0) * samples
+    sample = minimum(truncate(position), samples - 1)
+    return frame, sample, position - sample
+
+"""
+ " Get Butterfly Coordinate
+ "   Gets one coordinate of a butterfly between two path samples. Works on a single
+ "   butterfly or on arrays of butterflies (see getButterflyFlight)
+ "
+ "   @param start: the coordinate of the sample the butterfly has passed
+ "   @param end: the coordinate of the next sample
+ "   @param fraction: the fraction of the way from start to end
+ "   @param truncate: truncates a value to an integer (int or an array cast)
+"""
+def getButterflyCoordinate(start, end, fraction, truncate):
+    return truncate(start + (end - start) * fraction)
+
+"""
+ " Butterfly Overlaps
+ "   Returns True where a butterfly rectangle overlaps a rectangle. Works on a single
+ "   butterfly or on arrays of butterflies
+ "
+ "   @param left: the left edge of the butterfly
+ "   @param top: the top edge of the butterfly
+ "   @param width: the width of a butterfly
+ "   @param height: the height of a butterfly
+ "   @param rect: the rectangle to test
+"""
+def butterflyOverlaps(left, top, width, height, rect):
+    return (left < rect.right) & (rect.left < left + width) & (top < rect.bottom) & (rect.top < top + height)
+
+"""
+ " Arrow State
+ "   Position and flight of a single arrow. Air resistance is not taken into
+ "   account. The rotated mask and rectangle are taken from a rotated shape shared by
+ "   every arrow, the renderer draws the image for the angle itself
+"""
+class ArrowState(object):
+    shape = None                # Rotations of the arrow shape shared by every arrow
+
+    """
+     " Constructor
+    """
+    def __init__(self):
+        if (ArrowState.shape is None):
+            ArrowState.shape = Shapes.getRotatedShape("arrow.png")
+        self.mask = None                # Arrow mask at the current angle
+        self.rect = None                # Arrow rectangle
+        self.angle = 0                  # The current angle of the arrow in radians
+        self.fired = False              # True if the arrow has been fired
+        self.flying = False             # True if the arrow is in a flying state
+        self.firedAngle = 0             # The angle the arrow was fired at in radians
+        self.firedTicks = 0             # Game ticks when the arrow was fired
+        self.initialVelocity = 0        # The velocity that the arrow was fired at (in meters per second)
+        self.initialPosition = [0, 0]   # The initial position of the arrow
+        self.previousCenter = [0, 0]    # The previous center location of the arrow
+        self.renderFrom = None          # The center at the start of the current step, used for interpolation
+        self.update(0)
+
+    """
+     " Snapshot
+     "   Records the position at the start of a step so that it can be drawn part
+     "   way between steps
+    """
+    def snapshot(self):
+        self.renderFrom = self.rect.center
+
+    """
+     " Get Render Rect
+     "   Gets the rectangle to draw the arrow at, part way between the previous
+     "   step and the current step
+     "
+     "   @param alpha: the fraction of a step that has passed since the current step
+    """
+    def getRenderRect(self, alpha):
+        rect = self.rect.copy()
+        rect.center = interpolate(self.renderFrom, self.rect.center, alpha)
+        return rect
+
+    """
+     " Update
+     "   Updates the arrow position and angle based on the previous location
+     "   of the arrow
+     "
+     "   @param angle: the angle of the arrow in radians
+    """
+    def update(self, angle):
+        # Static rotation
+        if (self.flying == False):
+            self.rect = pygame.Rect(0, 0, ArrowState.shape.width, ArrowState.shape.height)
+            self.rect.center = ARROW_REST_CENTER
+            self.rect.x, self.rect.y = rotatePoint(self.rect, ARROW_PIVOT, angle)
+
+        # Rotate the arrow about the center
+        self.angle = angle
+        self.mask, self.rect = ArrowState.shape.rotateCenter(self.rect, math.degrees(angle))
+        self.previousCenter = self.rect.center
+
+    """
+     " Fire
+     "   Fires the arrow, saving the initial velocity and initial position for
+     "   further calculations
+     "
+     "   @param power: the percentage of power when the mouse was released
+     "   @param windSpeed: the current wind speed
+     "   @param ticks: the game ticks when the arrow was fired
+    """
+    def fire(self, power, windSpeed, ticks):
+        self.fired = True
+        self.flying = True
+        self.firedAngle = self.angle
+        self.firedTicks = ticks
+        self.initialVelocity = calculateVelocity(power, windSpeed)
+        self.initialPosition = self.rect.center
+
+    """
+     " Fly
+     "   Moves and rotates the arrow along the parabolic path calculated with
+     "   standard equations of motion, excluding any effects of air resistance
+     "
+     "   @param time: seconds since the arrow was fired
+    """
+    def fly(self, time):
+        if (time != 0):
+            # Calculation of arrow position
+            x = self.initialVelocity * time * math.cos(self.firedAngle)
+            y = self.initialVelocity * time * math.sin(self.firedAngle) - ((Generic.ACCELERATION_DUE_TO_GRAVITY * math.pow(time, 2)) / 2)
+
+            # Apply the changes
+            self.rect.centerx = (x * Generic.PIXELS_PER_METER) + self.initialPosition[0]
+            self.rect.centery = self.initialPosition[1] - (y * Generic.PIXELS_PER_METER)
+
+            # Rotate the arrow
+            angle = -(math.atan2(self.previousCenter[1] - self.rect.centery, self.previousCenter[0] - self.rect.centerx)) + math.pi
+            self.update(angle)
+
+            # Checks the bounds of the arrow
+            if (self.rect.bottom >= Generic.WINDOW_HEIGHT - 16) or (self.rect.left > Generic.WINDOW_WIDTH) or (self.rect.right < 0):
+                self.flying = False
+
+"""
+ " Apple State
+ "   A single apple on the tree. The type and timeout are randomised each time the
+ "   apple is loaded
+"""
+class AppleState(object):
+    """
+     " Constructor
+     "   @param location: the center location of the apple
+     "   @param ticks: game ticks when the apple was initialised
+     "   @param generator: the random number generator of the game
+    """
+    def __init__(self, location, ticks, generator):
+        self.location = location    # The center location of the apple
+        self.generator = generator  # The random number generator of the game
+        self.generation = 0         # Incremented each time the apple is loaded
+        self.load(ticks)
+
+    """
+     " Load
+     "   Loads the core settings for an individual apple. Type and timeout
+     "   are randomised and all other settings follow from this selection
+     "
+     "   @param ticks: game ticks when the apple was loaded
+    """
+    def load(self, ticks):
+        # Randomise the apple type and timeout
+        self.appleType = self.generator.randint(Generic.APPLE_GOOD, Generic.APPLE_SPECIAL)
+        self.appleTimeout = self.generator.randint((((-self.appleType + 2) * 3000) + 1000), 20000)
+
+        # Record the initial settings
+        self.appleInitTicks = ticks
+        self.appleHit = False
+        self.generation += 1
+
+        # Select the points and time awarded for this type
+        if (self.appleType == Generic.APPLE_BAD):
+            self.pointsPerApple = Generic.POINTS_PER_BAD_APPLE
+            self.timePerApple = Generic.TIME_PER_BAD_APPLE
+        elif (self.appleType == Generic.APPLE_SPECIAL):
+            self.pointsPerApple = Generic.POINTS_PER_SPECIAL_APPLE
+            self.timePerApple = Generic.TIME_PER_SPECIAL_APPLE
+        else:
+            self.pointsPerApple = Generic.POINTS_PER_GOOD_APPLE
+            self.timePerApple = Generic.TIME_PER_GOOD_APPLE
+
+        # Store the collision shape of the apple
+        shape = Shapes.getShape(Generic.APPLE_IMAGES[self.appleType])
+        self.mask = shape.mask
+        self.rect = shape.getRect(self.location)
+
+    """
+     " Hit
+     "   Records a hit on the apple, returning False if it had already been hit
+    """
+    def hit(self):
+        if (self.appleHit is True):
+            return False
+
+        # Add 500ms to the timeout to avoid double-hitting
+        self.appleTimeout += 500
+        self.appleHit = True
+        return True
+
+    """
+     " Change
+     "   Reloads the apple provided the current apple has timed out
+     "
+     "   @param ticks: the current game ticks
+    """
+    def change(self, ticks):
+        if (ticks > (self.appleInitTicks + self.appleTimeout)):
+            self.load(ticks)
+
+"""
+ " Butterfly Fields
+ "   The arrays a butterfly swarm keeps, each holding one value per butterfly
+"""
+BUTTERFLY_FIELDS            =   [("types", int),            # Butterfly type (see Generic.BUTTERFLY_ORANGE)
+                                 ("paths", int),            # Index of the level path flown
+                                 ("loadTicks", float),      # Game ticks when the butterfly was loaded
+                                 ("flightTimes", float),    # Milliseconds taken to fly the path
+                                 ("timeouts", float),       # Milliseconds after being hit before the butterfly is loaded again
+                                 ("hitTicks", float),       # Game ticks when the butterfly was hit or finished its path
+                                 ("gone", bool),            # True once the butterfly was hit or finished its path
+                                 ("shot", bool),            # True if the butterfly was hit by an arrow
+                                 ("generations", int),      # Incremented each time the butterfly is loaded
+                                 ("frames", int),           # Index of the wing frame shown
+                                 ("x", int),                # Center of the butterfly
+                                 ("y", int),
+                                 ("fromX", int),            # Center at the start of the current step, used for interpolation
+                                 ("fromY", int),
+                                 ("hasFrom", bool)]         # False where there is no center to interpolate from
+
+"""
+ " Butterfly Body
+ "   The collision shape of a single butterfly of a swarm
+"""
+ButterflyBody = namedtuple("ButterflyBody", ["index", "rect", "mask"])
+
+"""
+ " Butterfly Swarm
+ "   Every butterfly of a game, each flying along one of the level's Bezier paths.
+ "   The butterflies are kept as arrays with one element per butterfly, so the
+ "   whole swarm is moved and flapped in a single pass over the arrays however many
+ "   butterflies there are. Swarms smaller than SWARM_VECTOR_SIZE are stepped one
+ "   butterfly at a time instead. The type, path and timings are randomised each
+ "   time a butterfly is loaded
+"""
+class ButterflySwarm(object):
+    """
+     " Constructor
+     "   @param generator: the random number generator of the game
+     "   @param level: the level whose paths the butterflies fly (default = Level.load())
+    """
+    def __init__(self, generator, level = None):
+        self.generator = generator  # The random number generator of the game
+        self.level = level if level is not None else Level.load()
+        self.shapes = [Shapes.getFrameShapes(name, 35, 26) for name in Generic.BUTTERFLY_IMAGES]
+        self.frameCount = len(self.shapes[0])
+        self.width, self.height = self.shapes[0][0].width, self.shapes[0][0].height
+
+        # Sampled paths, indexed by path, sample and then x or y
+        self.pathTables = numpy.array(self.level.pathTables, dtype = float).transpose(0, 2, 1)
+        self.samples = self.pathTables.shape[1] - 1
+        self.pathLists = self.pathTables.tolist()
+
+        for name, dtype in BUTTERFLY_FIELDS:
+            setattr(self, name, numpy.zeros(0, dtype = dtype))
+
+    """
+     " Length
+     "   Gets the number of butterflies in the swarm
+    """
+    def __len__(self):
+        return len(self.types)
+
+    """
+     " Add
+     "   Adds a new butterfly to the swarm, returning its index
+     "
+     "   @param ticks: game ticks when the butterfly was added
+    """
+    def add(self, ticks):
+        for name, dtype in BUTTERFLY_FIELDS:
+            setattr(self, name, numpy.append(getattr(self, name), numpy.zeros(1, dtype = dtype)))
+        self.load(len(self) - 1, ticks)
+        return len(self) - 1
+
+    """
+     " Load
+     "   Clears the changable values of a butterfly and randomises its type and path
+     "   to create the appearance of a new butterfly
+     "
+     "   @param index: the index of the butterfly
+     "   @param ticks: game ticks when the butterfly was loaded
+    """
+    def load(self, index, ticks):
+        butterflyType = self.generator.randint(Generic.BUTTERFLY_ORANGE, Generic.BUTTERFLY_YELLOW)
+        self.types[index] = butterflyType
+        self.timeouts[index] = self.generator.randint(((-butterflyType + 2) * 6000) + 1000, 15000)
+        path = self.generator.randint(0, len(self.level.paths) - 1)
+        self.paths[index] = path
+        self.flightTimes[index] = self.generator.randint((len(self.level.paths[path]) * 1000) - 1000, (len(self.level.paths[path]) * 1000) + 3000)
+        self.loadTicks[index] = ticks
+        self.hitTicks[index] = 0
+        self.gone[index] = False
+        self.shot[index] = False
+        self.generations[index] += 1
+        self.frames[index] = 0
+        self.x[index] = self.width // 2
+        self.y[index] = self.height // 2
+        self.hasFrom[index] = False
+
+    """
+     " Snapshot
+     "   Records the positions at the start of a step so that the butterflies can be
+     "   drawn part way between steps
+    """
+    def snapshot(self):
+        self.fromX[:] = self.x
+        self.fromY[:] = self.y
+        self.hasFrom[:] = True
+
+    """
+     " Update
+     "   Flaps the wings and moves every flying butterfly along its path. Butterflies
+     "   that reach the end of their path are hidden, and those that have been gone
+     "   for longer than their timeout are loaded again
+     "
+     "   @param ticks: the current game ticks
+    """
+    def update(self, ticks):
+        if (len(self) < SWARM_VECTOR_SIZE):
+            self.updateEach(ticks)
+        else:
+            self.updateAll(ticks)
+
+    """
+     " Update All
+     "   Does the work of update() for every butterfly at once
+     "
+     "   @param ticks: the current game ticks
+    """
+    def updateAll(self, ticks):
+        truncate = lambda values: values.astype(int)
+        flying = ~self.gone
+        elapsed = ticks - self.loadTicks
+
+        # Flap the wings at a fixed rate, independent of the step rate, and move the
+        # butterflies by interpolating between the samples of their paths. Every
+        # butterfly is computed, as that is cheaper than selecting the moving ones
+        frames, index, fraction = getButterflyFlight(elapsed, self.flightTimes, self.samples, self.frameCount, numpy.minimum, truncate)
+        moving = flying & (elapsed < self.flightTimes)
+        start = self.pathTables[self.paths, index]
+        end = self.pathTables[self.paths, index + 1]
+        self.frames = numpy.where(flying, frames, self.frames)
+        self.x = numpy.where(moving, getButterflyCoordinate(start[:, 0], end[:, 0], fraction, truncate), self.x)
+        self.y = numpy.where(moving, getButterflyCoordinate(start[:, 1], end[:, 1], fraction, truncate), self.y)
+
+        # Hide the butterflies that reached the end of their path, and load again
+        # those that were already gone for longer than their timeout
+        if (not moving.all()):
+            reloading = numpy.flatnonzero(~flying & (ticks - self.hitTicks > self.timeouts))
+            finished = flying & ~moving
+            self.gone[finished] = True
+            self.hitTicks[finished] = ticks
+            self.x[finished] = -50
+            self.y[finished] = -50
+            self.hasFrom[finished] = False
+            for index in reloading:
+                self.load(index, ticks)
+
+    """
+     " Update Each
+     "   Does the work of update() one butterfly at a time, for small swarms. The
+     "   arithmetic is shared with updateAll() so that both give the same game
+     "
+     "   @param ticks: the current game ticks
+    """
+    def updateEach(self, ticks):
+        flightTimes = self.flightTimes.tolist()
+        paths = self.paths.tolist()
+        for index, (gone, loadTicks, hitTicks, timeout) in enumerate(zip(self.gone.tolist(), self.loadTicks.tolist(), self.hitTicks.tolist(), self.timeouts.tolist())):
+            elapsed = ticks - loadTicks
+            if (gone is True):
+                if (ticks - hitTicks > timeout):
+                    self.load(index, ticks)
+                continue
+
+            frame, sample, fraction = getButterflyFlight(elapsed, flightTimes[index], self.samples, self.frameCount, min, int)
+            self.frames[index] = frame
+            if (elapsed < flightTimes[index]):
+                table = self.pathLists[paths[index]]
+                startX, startY = table[sample]
+                endX, endY = table[sample + 1]
+                self.x[index] = getButterflyCoordinate(startX, endX, fraction, int)
+                self.y[index] = getButterflyCoordinate(startY, endY, fraction, int)
+            else:
+                self.gone[index] = True
+                self.hitTicks[index] = ticks
+                self.x[index] = -50
+                self.y[index] = -50
+                self.hasFrom[index] = False
+
+    """
+     " Get Rect
+     "   Gets the rectangle of a butterfly
+     "
+     "   @param index: the index of the butterfly
+    """
+    def getRect(self, index):
+        return pygame.Rect(self.x[index] - self.width // 2, self.y[index] - self.height // 2, self.width, self.height)
+
+    """
+     " Get Render Positions
+     "   Gets the top-left corners to draw every butterfly at, part way between the
+     "   previous step and the current step, as arrays of lefts and tops
+     "
+     "   @param alpha: the fraction of a step that has passed since the current step
+    """
+    def getRenderPositions(self, alpha):
+        x = numpy.where(self.hasFrom, self.fromX + (self.x - self.fromX) * alpha, self.x).astype(int)
+        y = numpy.where(self.hasFrom, self.fromY + (self.y - self.fromY) * alpha, self.y).astype(int)
+        return x - self.width // 2, y - self.height // 2
+
+    """
+     " Query
+     "   Gets the collision shape of every flying butterfly whose rectangle overlaps a
+     "   rectangle, ordered by the left edge of the butterflies
+     "
+     "   @param rect: the area to query
+    """
+    def query(self, rect):
+        if (len(self) < SWARM_VECTOR_SIZE):
+            found = self.queryEach(rect)
+        else:
+            found = self.queryAll(rect)
+        return [ButterflyBody(index, self.getRect(index), self.shapes[self.types[index]][self.frames[index]].mask) for index in found]
+
+    """
+     " Query Each
+     "   Gets the indices of the butterflies query() returns, testing one butterfly
+     "   at a time
+     "
+     "   @param rect: the area to query
+    """
+    def queryEach(self, rect):
+        lefts = [x - self.width // 2 for x in self.x.tolist()]
+        tops = [y - self.height // 2 for y in self.y.tolist()]
+        found = [index for index, gone in enumerate(self.gone.tolist()) if gone is False and butterflyOverlaps(lefts[index], tops[index], self.width, self.height, rect)]
+        found.sort(key = lambda index: lefts[index])
+        return found
+
+    """
+     " Query All
+     "   Gets the indices of the butterflies query() returns, testing every
+     "   butterfly at once
+     "
+     "   @param rect: the area to query
+    """
+    def queryAll(self, rect):
+        lefts = self.x - self.width // 2
+        tops = self.y - self.height // 2
+        found = numpy.flatnonzero(~self.gone & butterflyOverlaps(lefts, tops, self.width, self.height, rect))
+        return found[numpy.argsort(lefts[found], kind = "mergesort")].tolist()
+
+    """
+     " Hit
+     "   Records a hit on a butterfly, returning False if it had already been hit
+     "
+     "   @param index: the index of the butterfly
+     "   @param ticks: the current game ticks
+    """
+    def hit(self, index, ticks):
+        if (self.gone[index]):
+            return False
+        self.gone[index] = True
+        self.shot[index] = True
+        self.hitTicks[index] = ticks
+        return True
+
+"""
+ " Simulation
+ "   The complete state and rules of one game, independent of any display. The game
+ "   is advanced with step(), which takes the elapsed time and the player's input
+ "   for that period, or with advance(), which runs as many fixed length steps as
+ "   fit in the elapsed time. Nothing here needs a window or fonts, so many games
+ "   can be simulated without rendering them
+"""
+class Simulation(object):
+    """
+     " Constructor
+     "   @param seed: seed for the random number generator of the game (default = None)
+     "   @param timeRemaining: the number of seconds each game lasts (default = 120)
+     "   @param physicsRate: the number of fixed steps per second run by advance() (default = Generic.PHYSICS_RATE)
+     "   @param level: the layout of the game (default = Level.load())
+    """
+    def __init__(self, seed = None, timeRemaining = 120, physicsRate = Generic.PHYSICS_RATE, level = None):
+        self.generator = random.Random(seed)    # Random number generator for apples and butterflies
+        self.level = level if level is not None else Level.load()
+        self.startTimeRem = timeRemaining       # The number of seconds remaining at the start of the game
+        self.stepTime = 1000.0 / physicsRate    # The length of a fixed step in milliseconds
+        self.appleIndex = Collision.Grid()      # Broad-phase index of the apples
+        self.profiler = None                    # Profiler timing each phase of a step (see Profiler.Profiler)
+        self.reset()
+
+    """
+     " Reset
+     "   Resets every changable part of the game for a restart
+    """
+    def reset(self):
+        self.ticks = 0                  # Game ticks in milliseconds since the game started
+        self.cursor = [0, 0]            # Current cursor (x, y) position
+        self.arrowAngle = 0             # The current aiming angle in radians (determined by cursor position)
+        self.windSpeed = 1              # The speed of the wind in knots
+        self.power = 0                  # The current power percentage
+        self.mouseDown = False          # True if the mouse button is in the down position
+        self.ticksOnMouseDown = 0       # Game ticks when the mouse button was pressed
+        self.timeDecrementCount = 0     # Milliseconds since the timer ticked over (reduced by 1000ms on each tick)
+        self.accumulator = 0            # Milliseconds passed to advance() that have not been stepped yet
+        self.pendingInputs = []         # Input passed to advance() that has not been stepped yet
+        self.timeRemaining = self.startTimeRem
+        self.points = 0
+        self.appleHits = [0, 0, 0]      # Number of hits on each apple type, indexed by type
+        self.butterflyHits = 0          # Number of butterflies hit
+        self.gameOver = False
+        self.difficulty = Difficulty.DifficultyEngine(self.level.difficulty, self.level.timeDifficulty, self.applyDifficulty, self.points, self.timeRemaining)
+
+        # Apples
+        self.apples = [AppleState(location, 0, self.generator) for location in self.level.apples]
+        self.level.indexApples(self.appleIndex, self.apples)
+
+        # Arrows
+        self.arrow = ArrowState()
+        self.aim()
+
+        # Butterflies
+        self.butterflies = ButterflySwarm(self.generator, self.level)
+        self.butterflies.add(0)
+
+    """
+     " Aim
+     "   Updates the angle of the loaded arrow based on the cursor position
+    """
+    def aim(self):
+        angleRad = -(math.atan2(self.cursor[1] - AIM_ORIGIN[1], self.cursor[0] - AIM_ORIGIN[0]))
+        angleDeg = math.degrees(angleRad)
+
+        # Limit the rotation
+        if (angleDeg > Generic.AIM_ANGLE_MAX):
+            angleRad = math.radians(Generic.AIM_ANGLE_MAX)
+        elif (angleDeg < Generic.AIM_ANGLE_MIN):
+            angleRad = math.radians(Generic.AIM_ANGLE_MIN)
+        self.arrowAngle = angleRad
+        self.arrow.update(angleRad)
+
+    """
+     " Mark
+     "   Marks the end of a phase of the step when the game is being profiled
+     "
+     "   @param phase: the phase that has just ended (see Profiler.PROFILER_PHASES)
+    """
+    def mark(self, phase):
+        if (self.profiler is not None):
+            self.profiler.mark(phase)
+
+    """
+     " Adjust Points
+     "   Increases or decreases the total number of points obtained, never going
+     "   below zero. Upon a point change, the difficulty is re-evaluated
+     "
+     "   @param points: the number of points to increase (+ve) or decrease (-ve)
+    """
+    def adjustPoints(self, points):
+        self.points = max(self.points + points, 0)
+        self.difficulty.updatePoints(self.points)
+
+    """
+     " Adjust Time Remaining
+     "   Increases or decreases the time remaining in the game, never going below zero.
+     "   Upon a time change, the difficulty is re-evaluated
+     "
+     "   @param time: the number of seconds to increment (+ve) or decrement (-ve)
+    """
+    def adjustTimeRemaining(self, time):
+        self.timeRemaining = max(self.timeRemaining + time, 0)
+        self.difficulty.updateTimeRemaining(self.timeRemaining)
+
+    """
+     " Apply Difficulty
+     "   Called by the difficulty engine for each adjustment reached, changing the
+     "   wind and introducing more butterflies
+     "
+     "   @param windSpeed: the new wind speed in knots
+     "   @param butterfly: True to add a butterfly
+    """
+    def applyDifficulty(self, windSpeed, butterfly):
+        self.windSpeed = windSpeed
+        if (butterfly is True):
+            self.butterflies.add(self.ticks)
+
+    """
+     " Step
+     "   Advances the game by a period of time, applying the player's input at the
+     "   start of the period
+     "
+     "   @param dt: the number of milliseconds to advance by
+     "   @param inputs: list of (INPUT_*, position) tuples received during the period (default = ())
+    """
+    def step(self, dt, inputs = ()):
+        self.ticks += dt
+
+        # Record where moving elements start this step for interpolation
+        self.arrow.snapshot()
+        self.butterflies.snapshot()
+
+        # Input that alters the gameplay
+        for inputType, position in inputs:
+            if (inputType == INPUT_AIM and (self.arrow.fired == False)):
+                self.cursor = position
+                self.aim()
+            elif (inputType == INPUT_PRESS):
+                self.mouseDown = True
+                self.ticksOnMouseDown = self.ticks
+            elif (inputType == INPUT_RELEASE):
+                self.mouseDown = False
+                if (self.arrow.fired == False):
+                    self.arrow.fire(self.power, self.windSpeed, self.ticks)
+        self.mark("input")
+
+        # Arrow flight conditional
+        if (self.arrow.fired == True):
+            if (self.arrow.flying == True):
+                self.flyArrow()
+            else:
+                # Load a new arrow
+                self.arrow = ArrowState()
+                self.aim()
+        elif (self.mouseDown == True):
+            # Update the power gauge
+            self.power = -(math.cos(math.radians((self.ticks - self.ticksOnMouseDown) / Generic.POWER_MODIFIER)) * 50) + 50
+        self.mark("arrow")
+
+        # Update the timer
+        self.timeDecrementCount += dt
+        if (self.timeDecrementCount >= 1000 and self.timeRemaining != 0):
+            self.adjustTimeRemaining(-1)
+            self.timeDecrementCount -= 1000
+
+        # Apple and butterfly changes
+        for apple in self.apples:
+            apple.change(self.ticks)
+        self.mark("apples")
+        self.butterflies.update(self.ticks)
+        self.mark("butterflies")
+
+        # Check if the game has ended
+        if (self.timeRemaining <= 0):
+            self.gameOver = True
+
+    """
+     " Fly Arrow
+     "   Moves the flying arrow and scores any apples and butterflies it passed
+     "   through since the last step
+    """
+    def flyArrow(self):
+        previousCenter = self.arrow.previousCenter
+        self.arrow.fly((self.ticks - self.arrow.firedTicks) / 1000.0)
+        sweptRect = Collision.sweepRect(self.arrow.rect, previousCenter, self.arrow.rect.center)
+        self.mark("arrow")
+
+        # Detect apple collisions along the path travelled since the last step
+        apples = [apple for apple in self.appleIndex.query(sweptRect) if apple.appleHit is False]
+        for apple in Collision.sweep(self.arrow, previousCenter, self.arrow.rect.center, apples):
+            if (apple.hit()):
+                self.appleHits[apple.appleType] += 1
+                self.adjustPoints(apple.pointsPerApple)
+                self.adjustTimeRemaining(apple.timePerApple)
+        self.mark("apple collisions")
+
+        # Detect butterfly collisions along the path travelled since the last step
+        butterflies = self.butterflies.query(sweptRect)
+        for butterfly in Collision.sweep(self.arrow, previousCenter, self.arrow.rect.center, butterflies):
+            if (self.butterflies.hit(butterfly.index, self.ticks)):
+                self.butterflyHits += 1
+                self.adjustPoints(Generic.POINTS_PER_BUTTERFLY)
+                self.adjustTimeRemaining(Generic.TIME_PER_BUTTERFLY)
+        self.mark("butterfly collisions")
+
+    """
+     " Advance
+     "   Advances the game by the elapsed time in fixed length steps, so that the
+     "   outcome does not depend on how often or how regularly this is called. Time
+     "   left over is carried into the next call. The input is applied at the start
+     "   of the first step that runs. Returns the fraction of a step left over, which
+     "   is used to draw moving elements part way between steps
+     "
+     "   @param elapsed: the number of milliseconds since the last call
+     "   @param inputs: list of (INPUT_*, position) tuples received since the last call (default = ())
+    """
+    def advance(self, elapsed, inputs = ()):
+        self.accumulator += elapsed
+        self.pendingInputs.extend(inputs)
+        while (self.accumulator >= self.stepTime and self.gameOver is False):
+            self.step(self.stepTime, self.pendingInputs)
+            self.pendingInputs = []
+            self.accumulator -= self.stepTime
+        return min(self.accumulator / self.stepTime, 1.0)
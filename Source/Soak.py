@@ -0,0 +1,312 @@
+import os, sys, gc, csv, math, bisect, random, argparse, datetime, tempfile, timeit
+
+# The soak test never opens a window or plays sound
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import Generic, Simulation, Renderer, Profiler, Scores, Applarrow
+
+"""
+ " Constants
+"""
+# Soak test properties
+SOAK_SEED                   =   1       # Seed of the player and of the game
+SOAK_DURATION               =   3600    # Seconds played before the game is quit
+SOAK_SAMPLE_INTERVAL        =   60      # Seconds between each row of the report
+
+# Upper bounds in milliseconds of each frame time histogram bucket. The last bucket
+# holds every frame slower than the last bound
+SOAK_HISTOGRAM_BOUNDS       =   [4, 8, 16, 24, 33, 50, 100, 250]
+
+# Player behaviour
+SOAK_AIM_FRAMES             =   [3, 15]     # Range of frames spent moving the cursor to the next aim
+SOAK_RESTART_FRAMES         =   60          # Frames the restart overlay is shown before restarting
+SOAK_POWER                  =   [20, 100]   # Range of power percentages fired at
+
+# Sprite layers counted in the report, lowest first
+SOAK_LAYERS                 =   sorted((value, name[:-len("_LAYER")].lower()) for name, value in vars(Renderer).items() if name.endswith("_LAYER"))
+
+"""
+ " Get Resident Memory
+ "   Gets the memory held by the process in bytes. Where the current size cannot be
+ "   read, the peak size is returned instead, and None where neither can be read
+"""
+def getResidentMemory():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+"""
+ " Get Hold Time
+ "   Gets the milliseconds the mouse button is held for the power gauge to reach a
+ "   percentage, inverting the gauge in Simulation.Simulation.step
+ "
+ "   @param power: the power percentage
+"""
+def getHoldTime(power):
+    return math.degrees(math.acos(1 - power / 50.0)) * Generic.POWER_MODIFIER
+
+"""
+ " Histogram
+ "   Counts samples in milliseconds into the SOAK_HISTOGRAM_BOUNDS buckets
+"""
+class Histogram(object):
+    """
+     " Constructor
+    """
+    def __init__(self):
+        self.counts = [0] * (len(SOAK_HISTOGRAM_BOUNDS) + 1)
+
+    """
+     " Add
+     "   Counts a sample
+     "
+     "   @param milliseconds: the sample in milliseconds
+    """
+    def add(self, milliseconds):
+        self.counts[bisect.bisect_left(SOAK_HISTOGRAM_BOUNDS, milliseconds)] += 1
+
+    """
+     " Merge
+     "   Adds the counts of another histogram to this one
+     "
+     "   @param histogram: the histogram to add
+    """
+    def merge(self, histogram):
+        self.counts = [count + other for count, other in zip(self.counts, histogram.counts)]
+
+    """
+     " Get Labels
+     "   Gets a name for each bucket
+    """
+    @staticmethod
+    def getLabels():
+        return ["<=%dms" % bound for bound in SOAK_HISTOGRAM_BOUNDS] + [">%dms" % SOAK_HISTOGRAM_BOUNDS[-1]]
+
+"""
+ " Soak Player
+ "   Plays the real game loop through Applarrow.main by posting the same mouse and
+ "   keyboard events a player would. Each shot moves the cursor to a random aim over
+ "   a few frames, holds the mouse button until the power gauge reaches a random
+ "   power and waits for the arrow to land. The restart key is pressed shortly
+ "   after each game ends.
+ "
+ "   Every frame is counted into two histograms, one of the time between frames and
+ "   one of the time the frame spent working, which leaves out the time waiting on
+ "   the clock. Each report row holds the histograms since the previous row along
+ "   with the memory of the process, the number of Python objects, the number of
+ "   playing animations and the number of sprites in each layer
+"""
+class SoakPlayer(object):
+    """
+     " Constructor
+     "   @param report: open file the report is written to as CSV
+     "   @param seed: seed of the player's random choices (default = SOAK_SEED)
+     "   @param duration: seconds played before the game is quit (default = SOAK_DURATION)
+     "   @param interval: seconds between each report row (default = SOAK_SAMPLE_INTERVAL)
+    """
+    def __init__(self, report, seed = SOAK_SEED, duration = SOAK_DURATION, interval = SOAK_SAMPLE_INTERVAL):
+        self.generator = random.Random(seed)
+        self.duration = duration
+        self.interval = interval
+        self.timer = timeit.default_timer
+        self.tickColumn = 2 + Profiler.PROFILER_PHASES.index("tick")
+        self.writer = csv.writer(report, lineterminator = "\n")
+        self.report = report
+
+        self.simulation = None
+        self.renderer = None
+        self.profiler = None
+
+        self.shot = None                # The (cursor position, hold time) of the next shot
+        self.aimFrames = 0              # Frames left moving the cursor to the aim
+        self.pressTicks = None          # Ticks when the mouse button was pressed, None if it is up
+        self.restartFrames = 0          # Frames left before the restart key is pressed
+        self.games = 0                  # The number of games finished
+        self.shots = 0                  # The number of arrows fired
+        self.frames = 0                 # The number of frames recorded
+        self.lastFrame = None           # Timer of the previous frame
+        self.quitting = False           # True once the quit event has been posted
+
+        self.frameTimes = Histogram()   # Time between frames since the last report row
+        self.workTimes = Histogram()    # Time spent working since the last report row
+        self.totalFrameTimes = Histogram()
+        self.totalWorkTimes = Histogram()
+
+    """
+     " Start
+     "   Called by Applarrow.main once the game has been created
+     "
+     "   @param simulation: the simulated game (see Simulation.Simulation)
+     "   @param renderer: the renderer drawing the game (see Renderer.Renderer)
+     "   @param profiler: the profiler timing each frame (see Profiler.Profiler)
+    """
+    def start(self, simulation, renderer, profiler):
+        self.simulation = simulation
+        self.renderer = renderer
+        self.profiler = profiler
+        self.startTime = self.timer()
+        self.nextSample = self.startTime + self.interval
+        self.writer.writerow(["elapsed", "frames", "games", "shots", "rss", "objects", "animations"] +
+                             ["layer %s" % name for layer, name in SOAK_LAYERS] +
+                             ["frame %s" % label for label in Histogram.getLabels()] +
+                             ["work %s" % label for label in Histogram.getLabels()])
+
+    """
+     " Play
+     "   Called by Applarrow.main at the start of every frame, before the events are
+     "   read. Records the previous frame and posts the events for this one
+     "
+     "   @param help: True if the help overlay is shown
+     "   @param gameOver: True if the game has ended
+    """
+    def play(self, help, gameOver):
+        if (self.quitting is True):
+            return
+        now = self.timer()
+        finished = now - self.startTime >= self.duration
+        self.record(now, finished)
+        if (finished is True):
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+            self.quitting = True
+            return
+
+        if (help is True):
+            self.pressKey(pygame.K_h)
+        elif (gameOver is True):
+            # Let the restart overlay show before starting the next game
+            if (self.restartFrames == 0):
+                self.restartFrames = SOAK_RESTART_FRAMES
+                self.games += 1
+            self.restartFrames -= 1
+            if (self.restartFrames == 0):
+                self.pressKey(pygame.K_r)
+                self.shot = None
+                self.pressTicks = None
+        elif (self.pressTicks is not None):
+            # Release once the power gauge has reached the power of the shot
+            if (self.simulation.ticks - self.pressTicks >= self.shot[1]):
+                pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONUP, pos = self.shot[0], button = 1))
+                self.pressTicks = None
+                self.shot = None
+                self.shots += 1
+        elif (self.simulation.arrow.fired is False):
+            if (self.shot is None):
+                self.aim()
+            if (self.aimFrames > 0):
+                self.moveCursor()
+            else:
+                pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos = self.shot[0], button = 1))
+                self.pressTicks = self.simulation.ticks
+
+    """
+     " Aim
+     "   Picks the cursor position and hold time of the next shot
+    """
+    def aim(self):
+        angle = math.radians(self.generator.uniform(Generic.AIM_ANGLE_MIN, Generic.AIM_ANGLE_MAX))
+        position = (int(Simulation.AIM_ORIGIN[0] + math.cos(angle) * 200), int(Simulation.AIM_ORIGIN[1] - math.sin(angle) * 200))
+        self.shot = (position, getHoldTime(self.generator.uniform(SOAK_POWER[0], SOAK_POWER[1])))
+        self.aimFrames = self.generator.randint(SOAK_AIM_FRAMES[0], SOAK_AIM_FRAMES[1])
+
+    """
+     " Move Cursor
+     "   Moves the cursor a step of the way to the aim of the next shot
+    """
+    def moveCursor(self):
+        x, y = self.simulation.cursor
+        targetX, targetY = self.shot[0]
+        position = (int(x + (targetX - x) / float(self.aimFrames)), int(y + (targetY - y) / float(self.aimFrames)))
+        pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, pos = position, rel = (position[0] - x, position[1] - y), buttons = (0, 0, 0)))
+        self.aimFrames -= 1
+
+    """
+     " Press Key
+     "   Posts a key being released, which is when the game acts on it
+     "
+     "   @param key: the key to press
+    """
+    def pressKey(self, key):
+        pygame.event.post(pygame.event.Event(pygame.KEYUP, key = key, mod = 0))
+
+    """
+     " Record
+     "   Counts the previous frame into the histograms and writes a report row when
+     "   one is due
+     "
+     "   @param now: the timer at the start of this frame
+     "   @param finished: True to write a report row for the last interval
+    """
+    def record(self, now, finished):
+        if (self.lastFrame is not None):
+            self.frameTimes.add((now - self.lastFrame) * 1000.0)
+            frame = self.profiler.getLastFrame()
+            if (frame is not None):
+                self.workTimes.add(frame[1] - frame[self.tickColumn])
+            self.frames += 1
+        self.lastFrame = now
+        if (now >= self.nextSample or finished is True):
+            self.sample(now)
+
+    """
+     " Sample
+     "   Writes a report row and starts the next interval. Sampling is slow, so the
+     "   time it takes is left out of the next frame
+     "
+     "   @param now: the timer at the start of this frame
+    """
+    def sample(self, now):
+        layers = [len(self.renderer.getSprites(layer)) for layer, name in SOAK_LAYERS]
+        self.writer.writerow(["%.1f" % (now - self.startTime), self.frames, self.games, self.shots, getResidentMemory(),
+                              len(gc.get_objects()), len(self.renderer.timeline.animations)] +
+                             layers + self.frameTimes.counts + self.workTimes.counts)
+        self.report.flush()
+
+        self.totalFrameTimes.merge(self.frameTimes)
+        self.totalWorkTimes.merge(self.workTimes)
+        self.frameTimes = Histogram()
+        self.workTimes = Histogram()
+        self.nextSample = now + self.interval
+        self.lastFrame = self.timer()
+
+"""
+ " Soak main entry point
+ "   Plays the game until the duration has passed, writing the report as it goes,
+ "   then prints the histograms of the whole run. Scores are kept in a temporary
+ "   directory so the player's highscore and history are left alone
+"""
+def main():
+    parser = argparse.ArgumentParser(description = "Plays Applarrow headless for a long time, recording frame times and memory.")
+    parser.add_argument("--output", default = datetime.datetime.now().strftime("soak-%Y%m%d-%H%M%S.csv"), help = "CSV file the report is written to")
+    parser.add_argument("--duration", type = float, default = SOAK_DURATION, help = "seconds to play for")
+    parser.add_argument("--interval", type = float, default = SOAK_SAMPLE_INTERVAL, help = "seconds between each report row")
+    parser.add_argument("--seed", type = int, default = SOAK_SEED, help = "seed of the player and of the game")
+    parser.add_argument("--record", metavar = "PATH", help = "record the games to a replay (see Replay.py)")
+    arguments = parser.parse_args()
+
+    scoresDirectory = tempfile.mkdtemp(prefix = "applarrow-soak-")
+    scores = Scores.ScoreStore(os.path.join(scoresDirectory, Scores.SETTINGS_FILE), os.path.join(scoresDirectory, Scores.HISTORY_FILE))
+    with open(arguments.output, "w") as report:
+        player = SoakPlayer(report, arguments.seed, arguments.duration, arguments.interval)
+        try:
+            Applarrow.main(autoplay = player, seed = arguments.seed, scores = scores, record = arguments.record)
+        except SystemExit:
+            pass
+
+    print("Played %d games, %d shots and %d frames, report written to %s" % (player.games, player.shots, player.frames, arguments.output))
+    print("%-10s %10s %10s" % ("ms", "frame", "work"))
+    for label, frameCount, workCount in zip(Histogram.getLabels(), player.totalFrameTimes.counts, player.totalWorkTimes.counts):
+        print("%-10s %10d %10d" % (label, frameCount, workCount))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
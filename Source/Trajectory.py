@@ -0,0 +1,256 @@
+import numpy
+import Generic, Shapes, Collision
+from Simulation import ARROW_REST_CENTER, ARROW_PIVOT
+
+"""
+ " Trajectory
+ "   Evaluates large batches of shots at once with NumPy, for tools and bots that
+ "   need far more shots than Simulation.ArrowState can fly. Arrows follow the same
+ "   equations of motion as the game. Hits are found by treating the arrow as its
+ "   shaft and each apple as a circle, which agrees with the pixel masks used by
+ "   the game except for shots that graze an apple
+"""
+
+"""
+ " Constants
+"""
+# Arrow geometry in pixels, from the same image as Simulation.ArrowState. The shaft
+# is a line through the center of the arrow along its direction of travel
+ARROW_WIDTH                 =   Shapes.getShape("arrow.png").width
+ARROW_HEIGHT                =   Shapes.getShape("arrow.png").height
+ARROW_HALF_LENGTH           =   ARROW_WIDTH / 2.0
+
+# Distance in pixels between the center of an apple and the shaft that counts as a hit
+APPLE_HIT_RADIUS            =   11.0
+
+# Number of shots evaluated together, limiting the memory used by a batch
+BATCH_SIZE                  =   8192
+
+"""
+ " Get Velocities
+ "   Vectorised Generic.calculateVelocity, in meters per second
+ "
+ "   @param powers: the power percentages
+ "   @param windSpeeds: the wind speeds in knots
+"""
+def getVelocities(powers, windSpeeds):
+    return numpy.sqrt(powers) * 1.2 + (windSpeeds * Generic.KNOTS_TO_METERS_PER_SECOND)
+
+"""
+ " Get Launch Points
+ "   Gets the center of a loaded arrow for each aiming angle, matching the rotation
+ "   about the archer's hand in Simulation.ArrowState.update to within a pixel
+ "
+ "   @param angles: the aiming angles in radians
+"""
+def getLaunchPoints(angles):
+    sinAngles = numpy.sin(angles)
+    cosAngles = numpy.cos(angles)
+    dx = ARROW_REST_CENTER[0] - ARROW_PIVOT[0]
+    dy = ARROW_REST_CENTER[1] - ARROW_PIVOT[1]
+    x = ARROW_PIVOT[0] - (cosAngles * dx - sinAngles * dy) + ARROW_WIDTH / 2.0
+    y = ARROW_PIVOT[1] + (sinAngles * dx + cosAngles * dy) + ARROW_HEIGHT / 2.0
+    return x, y
+
+"""
+ " Get Positions
+ "   Gets the center of each arrow at each time from its launch point and velocity.
+ "   The launch values have one entry for each shot, the times are a row for each
+ "   shot or a single row shared by every shot
+ "
+ "   @param launchX: the x coordinate of each launch point
+ "   @param launchY: the y coordinate of each launch point
+ "   @param velocityX: the horizontal velocity of each shot in meters per second
+ "   @param velocityY: the initial upwards velocity of each shot in meters per second
+ "   @param times: the seconds since each shot was fired
+"""
+def getPositions(launchX, launchY, velocityX, velocityY, times):
+    times = numpy.atleast_2d(times)
+    x = launchX[:, None] + velocityX[:, None] * times * Generic.PIXELS_PER_METER
+    y = launchY[:, None] - (velocityY[:, None] * times - (Generic.ACCELERATION_DUE_TO_GRAVITY * times ** 2) / 2) * Generic.PIXELS_PER_METER
+    return x, y
+
+"""
+ " Get Directions
+ "   Gets the unit direction of travel on screen of each arrow at each time
+ "
+ "   @param velocityX: the horizontal velocity of each shot in meters per second
+ "   @param velocityY: the initial upwards velocity of each shot in meters per second
+ "   @param times: the seconds since each shot was fired, a row for each shot
+"""
+def getDirections(velocityX, velocityY, times):
+    dx = numpy.broadcast_to(velocityX[:, None], times.shape)
+    dy = Generic.ACCELERATION_DUE_TO_GRAVITY * times - velocityY[:, None]
+    speeds = numpy.hypot(dx, dy)
+    speeds = numpy.where(speeds == 0, 1, speeds)
+    return dx / speeds, dy / speeds
+
+"""
+ " Get Speeds
+ "   Gets the speed of each arrow in pixels per second at a time for each shot
+ "
+ "   @param velocityX: the horizontal velocity of each shot in meters per second
+ "   @param velocityY: the initial upwards velocity of each shot in meters per second
+ "   @param times: the seconds since each shot was fired
+"""
+def getSpeeds(velocityX, velocityY, times):
+    return numpy.hypot(velocityX, velocityY - Generic.ACCELERATION_DUE_TO_GRAVITY * times) * Generic.PIXELS_PER_METER
+
+"""
+ " Get Flight Positions
+ "   Gets the center of the arrow for every shot at every time, following the
+ "   equations of motion in Simulation.ArrowState.fly. Returns x and y arrays with a
+ "   row for each shot and a column for each time
+ "
+ "   @param angles: the aiming angles in radians
+ "   @param powers: the power percentages
+ "   @param windSpeeds: the wind speeds in knots
+ "   @param times: the seconds since each shot was fired, a single row or a row for each shot
+"""
+def getFlightPositions(angles, powers, windSpeeds, times):
+    angles, powers, windSpeeds = [numpy.ravel(array) for array in numpy.broadcast_arrays(angles, powers, windSpeeds)]
+    velocities = getVelocities(powers, windSpeeds)
+    launchX, launchY = getLaunchPoints(angles)
+    return getPositions(launchX, launchY, velocities * numpy.cos(angles), velocities * numpy.sin(angles), numpy.asarray(times, dtype = float))
+
+"""
+ " Get Landing Times
+ "   Gets the time of the fixed step on which each arrow stops flying, which is when
+ "   the rotated arrow first touches the ground or has left the side of the window
+ "
+ "   @param launchX: the x coordinate of each launch point
+ "   @param launchY: the y coordinate of each launch point
+ "   @param velocityX: the horizontal velocity of each shot in meters per second
+ "   @param velocityY: the initial upwards velocity of each shot in meters per second
+"""
+def getLandingTimes(launchX, launchY, velocityX, velocityY):
+    gravity = Generic.ACCELERATION_DUE_TO_GRAVITY
+    ground = Generic.WINDOW_HEIGHT - 16
+
+    # Time the center falls to the ground less half the height of the rotated arrow,
+    # refining the height with the direction of travel at that time
+    halfHeight = numpy.full(launchX.shape, ARROW_HEIGHT / 2.0)
+    for refinement in range(2):
+        drop = (ground - halfHeight - launchY) / Generic.PIXELS_PER_METER
+        groundTimes = (velocityY + numpy.sqrt(numpy.maximum(velocityY ** 2 + 2 * gravity * drop, 0))) / gravity
+        ux, uy = getDirections(velocityX, velocityY, groundTimes[:, None])
+        halfHeight = (ARROW_WIDTH * numpy.abs(uy[:, 0]) + ARROW_HEIGHT * numpy.abs(ux[:, 0])) / 2
+
+    # Time the whole arrow has left the side of the window it is flying towards
+    speeds = numpy.abs(velocityX) * Generic.PIXELS_PER_METER
+    distances = numpy.where(velocityX > 0, Generic.WINDOW_WIDTH + ARROW_WIDTH / 2.0 - launchX, launchX + ARROW_WIDTH / 2.0)
+    sideTimes = numpy.where(speeds > 0, distances / numpy.where(speeds > 0, speeds, 1), numpy.inf)
+
+    # The game only checks at the end of each fixed step
+    stepTime = 1.0 / Generic.PHYSICS_RATE
+    return numpy.maximum(numpy.ceil(numpy.minimum(groundTimes, sideTimes) / stepTime - 1e-9), 1) * stepTime
+
+"""
+ " Solve Batch
+ "   Solves one batch of shots (see solve) at apples centered on the given points.
+ "   Like the game, each arrow is tested at points no more than Collision.SWEEP_STEP
+ "   pixels apart. The horizontal position of an arrow changes at a constant rate,
+ "   so each apple can only be hit in a short window of time and only the shots and
+ "   samples inside that window are tested
+"""
+def solveBatch(angles, powers, windSpeeds, appleX, appleY):
+    velocities = getVelocities(powers, windSpeeds)
+    velocityX = velocities * numpy.cos(angles)
+    velocityY = velocities * numpy.sin(angles)
+    launchX, launchY = getLaunchPoints(angles)
+    landingTimes = getLandingTimes(launchX, launchY, velocityX, velocityY)
+
+    # Horizontal speed in pixels per second, arrows that barely move never reach the tree
+    stepTime = 1.0 / Generic.PHYSICS_RATE
+    speeds = velocityX * Generic.PIXELS_PER_METER
+    moving = numpy.abs(speeds) > 1e-6
+    speeds = numpy.where(moving, speeds, 1)
+    reach = ARROW_HALF_LENGTH + APPLE_HIT_RADIUS
+
+    impactTimes = numpy.full(angles.shape, numpy.inf)
+    firstApple = numpy.full(angles.shape, -1, dtype = int)
+    for apple in range(len(appleX)):
+        # Shots that are within reach of the apple horizontally before they land
+        entry = numpy.maximum((appleX[apple] - reach - launchX) / speeds, 0)
+        exit = numpy.minimum((appleX[apple] + reach - launchX) / speeds, landingTimes)
+        shots = numpy.nonzero(moving & (entry <= exit))[0]
+        if (len(shots) == 0):
+            continue
+        entry, exit = entry[shots], exit[shots]
+
+        # Time between samples, dividing each fixed step by the furthest distance travelled
+        # in a step while in reach, which is at the start or end of the window
+        fastest = numpy.maximum(getSpeeds(velocityX[shots], velocityY[shots], entry), getSpeeds(velocityX[shots], velocityY[shots], exit))
+        sampleTimes = stepTime / numpy.maximum(numpy.ceil(fastest * stepTime / Collision.SWEEP_STEP), 1)
+        firstSamples = numpy.maximum(numpy.ceil(entry / sampleTimes - 1e-6), 1)
+        finalSamples = numpy.floor(exit / sampleTimes + 1e-6)
+        width = max(int((finalSamples - firstSamples).max()) + 1, 1)
+        samples = firstSamples[:, None] + numpy.arange(width)[None, :]
+        valid = samples <= finalSamples[:, None]
+        times = samples * sampleTimes[:, None]
+
+        # Distance from the apple to the shaft at each sample
+        x, y = getPositions(launchX[shots], launchY[shots], velocityX[shots], velocityY[shots], times)
+        ux, uy = getDirections(velocityX[shots], velocityY[shots], times)
+        offsetX = appleX[apple] - x
+        offsetY = appleY[apple] - y
+        along = numpy.clip(offsetX * ux + offsetY * uy, -ARROW_HALF_LENGTH, ARROW_HALF_LENGTH)
+        hits = valid & (numpy.hypot(offsetX - along * ux, offsetY - along * uy) <= APPLE_HIT_RADIUS)
+
+        # Keep the apple for the shots that hit it before any other
+        hitTimes = numpy.where(hits.any(axis = 1), times[numpy.arange(len(shots)), hits.argmax(axis = 1)], numpy.inf)
+        earlier = hitTimes < impactTimes[shots]
+        impactTimes[shots[earlier]] = hitTimes[earlier]
+        firstApple[shots[earlier]] = apple
+
+    impactTimes[firstApple == -1] = numpy.nan
+    return firstApple, impactTimes, landingTimes
+
+"""
+ " Solve
+ "   Evaluates every combination of the given angles, powers and wind speeds, which
+ "   are broadcast against each other, against the apples of a level. Returns three
+ "   arrays in the broadcast shape: the index in level.apples of the first apple hit
+ "   (-1 for a miss), the time of that hit in seconds (NaN for a miss) and the time
+ "   the arrow landed in seconds. Butterflies are not included as they move at random
+ "
+ "   @param level: the level whose apples are aimed at (see Level.Level)
+ "   @param angles: the aiming angles in radians
+ "   @param powers: the power percentages
+ "   @param windSpeeds: the wind speeds in knots
+"""
+def solve(level, angles, powers, windSpeeds):
+    angles, powers, windSpeeds = numpy.broadcast_arrays(numpy.asarray(angles, dtype = float), numpy.asarray(powers, dtype = float), numpy.asarray(windSpeeds, dtype = float))
+    shape = angles.shape
+    angles, powers, windSpeeds = numpy.ravel(angles), numpy.ravel(powers), numpy.ravel(windSpeeds)
+    appleX = numpy.array([location[0] for location in level.apples], dtype = float)
+    appleY = numpy.array([location[1] for location in level.apples], dtype = float)
+
+    firstApple = numpy.empty(angles.size, dtype = int)
+    impactTimes = numpy.empty(angles.size)
+    landingTimes = numpy.empty(angles.size)
+    for start in range(0, angles.size, BATCH_SIZE):
+        batch = slice(start, start + BATCH_SIZE)
+        firstApple[batch], impactTimes[batch], landingTimes[batch] = solveBatch(angles[batch], powers[batch], windSpeeds[batch], appleX, appleY)
+    return firstApple.reshape(shape), impactTimes.reshape(shape), landingTimes.reshape(shape)
+
+"""
+ " Find Shots
+ "   Searches the aiming range for the shots whose first hit is an apple. Returns
+ "   arrays of the angles in radians, powers and times of impact of those shots,
+ "   quickest first
+ "
+ "   @param level: the level whose apples are aimed at (see Level.Level)
+ "   @param apple: the index of the apple in level.apples
+ "   @param windSpeed: the wind speed in knots
+ "   @param angleStep: the spacing of the angles searched in degrees (default = 0.25)
+ "   @param powerStep: the spacing of the powers searched (default = 0.25)
+"""
+def findShots(level, apple, windSpeed, angleStep = 0.25, powerStep = 0.25):
+    angles = numpy.radians(numpy.arange(Generic.AIM_ANGLE_MIN, Generic.AIM_ANGLE_MAX + angleStep / 2.0, angleStep))
+    powers = numpy.arange(0, 100 + powerStep / 2.0, powerStep)
+    angles, powers = numpy.meshgrid(angles, powers, indexing = "ij")
+    firstApple, impactTimes, landingTimes = solve(level, angles, powers, windSpeed)
+    found = firstApple == apple
+    order = numpy.argsort(impactTimes[found])
+    return angles[found][order], powers[found][order], impactTimes[found][order]
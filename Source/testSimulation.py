@@ -0,0 +1,62 @@
+import unittest, random
+import pygame
+import Generic, Level, Simulation
+
+"""
+ " Constants
+"""
+# Ticks between the steps of the swarms compared, and the number of steps
+TEST_STEP_TIME              =   8
+TEST_STEPS                  =   6000
+
+"""
+ " Butterfly Swarm Test
+ "   Steps the same swarm one butterfly at a time and all at once, checking that
+ "   both give exactly the same butterflies and find the same ones in a query
+"""
+class ButterflySwarmTest(unittest.TestCase):
+    """
+     " Make Swarm
+     "   Makes a swarm of butterflies loaded from a fixed seed
+     "
+     "   @param size: the number of butterflies
+    """
+    def makeSwarm(self, size):
+        swarm = Simulation.ButterflySwarm(random.Random(size), self.level)
+        for index in range(size):
+            swarm.add(index * 100)
+        return swarm
+
+    """
+     " Set Up
+    """
+    def setUp(self):
+        self.level = Level.load()
+
+    """
+     " Test Update Paths Match
+     "   Steps swarms of several sizes through both update paths, comparing every
+     "   field and the result of a query after each step
+    """
+    def testUpdatePathsMatch(self):
+        rects = [pygame.Rect(0, 0, Generic.WINDOW_WIDTH, Generic.WINDOW_HEIGHT), pygame.Rect(300, 150, 120, 80)]
+        for size in [1, 5, Simulation.SWARM_VECTOR_SIZE + 8]:
+            each = self.makeSwarm(size)
+            whole = self.makeSwarm(size)
+            for step in range(1, TEST_STEPS + 1):
+                ticks = size * 100 + step * TEST_STEP_TIME
+                each.snapshot()
+                whole.snapshot()
+                each.updateEach(ticks)
+                whole.updateAll(ticks)
+                if (step % 500 == 0):
+                    # Shoot a butterfly now and then so that both paths reload it
+                    each.hit(step % size, ticks)
+                    whole.hit(step % size, ticks)
+                for name, dtype in Simulation.BUTTERFLY_FIELDS:
+                    self.assertEqual(getattr(each, name).tolist(), getattr(whole, name).tolist(), "%s differs after step %d of %d butterflies" % (name, step, size))
+                for rect in rects:
+                    self.assertEqual(each.queryEach(rect), whole.queryAll(rect), "query differs after step %d of %d butterflies" % (step, size))
+
+if __name__ == "__main__":
+    unittest.main()